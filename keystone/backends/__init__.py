@@ -15,8 +15,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import ast
+from datetime import datetime
 import logging
+
+import eventlet
+
 import keystone.utils as utils
+from keystone.common import config
 from keystone.backends import models as models
 from keystone.backends import api as api
 
@@ -26,6 +31,16 @@ DEFAULT_BACKENDS = 'keystone.backends.sqlalchemy'
 #Reference to Admin Role.
 KEYSTONEADMINROLE = None
 KEYSTONESERVICEADMINROLE = None
+#Bounds of the validated-token cache kept by the identity service.
+VALIDATE_CACHE_SIZE = 1000
+VALIDATE_CACHE_TTL = 60
+#Bounds of the memo of admin levels granted to caller tokens.
+ADMIN_CACHE_SIZE = 100
+ADMIN_CACHE_TTL = 30
+#Seconds between purges of expired tokens (0 disables the purge), and the
+#number of tokens deleted per statement.
+TOKEN_PURGE_INTERVAL = 3600
+TOKEN_PURGE_BATCH_SIZE = 1000
 
 
 def configure_backends(options):
@@ -39,3 +54,58 @@ def configure_backends(options):
         KEYSTONEADMINROLE = options["keystone-admin-role"]
         global KEYSTONESERVICEADMINROLE
         KEYSTONESERVICEADMINROLE = options["keystone-service-admin-role"]
+    global VALIDATE_CACHE_SIZE
+    VALIDATE_CACHE_SIZE = config.get_option(options, 'validate_cache_size',
+        type='int', default=VALIDATE_CACHE_SIZE)
+    global VALIDATE_CACHE_TTL
+    VALIDATE_CACHE_TTL = config.get_option(options, 'validate_cache_ttl',
+        type='int', default=VALIDATE_CACHE_TTL)
+    global ADMIN_CACHE_SIZE
+    ADMIN_CACHE_SIZE = config.get_option(options, 'admin_cache_size',
+        type='int', default=ADMIN_CACHE_SIZE)
+    global ADMIN_CACHE_TTL
+    ADMIN_CACHE_TTL = config.get_option(options, 'admin_cache_ttl',
+        type='int', default=ADMIN_CACHE_TTL)
+    global TOKEN_PURGE_INTERVAL
+    TOKEN_PURGE_INTERVAL = config.get_option(options, 'token_purge_interval',
+        type='int', default=TOKEN_PURGE_INTERVAL)
+    global TOKEN_PURGE_BATCH_SIZE
+    TOKEN_PURGE_BATCH_SIZE = config.get_option(options,
+        'token_purge_batch_size', type='int', default=TOKEN_PURGE_BATCH_SIZE)
+
+
+def purge_expired_tokens(batch_size=None):
+    """Delete every expired token, batch_size tokens at a time.
+
+    Yields to other greenthreads between batches so a large backlog does not
+    stall request handling. Returns the number of tokens deleted.
+    """
+    batch_size = batch_size or TOKEN_PURGE_BATCH_SIZE
+    now = datetime.now()
+    total = 0
+    while True:
+        deleted = api.token.delete_expired(now, batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
+        eventlet.sleep(0)
+
+
+def _purge_tokens_forever(interval):
+    while True:
+        eventlet.sleep(interval)
+        try:
+            deleted = purge_expired_tokens()
+            logging.debug("Purged %s expired tokens", deleted)
+        except Exception:
+            logging.exception("Failed to purge expired tokens")
+
+
+def start_token_purge():
+    """Spawn the greenthread purging expired tokens, if one is configured.
+
+    Returns the greenthread, or None when token_purge_interval is 0.
+    """
+    if TOKEN_PURGE_INTERVAL <= 0:
+        return None
+    return eventlet.spawn(_purge_tokens_forever, TOKEN_PURGE_INTERVAL)
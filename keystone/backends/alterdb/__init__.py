@@ -18,11 +18,12 @@
 import ast
 import logging
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import joinedload, aliased, sessionmaker
 
 from keystone.common import config
 from keystone.backends.alterdb import models
+from keystone.backends.sqlalchemy import pool, request_session, \
+    ThreadedAPI, THREADED_ENGINES
 import keystone.utils as utils
 import keystone.backends.api as top_api
 import keystone.backends.models as top_models
@@ -47,10 +48,9 @@ def configure_backend(options):
             options, 'debug', type='bool', default=False)
         verbose = config.get_option(
             options, 'verbose', type='bool', default=False)
-        timeout = config.get_option(
-            options, 'sql_idle_timeout', type='int', default=3600)
-        _ENGINE = create_engine(options['sql_connection'],
-                                pool_recycle=timeout)
+        _ENGINE = pool.create_pooled_engine(options)
+        if pool.use_tpool(options):
+            THREADED_ENGINES.add(_ENGINE)
         logger = logging.getLogger('sqlalchemy.engine')
         if debug:
             logger.setLevel(logging.DEBUG)
@@ -60,14 +60,28 @@ def configure_backend(options):
 
 
 def get_session(autocommit=True, expire_on_commit=False):
-    """Helper method to grab session"""
+    """Helper method to grab session
+
+    Within a request this is the request's session, see
+    keystone.backends.sqlalchemy.begin_request.
+    """
     global _MAKER, _ENGINE
     if not _MAKER:
         assert _ENGINE
         _MAKER = sessionmaker(bind=_ENGINE,
                               autocommit=autocommit,
                               expire_on_commit=expire_on_commit)
-    return _MAKER()
+    session = request_session(_MAKER, _ENGINE)
+    if session is None:
+        session = _MAKER()
+    return session
+
+
+def threaded(api):
+    """api, or a ThreadedAPI over it when sql_use_tpool is set"""
+    if _ENGINE in THREADED_ENGINES:
+        return ThreadedAPI(api)
+    return api
 
 
 def register_models(options):
@@ -83,7 +97,7 @@ def register_models(options):
         top_models.set_value(supported_alchemy_model, model)
         if model.__api__ != None:
             model_api = utils.import_module(API_PREFIX + model.__api__)
-            top_api.set_value(model.__api__, model_api.get())
+            top_api.set_value(model.__api__, threaded(model_api.get()))
     creation_tables = []
     for table in reversed(BASE.metadata.sorted_tables):
         if table in supported_alchemy_tables:
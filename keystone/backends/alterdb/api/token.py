@@ -59,6 +59,25 @@ class TokenAPI(BaseTokenAPI):
             session = get_session()
         return session.query(models.Token).all()
 
+    def get_multi(self, ids, session=None):
+        if not session:
+            session = get_session()
+        result = session.query(models.Token).\
+            filter(models.Token.id.in_(ids)).all()
+        return dict((token.id, token) for token in result)
+
+    def delete_expired(self, before, limit, session=None):
+        if not session:
+            session = get_session()
+        with session.begin():
+            ids = [row[0] for row in session.query(models.Token.id).
+                   filter(models.Token.expires < before).limit(limit)]
+            if ids:
+                session.query(models.Token).\
+                    filter(models.Token.id.in_(ids)).\
+                    delete(synchronize_session=False)
+        return len(ids)
+
 
 def get():
     return TokenAPI()
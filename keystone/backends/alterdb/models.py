@@ -14,7 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # Not Yet PEP8 standardized
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Index
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import object_mapper
@@ -80,5 +80,9 @@ class Token(Base, KeystoneBase):
     id = Column(String(255), primary_key=True, unique=True)
     user_id = Column(String(255))
     tenant_id = Column(String(255))
-    expires = Column(DateTime)
+    expires = Column(DateTime, index=True)
+
+# Serves get_for_user/get_for_user_by_tenant, which pick the latest token
+Index('ix_token_user_tenant_expires', Token.user_id, Token.tenant_id,
+      Token.expires)
 
@@ -93,6 +93,28 @@ class BaseUserAPI(object):
     def user_groups_get_all(self, user_id):
         raise NotImplementedError
 
+    def get_validation_bundle(self, id, tenant_id):
+        """Fetch what token validation needs to know about a user.
+
+        Returns a tuple of (user, user_tenant, token_tenant, tenant_roles,
+        global_roles) where token_tenant and tenant_roles refer to
+        tenant_id. Backends that can do so should override this with a
+        single round trip; this fallback composes existing calls.
+        """
+        duser = self.get(id)
+        if not duser:
+            return (None, None, None, [], [])
+        user_tenant = None
+        if duser.tenant_id:
+            user_tenant = tenant.get(duser.tenant_id)
+        token_tenant = None
+        tenant_roles = []
+        if tenant_id:
+            token_tenant = tenant.get(tenant_id)
+            tenant_roles = role.ref_get_all_tenant_roles(id, tenant_id)
+        global_roles = role.ref_get_all_global_roles(id)
+        return (duser, user_tenant, token_tenant, tenant_roles, global_roles)
+
 
 class BaseTokenAPI(object):
     def create(self, values):
@@ -113,6 +135,55 @@ class BaseTokenAPI(object):
     def get_all(self):
         raise NotImplementedError
 
+    def delete_expired(self, before, limit):
+        """Delete at most limit tokens that expired before the given time.
+
+        Returns the number of tokens deleted.
+        """
+        raise NotImplementedError
+
+    def get_validation_bundle(self, id):
+        """Fetch a token and everything needed to validate it.
+
+        Returns None for an unknown token, else a tuple of (token, user,
+        user_tenant, token_tenant, tenant_roles, global_roles). See
+        BaseUserAPI.get_validation_bundle.
+        """
+        dtoken = self.get(id)
+        if not dtoken:
+            return None
+        return (dtoken,) + user.get_validation_bundle(dtoken.user_id,
+                                                      dtoken.tenant_id)
+
+    def get_multi(self, ids):
+        """Fetch several tokens, returning a dict of id to token.
+
+        Unknown tokens are left out. Backends that can fetch many tokens
+        in one round trip override this.
+        """
+        tokens = {}
+        for id in ids:
+            dtoken = self.get(id)
+            if dtoken:
+                tokens[id] = dtoken
+        return tokens
+
+    def get_validation_bundles(self, ids):
+        """Fetch the validation bundles of several tokens.
+
+        Returns a dict of token id to get_validation_bundle tuple, leaving
+        out unknown tokens. Tokens of the same user and tenant share one
+        user lookup.
+        """
+        user_bundles = {}
+        bundles = {}
+        for id, dtoken in self.get_multi(ids).iteritems():
+            key = (dtoken.user_id, dtoken.tenant_id)
+            if key not in user_bundles:
+                user_bundles[key] = user.get_validation_bundle(*key)
+            bundles[id] = (dtoken,) + user_bundles[key]
+        return bundles
+
 
 class BaseTenantGroupAPI(object):
     def create(self, values):
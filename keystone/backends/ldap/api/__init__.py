@@ -1,6 +1,12 @@
+import eventlet
 import ldap
 
+from keystone.common import config
+from keystone.common.cache import LRUCache
+
 from .. import fakeldap
+from ..cache import CachedConnection, poll_changes
+from ..pool import ConnectionPool, PooledConnection
 from .tenant import TenantAPI
 from .user import UserAPI
 from .role import RoleAPI
@@ -12,14 +18,43 @@ class API(object):
         self.LDAP_URL = options['ldap_url']
         self.LDAP_USER = options['ldap_user']
         self.LDAP_PASSWORD = options['ldap_password']
+        # fakeldap has no server side sort; real servers are assumed to
+        # until they turn the sort control down
+        self.server_sort = not self.LDAP_URL.startswith('fake://')
+        self.pool = ConnectionPool(self._connect,
+            max_size=config.get_option(options, 'ldap_pool_size',
+                                       type='int', default=10),
+            idle_timeout=config.get_option(options, 'ldap_pool_idle_timeout',
+                                           type='int', default=60),
+            check_interval=config.get_option(options,
+                'ldap_pool_check_interval', type='int', default=10))
+        # searches are cached when ldap_cache_ttl is set
+        self.cache = LRUCache(
+            config.get_option(options, 'ldap_cache_size',
+                              type='int', default=1000),
+            config.get_option(options, 'ldap_cache_ttl',
+                              type='int', default=0))
         self.tenant = TenantAPI(self, options)
         self.user = UserAPI(self, options)
         self.role = RoleAPI(self, options)
-    
-    def get_connection(self):
+        poll_interval = config.get_option(options, 'ldap_cache_poll_interval',
+                                          type='int', default=0)
+        if self.cache.enabled and poll_interval > 0:
+            bases = set([self.tenant.tree_dn, self.user.tree_dn,
+                         self.role.tree_dn])
+            eventlet.spawn_n(poll_changes, PooledConnection(self.pool),
+                             self.cache, bases, poll_interval)
+
+    def _connect(self):
         if self.LDAP_URL.startswith('fake://'):
             conn = fakeldap.initialize(self.LDAP_URL)
         else:
             conn = ldap.initialize(self.LDAP_URL)
         conn.simple_bind_s(self.LDAP_USER, self.LDAP_PASSWORD)
         return conn
+
+    def get_connection(self):
+        conn = PooledConnection(self.pool)
+        if self.cache.enabled:
+            return CachedConnection(conn, self.cache)
+        return conn
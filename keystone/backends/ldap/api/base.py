@@ -1,6 +1,45 @@
 import ldap
+import ldap.filter
+import logging
 from itertools import izip, count
 
+from ..controls import sort_control, page_control, page_cookie
+
+LOG = logging.getLogger('keystone.backends.ldap.api.base')
+
+# attribute list asking the server for no attributes at all (RFC 4511)
+NO_ATTRS = ['1.1']
+
+# what servers answer a sort on cn they can't do, e.g. for want of an
+# ordering rule for it
+SORT_ERRORS = (ldap.UNAVAILABLE_CRITICAL_EXTENSION,
+               ldap.INAPPROPRIATE_MATCHING, ldap.UNWILLING_TO_PERFORM)
+
+def normalize_dn(dn):
+    """One spelling of dn for comparisons, as servers compare DNs without
+    regard to case or to spacing around the separators"""
+    return ldap.dn.dn2str(ldap.dn.str2dn(dn)).lower()
+
+
+def _fold(id):
+    """Sort key of an id, as servers order and compare cn ignoring case"""
+    return id.lower()
+
+
+def _first_page(conn, base, scope, query, attrlist, serverctrls):
+    """Entries of the first page of a paged search, which is then abandoned
+    for the server to drop its paging state"""
+    msgid = conn.search_ext(base, scope, query, attrlist,
+                            serverctrls=serverctrls)
+    _type, res, _msgid, ctrls = conn.result3(msgid)
+    cookie = page_cookie(ctrls)
+    if cookie:
+        # a page size of 0 ends the search (RFC 2696)
+        conn.search_ext_s(base, scope, query, attrlist,
+            serverctrls=serverctrls[:-1] + [page_control(0, cookie)])
+    return res
+
+
 def _get_redirect(cls, method):
     def inner(self, *args):
         return getattr(cls(), method)(*args)
@@ -27,8 +66,11 @@ class BaseLdapAPI(object):
     def _id_to_dn(self, id):
         return 'cn=%s,%s' % (ldap.dn.escape_dn_chars(str(id)), self.tree_dn)
 
+    def _dn_to_id(self, dn):
+        return ldap.dn.str2dn(dn)[0][0][1]
+
     def _ldap_res_to_model(self, res):
-        obj = self.model(id=ldap.dn.str2dn(res[0])[0][0][1])
+        obj = self.model(id=self._dn_to_id(res[0]))
         for k in obj:
             if k in self.attribute_ignore:
                 continue
@@ -66,16 +108,21 @@ class BaseLdapAPI(object):
         except IndexError:
             return None
 
-    def _ldap_get_all(self, filter=None):
+    def _ldap_get_all(self, filter=None, attrlist=None):
         conn = self.api.get_connection()
         query = '(objectClass=%s)' % (self.object_class,)
         if filter is not None:
             query = '(&%s%s)' % (filter, query)
         try:
-            return conn.search_s(self.tree_dn, ldap.SCOPE_ONELEVEL, query)
+            return conn.search_s(self.tree_dn, ldap.SCOPE_ONELEVEL, query,
+                                 attrlist)
         except ldap.NO_SUCH_OBJECT:
             return []
 
+    def _ldap_res_to_models(self, results):
+        """Models of a whole search result"""
+        return map(self._ldap_res_to_model, results)
+
     def get(self, id, filter=None):
         res = self._ldap_get(id, filter)
         if res is None:
@@ -84,35 +131,91 @@ class BaseLdapAPI(object):
             return self._ldap_res_to_model(res)
 
     def get_all(self, filter=None):
-        return map(self._ldap_res_to_model, self._ldap_get_all(filter))
+        return self._ldap_res_to_models(self._ldap_get_all(filter))
+
+    def get_multi(self, ids):
+        """Objects of ids, in that order, from a single search"""
+        if not ids:
+            return []
+        query = '(|%s)' % ''.join('(cn=%s)' %
+            (ldap.filter.escape_filter_chars(str(id)),) for id in ids)
+        objs = dict((obj.id, obj) for obj in self.get_all(query))
+        return [objs[id] for id in ids if id in objs]
     
+    def _ldap_get_sorted(self, marker, limit, descending=False,
+                         inclusive=False, attrlist=None):
+        """Up to limit entries after marker in id order, sorted by the server
+
+        With descending, the entries before marker in reverse id order.
+        Returns None when the server can't sort, for the caller to fall back
+        on sorting the whole tree itself.
+        """
+        if not self.api.server_sort:
+            return None
+        query = '(objectClass=%s)' % (self.object_class,)
+        if marker is not None:
+            marker = ldap.filter.escape_filter_chars(marker)
+            if descending:
+                query = '(&(!(cn>=%s))%s)' % (marker, query)
+            elif inclusive:
+                query = '(&(cn>=%s)%s)' % (marker, query)
+            else:
+                query = '(&(!(cn<=%s))%s)' % (marker, query)
+        conn = self.api.get_connection()
+        try:
+            # a single page of the sorted result; the rest is never sent
+            return conn.run(_first_page, self.tree_dn, ldap.SCOPE_ONELEVEL,
+                query, attrlist, [sort_control('cn', descending),
+                                  page_control(limit)])
+        except ldap.NO_SUCH_OBJECT:
+            return []
+        except SORT_ERRORS, e:
+            LOG.warn("LDAP server does not sort or page search results on "
+                     "cn (%s), listing whole trees instead" % (e,))
+            self.api.server_sort = False
+            return None
+
     def get_page(self, marker, limit):
-        return self._get_page(marker, limit, self.get_all())
-    
+        res = self._ldap_get_sorted(marker, limit)
+        if res is None:
+            return self._get_page(marker, limit, self.get_all())
+        return self._get_page(marker, limit, self._ldap_res_to_models(res))
+
     def get_page_markers(self, marker, limit):
-        return self._get_page_markers(marker, limit, self.get_all())
+        # The markers only depend on the limit + 2 ids on either side of
+        # marker, so that window stands in for the whole tree
+        above = self._ldap_get_sorted(marker, limit + 2, inclusive=True,
+                                      attrlist=NO_ATTRS)
+        below = []
+        if above is not None and marker is not None:
+            below = self._ldap_get_sorted(marker, limit + 2, descending=True,
+                                          attrlist=NO_ATTRS)
+        if above is None or below is None:
+            return self._get_page_markers(marker, limit, self.get_all())
+        ids = [self._dn_to_id(dn) for dn, _attrs in below + above]
+        return self._get_page_markers(marker, limit, ids, key=lambda id: id)
 
     def _get_page(self, marker, limit, lst, key=lambda e:e.id):
-        lst.sort(key=key)
+        lst.sort(key=lambda e: _fold(key(e)))
         if not marker:
             return lst[:limit]
         else:
-            return filter(lambda e: key(e) > marker, lst)[:limit]
+            marker = _fold(marker)
+            return filter(lambda e: _fold(key(e)) > marker, lst)[:limit]
     
     def _get_page_markers(self, marker, limit, lst, key=lambda e:e.id):
         if len(lst) < limit:
             return (None, None)
-        lst.sort(key=key)
+        lst.sort(key=lambda e: _fold(key(e)))
         if marker is None:
             if len(lst) <= limit + 1:
                 nxt = None
             else:
                 nxt = key(lst[limit])
             return (None, nxt)
+        marker = _fold(marker)
         for i, item in izip(count(), lst):
-            k = key(item)
-            if k >= marker:
-                exact = k == marker
+            if _fold(key(item)) >= marker:
                 break
         if i <= limit:
             prv = None
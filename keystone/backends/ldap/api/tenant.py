@@ -4,7 +4,7 @@ from keystone.backends.api import BaseTenantAPI
 from keystone.backends.sqlalchemy.api.tenant import TenantAPI as SQLTenantAPI
 
 from .. import models
-from .base import  BaseLdapAPI, add_redirects
+from .base import  BaseLdapAPI, add_redirects, normalize_dn
 
 class TenantAPI(BaseLdapAPI, BaseTenantAPI):
     DEFAULT_TREE_DN = 'ou=Groups,dc=example,dc=com'
@@ -18,6 +18,25 @@ class TenantAPI(BaseLdapAPI, BaseTenantAPI):
         query = '(member=%s)' % (user_dn,)
         return self.get_all(query)
 
+    def get_user_tenant_ids(self, user_ids):
+        """Ids of the tenants of each of user_ids, from a single search"""
+        user_dns = dict((self.api.user._id_to_dn(id), id) for id in user_ids)
+        res = dict((id, []) for id in user_ids)
+        if not user_dns:
+            return res
+        query = '(|%s)' % ''.join('(member=%s)' %
+            (ldap.filter.escape_filter_chars(dn),) for dn in user_dns)
+        # the server matched the members however their DNs are spelled
+        user_ids_by_dn = dict((normalize_dn(dn), id)
+                              for dn, id in user_dns.iteritems())
+        for tenant_dn, attrs in self._ldap_get_all(query, ['member']):
+            tenant_id = self._dn_to_id(tenant_dn)
+            for user_dn in attrs.get('member', []):
+                user_id = user_ids_by_dn.get(normalize_dn(user_dn))
+                if user_id is not None:
+                    res[user_id].append(tenant_id)
+        return res
+
     def tenants_for_user_get_page(self, user, marker, limit):
         return self._get_page(marker, limit, self.get_user_tenants(user.id))
     
@@ -45,9 +64,8 @@ class TenantAPI(BaseLdapAPI, BaseTenantAPI):
 
     def get_users(self, tenant_id):
         tenant = self._ldap_get(tenant_id)
-        res = []
-        for user_dn in tenant[1].get('member',[]):
-            res.append(self.api.user.get(ldap.dn.str2dn(user_dn)[0][0][1]))
-        return res
+        user_ids = [self.api.user._dn_to_id(user_dn)
+                    for user_dn in tenant[1].get('member', [])]
+        return self.api.user.get_multi(user_ids)
 
     add_redirects(locals(), SQLTenantAPI, ['get_all_endpoints'])
@@ -22,11 +22,18 @@ class UserAPI(BaseLdapAPI, BaseUserAPI):
             values.password = utils.get_hashed_password(values.password)
 
     def _ldap_res_to_model(self, res):
-        obj = super(UserAPI, self)._ldap_res_to_model(res)
-        tenants = self.api.tenant.get_user_tenants(obj.id)
-        if len(tenants) > 0:
-            obj.tenant_id = tenants[0].id
-        return obj
+        return self._ldap_res_to_models([res])[0]
+
+    def _ldap_res_to_models(self, results):
+        # the tenants of all the users come from one search, joined here
+        objs = [super(UserAPI, self)._ldap_res_to_model(res)
+                for res in results]
+        tenant_ids = self.api.tenant.get_user_tenant_ids(
+            [obj.id for obj in objs])
+        for obj in objs:
+            if len(tenant_ids[obj.id]) > 0:
+                obj.tenant_id = tenant_ids[obj.id][0]
+        return objs
 
     def create(self, values):
         self.__check_and_use_hashed_password(values)
@@ -0,0 +1,105 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Read cache of LDAP searches.
+
+Search results are kept in an LRUCache for up to its TTL. A write made
+through a CachedConnection drops the cached searches whose base is the
+written entry or one of its ancestors, i.e. every search that may have
+returned it. Writes made by other systems are picked up by poll_changes,
+which looks for entries with a recent modifyTimestamp; entries others
+delete are only noticed once the TTL runs out. Callers get copies of the
+cached results, so they may change them.
+"""
+
+import copy
+import logging
+import time
+
+import eventlet
+import ldap
+
+LOG = logging.getLogger('keystone.backends.ldap.cache')
+
+SEARCHES = ('search_s', 'search_ext_s')
+WRITES = ('add_s', 'modify_s', 'delete_s', 'modrdn_s', 'rename_s')
+
+
+def _freeze(value):
+    """Hashable stand-in for a search argument"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if hasattr(value, 'getEncodedTuple'):
+        # request controls
+        return value.getEncodedTuple()
+    return value
+
+
+def invalidate(cache, dn):
+    """Drop the cached searches that may have returned dn"""
+    dn = dn.lower()
+    cache.delete_matching(lambda key, _res: dn == key[0] or
+                                            dn.endswith(',' + key[0]))
+
+
+class CachedConnection(object):
+    """Stand-in for an LDAP connection serving searches from cache"""
+
+    def __init__(self, conn, cache):
+        self.conn = conn
+        self.cache = cache
+
+    def __getattr__(self, name):
+        method = getattr(self.conn, name)
+        if name in SEARCHES:
+            def call(base, *args, **kwargs):
+                key = (base.lower(), name, _freeze(args),
+                       _freeze(sorted(kwargs.items())))
+                res = self.cache.get(key)
+                if res is None:
+                    res = method(base, *args, **kwargs)
+                    self.cache.set(key, res)
+                return copy.deepcopy(res)
+        elif name in WRITES:
+            def call(dn, *args, **kwargs):
+                try:
+                    return method(dn, *args, **kwargs)
+                finally:
+                    invalidate(self.cache, dn)
+        else:
+            return method
+        return call
+
+
+def poll_once(conn, cache, bases, since):
+    """Invalidate the entries under bases modified since (an epoch time)"""
+    query = '(modifyTimestamp>=%s)' % (
+        time.strftime('%Y%m%d%H%M%SZ', time.gmtime(since)),)
+    for base in bases:
+        for dn, _attrs in conn.search_s(base, ldap.SCOPE_SUBTREE, query,
+                                        ['1.1']):
+            invalidate(cache, dn)
+
+
+def poll_changes(conn, cache, bases, interval):
+    """Run poll_once every interval seconds, forever"""
+    while True:
+        eventlet.sleep(interval)
+        # the overlap absorbs clock skew between us and the server
+        try:
+            poll_once(conn, cache, bases, time.time() - 2 * interval)
+        except Exception:
+            LOG.exception("Failed to poll LDAP for changes")
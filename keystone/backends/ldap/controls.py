@@ -0,0 +1,101 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""LDAP request controls for ordered, bounded searches.
+
+The control values are BER encoded here and handed to python-ldap already
+encoded, which every python-ldap release accepts the same way.
+"""
+
+from ldap.controls import LDAPControl
+
+# RFC 2891 server side sort
+SORT_OID = '1.2.840.113556.1.4.473'
+# RFC 2696 simple paged results
+PAGE_OID = '1.2.840.113556.1.4.319'
+
+
+def _length(n):
+    if n < 0x80:
+        return chr(n)
+    octets = ''
+    while n:
+        octets = chr(n & 0xff) + octets
+        n >>= 8
+    return chr(0x80 | len(octets)) + octets
+
+
+def _tlv(tag, value):
+    return chr(tag) + _length(len(value)) + value
+
+
+def _integer(n):
+    octets = ''
+    while True:
+        octets = chr(n & 0xff) + octets
+        if n < 0x80:
+            return _tlv(0x02, octets)
+        n >>= 8
+
+
+def sort_control(attr, reverse=False):
+    """Ask the server to sort the entries on attr"""
+    key = _tlv(0x04, attr)
+    if reverse:
+        # reverseOrder [1] BOOLEAN
+        key += _tlv(0x81, '\xff')
+    return LDAPControl(SORT_OID, True, None, _tlv(0x30, _tlv(0x30, key)))
+
+
+def page_control(size, cookie=''):
+    """Ask the server for at most size entries, from cookie on"""
+    return LDAPControl(PAGE_OID, True, None,
+                       _tlv(0x30, _integer(size) + _tlv(0x04, cookie)))
+
+
+def _read_tlv(data, offset=0):
+    """Tag and value of the BER element at offset, and the offset after it"""
+    tag, length = ord(data[offset]), ord(data[offset + 1])
+    offset += 2
+    if length & 0x80:
+        octets = data[offset:offset + (length & 0x7f)]
+        offset += len(octets)
+        length = 0
+        for octet in octets:
+            length = length << 8 | ord(octet)
+    return tag, data[offset:offset + length], offset + length
+
+
+def page_cookie(controls):
+    """Cookie of the paged results control among the controls of a search
+    response, '' once the server has sent the last page"""
+    for control in controls or []:
+        if isinstance(control, tuple):
+            oid, _criticality, value = control
+        else:
+            oid = control.controlType
+            if hasattr(control, 'cookie'):
+                # python-ldap 2.4 decodes the controls it knows
+                if oid == PAGE_OID:
+                    return control.cookie
+                continue
+            value = getattr(control, 'encodedControlValue', None) or \
+                control.controlValue
+        if oid == PAGE_OID:
+            _tag, sequence, _end = _read_tlv(value)
+            _tag, _size, end = _read_tlv(sequence)
+            return _read_tlv(sequence, end)[1]
+    return ''
@@ -31,6 +31,9 @@ from ldap import (dn, filter, modlist,
     SCOPE_BASE, SCOPE_ONELEVEL, SCOPE_SUBTREE, MOD_ADD, MOD_DELETE, MOD_REPLACE,
     NO_SUCH_OBJECT, OBJECT_CLASS_VIOLATION, SERVER_DOWN, NO_SUCH_ATTRIBUTE,
     ALREADY_EXISTS)
+from ldap.dn import str2dn
+
+from keystone.common.cache import LRUCache
 
 
 scope_names = {
@@ -48,28 +51,51 @@ def initialize(uri):
     return FakeLDAP(uri)
 
 
-def _match_query(query, attrs):
-    """Match an ldap query to an attribute dictionary.
+# The most recently parsed queries and their parts; a parse never goes
+# stale, so the TTL just has to be long.
+_parsed_queries = LRUCache(max_size=1000, ttl=86400)
+
+
+def _parse_query(query):
+    """Parse an ldap query into nested (operator, operands) tuples.
 
     The characters &, |, and ! are supported in the query. No syntax checking
-    is performed, so malformed querys will not work correctly.
+    is performed, so malformed querys will not work correctly. The most
+    recently parsed queries are remembered.
     """
+    parsed = _parsed_queries.get(query)
+    if parsed is not None:
+        return parsed
     # cut off the parentheses
     inner = query[1:-1]
-    if inner.startswith('&'):
-        # cut off the &
-        l, r = _paren_groups(inner[1:])
-        return _match_query(l, attrs) and _match_query(r, attrs)
-    if inner.startswith('|'):
-        # cut off the |
-        l, r = _paren_groups(inner[1:])
-        return _match_query(l, attrs) or _match_query(r, attrs)
-    if inner.startswith('!'):
+    if inner.startswith('&') or inner.startswith('|'):
+        # cut off the & or |
+        parsed = (inner[0], [_parse_query(q)
+                             for q in _paren_groups(inner[1:])])
+    elif inner.startswith('!'):
         # cut off the ! and the nested parentheses
-        return not _match_query(query[2:-1], attrs)
+        parsed = ('!', _parse_query(query[2:-1]))
+    else:
+        (k, _sep, v) = inner.partition('=')
+        parsed = ('=', (k, v))
+    _parsed_queries.set(query, parsed)
+    return parsed
+
+
+def _match_parsed(parsed, attrs):
+    op, operands = parsed
+    if op == '&':
+        return all(_match_parsed(q, attrs) for q in operands)
+    if op == '|':
+        return any(_match_parsed(q, attrs) for q in operands)
+    if op == '!':
+        return not _match_parsed(operands, attrs)
+    return _match(operands[0], operands[1], attrs)
 
-    (k, _sep, v) = inner.partition('=')
-    return _match(k, v, attrs)
+
+def _match_query(query, attrs):
+    """Match an ldap query to an attribute dictionary."""
+    return _match_parsed(_parse_query(query), attrs)
 
 
 def _paren_groups(source):
@@ -120,6 +146,98 @@ def _subs(value):
     return [value]
 
 
+class MemoryDB(dict):
+    """In-memory directory with equality indexes on a few attributes.
+
+    Stands in for the shelve of a FakeLDAP connection, for test and dev
+    runs that need no persistence. Like a shelve, it hands out copies of
+    the entries.
+    """
+
+    INDEXED = ('objectClass', 'member', 'mail')
+
+    def __init__(self):
+        dict.__init__(self)
+        self.indexes = dict((attr, {}) for attr in self.INDEXED)
+
+    def __getitem__(self, key):
+        return dict((k, list(v))
+                    for k, v in dict.__getitem__(self, key).iteritems())
+
+    def __setitem__(self, key, entry):
+        if key in self:
+            self._unindex(key)
+        dict.__setitem__(self, key, entry)
+        for attr, index in self.indexes.iteritems():
+            for value in entry.get(attr, []):
+                index.setdefault(value, set()).add(key)
+
+    def __delitem__(self, key):
+        self._unindex(key)
+        dict.__delitem__(self, key)
+
+    def _unindex(self, key):
+        entry = dict.__getitem__(self, key)
+        for attr, index in self.indexes.iteritems():
+            for value in entry.get(attr, []):
+                keys = index[value]
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def clear(self):
+        dict.clear(self)
+        for index in self.indexes.itervalues():
+            index.clear()
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+    def candidates(self, parsed):
+        """Keys of the entries that may match a parsed query, or None when
+        the indexes can't tell and every entry needs looking at"""
+        op, operands = parsed
+        if op == '=':
+            attr, value = operands
+            if attr in self.indexes and value != '*':
+                return self.indexes[attr].get(value, set())
+            return None
+        if op == '&':
+            keys = None
+            for q in operands:
+                found = self.candidates(q)
+                if found is not None:
+                    keys = found if keys is None else keys & found
+            return keys
+        if op == '|':
+            keys = set()
+            for q in operands:
+                found = self.candidates(q)
+                if found is None:
+                    return None
+                keys = keys | found
+            return keys
+        return None
+
+    def iteritems(self, query=None):
+        """Entries that may match query, in key order"""
+        keys = None
+        if query:
+            keys = self.candidates(_parse_query(query))
+        if keys is None:
+            keys = self.iterkeys()
+        for key in sorted(keys):
+            yield key, dict.__getitem__(self, key)
+
+
+# The directory shared by all the connections to MEMORY_URL
+MEMORY_URL = 'fake://:memory:'
+memory_db = MemoryDB()
+
+
 server_fail = False
 
 
@@ -128,7 +246,10 @@ class FakeLDAP(object):
 
     def __init__(self, url):
         LOG.debug("FakeLDAP initialize url=%s" % (url,))
-        self.db = shelve.open(url[7:])
+        if url == MEMORY_URL:
+            self.db = memory_db
+        else:
+            self.db = shelve.open(url[7:])
 
     def simple_bind_s(self, dn, password):
         """This method is ignored, but provided for compatibility."""
@@ -136,6 +257,12 @@ class FakeLDAP(object):
             raise SERVER_DOWN
         LOG.debug("FakeLDAP bind dn=%s" % (dn,))
 
+    def whoami_s(self):
+        """This method is ignored, but provided for compatibility."""
+        if server_fail:
+            raise SERVER_DOWN
+        return ''
+
     def unbind_s(self):
         """This method is ignored, but provided for compatibility."""
         if server_fail:
@@ -153,8 +280,12 @@ class FakeLDAP(object):
             LOG.error("FakeLDAP add item failed: dn '%s' is already in store." %
                         (dn,))
             raise ALREADY_EXISTS
-        self.db[key] = dict([(k, v if isinstance(v, list) else [v])
-                             for k, v in attrs])
+        entry = dict([(k, v if isinstance(v, list) else [v])
+                      for k, v in attrs])
+        # like a real server, keep the naming attribute in the entry
+        rdn_type, rdn_value, _flags = str2dn(dn)[0][0]
+        entry.setdefault(rdn_type, [rdn_value])
+        self.db[key] = entry
         self.db.sync()
 
     def delete_s(self, dn):
@@ -248,13 +379,15 @@ class FakeLDAP(object):
                 raise NO_SUCH_OBJECT
             results = [(dn, item_dict)]
         elif scope == SCOPE_SUBTREE:
+            under = re.compile("%s.*,%s" % (self.__prefix, dn))
             results = [(k[len(self.__prefix):], v)
-                       for k, v in self.db.iteritems()
-                       if re.match("%s.*,%s" % (self.__prefix, dn), k)]
+                       for k, v in self.__entries(query)
+                       if under.match(k)]
         elif scope == SCOPE_ONELEVEL:
+            under = re.compile("%s\w+=[^,]+,%s" % (self.__prefix, dn))
             results = [(k[len(self.__prefix):], v)
-                       for k, v in self.db.iteritems()
-                       if re.match("%s\w+=[^,]+,%s" % (self.__prefix, dn), k)]
+                       for k, v in self.__entries(query)
+                       if under.match(k)]
         else:
             LOG.error("FakeLDAP search fail: unknown scope %s" % (scope,))
             raise NotImplementedError("Search scope %s not implemented." % 
@@ -265,13 +398,19 @@ class FakeLDAP(object):
             # filter the objects by query
             if not query or _match_query(query, attrs):
                 # filter the attributes by fields
-                attrs = dict([(k, v) for k, v in attrs.iteritems()
+                attrs = dict([(k, list(v)) for k, v in attrs.iteritems()
                               if not fields or k in fields])
                 objects.append((dn, attrs))
             # pylint: enable=E1103
-        LOG.debug("FakeLDAP search result: %s" % (objects,))
+        LOG.debug("FakeLDAP search result: %s", objects)
         return objects
 
+    def __entries(self, query):
+        if isinstance(self.db, MemoryDB):
+            # only the entries the indexes can't rule out
+            return self.db.iteritems(query)
+        return self.db.iteritems()
+
     @property
     def __prefix(self):  # pylint: disable=R0201
         """Get the prefix to use for all keys."""
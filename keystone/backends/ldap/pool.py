@@ -0,0 +1,145 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Pool of bound LDAP connections.
+
+Every call made on a PooledConnection checks a bound connection out of the
+pool for the calling greenthread, runs on it and hands it back, so nested
+lookups never hold more than one connection each.
+"""
+
+import logging
+import time
+
+from eventlet import semaphore
+import ldap
+
+LOG = logging.getLogger('keystone.backends.ldap.pool')
+
+
+class ConnectionPool(object):
+    """At most `max_size` bound connections made by `connect`.
+
+    Callers beyond `max_size` wait for a connection to come back. Idle
+    connections older than `idle_timeout` seconds are unbound rather than
+    reused, since servers commonly drop them, and those idle for
+    `check_interval` seconds or more are checked with a whoami request
+    first. When a call finds the server down all the same, the idle
+    connections are dropped and the call is made once more on a fresh
+    connection.
+    """
+
+    def __init__(self, connect, max_size=10, idle_timeout=60,
+                 check_interval=10):
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.idle = []
+        self.slots = semaphore.Semaphore(max_size)
+        self.created = 0
+        self.reused = 0
+
+    def get(self):
+        """Check out a bound connection, waiting for one if need be"""
+        self.slots.acquire()
+        now = time.time()
+        while self.idle:
+            conn, released = self.idle.pop()
+            idle = now - released
+            if idle < self.idle_timeout and \
+                    (idle < self.check_interval or self._alive(conn)):
+                self.reused += 1
+                return conn
+            self._unbind(conn)
+        try:
+            conn = self.connect()
+        except Exception:
+            self.slots.release()
+            raise
+        self.created += 1
+        return conn
+
+    def put(self, conn):
+        """Check a healthy connection back in"""
+        self.idle.append((conn, time.time()))
+        self.slots.release()
+
+    def discard(self, conn):
+        """Check a broken connection back in, unbinding it"""
+        self._unbind(conn)
+        self.slots.release()
+
+    def clear(self):
+        while self.idle:
+            conn, _released = self.idle.pop()
+            self._unbind(conn)
+
+    def call(self, method, *args, **kwargs):
+        """Run a connection method, or a function taking the connection
+        first, on a pooled connection"""
+        for retry in (False, True):
+            conn = self.get()
+            healthy = True
+            try:
+                if callable(method):
+                    return method(conn, *args, **kwargs)
+                return getattr(conn, method)(*args, **kwargs)
+            except ldap.SERVER_DOWN:
+                healthy = False
+                self.discard(conn)
+                # the idle connections went down with the server
+                self.clear()
+                if retry:
+                    raise
+                LOG.debug("LDAP server down, retrying %s on a new "
+                          "connection" % (method,))
+            finally:
+                if healthy:
+                    self.put(conn)
+
+    @staticmethod
+    def _alive(conn):
+        try:
+            conn.whoami_s()
+        except ldap.LDAPError:
+            LOG.debug("Dropping a dead LDAP connection")
+            return False
+        return True
+
+    @staticmethod
+    def _unbind(conn):
+        try:
+            conn.unbind_s()
+        except ldap.LDAPError:
+            pass
+
+
+class PooledConnection(object):
+    """Stand-in for an LDAP connection running each call on the pool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            return self.pool.call(name, *args, **kwargs)
+        return call
+
+    def run(self, func, *args, **kwargs):
+        """func(connection, *args, **kwargs), on a single connection of the
+        pool for requests that must share one"""
+        return self.pool.call(func, *args, **kwargs)
@@ -16,10 +16,12 @@
 #    under the License.
 
 import ast
+import bisect
+import hashlib
 import logging
+import time
 
 from keystone.common import config
-from keystone.backends.alterdb import models
 import keystone.utils as utils
 import keystone.backends.api as top_api
 import keystone.backends.models as top_models
@@ -29,6 +31,8 @@ MODEL_PREFIX = 'keystone.backends.memcache.models.'
 API_PREFIX = 'keystone.backends.memcache.api.'
 MEMCACHE_SERVER = None
 CACHE_TIME = 86400
+# memcached reads expiry times beyond 30 days as absolute epoch times
+MAX_RELATIVE_EXPIRY = 30 * 86400
 
 
 def configure_backend(options):
@@ -42,31 +46,123 @@ def configure_backend(options):
         options, 'cache_time', type='int', default=86400)
 
 
+class HashRing(object):
+    """Consistent hash ring over a list of memcache servers.
+
+    Each server is placed at `replicas` points on the ring and a key goes
+    to the first server point at or after the key's hash, so adding or
+    removing a server only moves the keys next to its points.
+    """
+
+    def __init__(self, hosts, replicas=100):
+        self.hosts = hosts
+        self.ring = {}
+        for host in hosts:
+            for i in range(replicas):
+                self.ring[self._hash('%s-%s' % (host, i))] = host
+        self.points = sorted(self.ring)
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key).hexdigest()[:8], 16)
+
+    def get_host(self, key):
+        index = bisect.bisect(self.points, self._hash(key))
+        return self.ring[self.points[index % len(self.points)]]
+
+
 class Memcache_Server():
     def __init__(self, hosts):
+        if isinstance(hosts, basestring):
+            hosts = [host.strip() for host in hosts.split(',')
+                     if host.strip()]
         self.hosts = hosts
-        self.server = memcache.Client([self.hosts])
+        self.ring = HashRing(hosts)
+        self.servers = dict((host, memcache.Client([host]))
+                            for host in hosts)
+
+    def _server(self, key):
+        return self.servers[self.ring.get_host(key)]
+
+    def _group(self, keys):
+        """Group encoded keys by the server holding them"""
+        grouped = {}
+        for key in keys:
+            key = key.encode('utf-8')
+            grouped.setdefault(self.ring.get_host(key), []).append(key)
+        return grouped
 
-    def set(self, key, value, expiry=CACHE_TIME):
+    def _expiry(self, expiry):
+        """Map seconds to live (default cache_time) to a memcache time"""
+        if expiry is None:
+            expiry = CACHE_TIME
+        if expiry > MAX_RELATIVE_EXPIRY:
+            return int(time.time()) + expiry
+        return expiry
+
+    def set(self, key, value, expiry=None):
         """
         This method is used to set a new value
-        in the memcache server.
+        in the memcache server, for expiry seconds
+        (cache_time when not given)
+        """
+        key = key.encode('utf-8')
+        self._server(key).set(key, value, self._expiry(expiry))
+
+    def set_multi(self, mapping, expiry=None):
+        """
+        This method is used to set several values, one
+        round trip per memcache server involved
+        """
+        values = dict((key.encode('utf-8'), value)
+                      for key, value in mapping.iteritems())
+        for host, keys in self._group(mapping).iteritems():
+            self.servers[host].set_multi(
+                dict((key, values[key]) for key in keys),
+                self._expiry(expiry))
+
+    def add(self, key, value, expiry=None):
+        """
+        This method is used to set a value unless the
+        key is already held in the memcache server
         """
-        self.server.set(key.encode('utf-8'), value, expiry)
+        key = key.encode('utf-8')
+        return self._server(key).add(key, value, self._expiry(expiry))
 
     def get(self, key):
         """
         This method is used to retrieve a value
         from the memcache server
         """
-        return self.server.get(key.encode('utf-8'))
+        key = key.encode('utf-8')
+        return self._server(key).get(key)
+
+    def get_multi(self, keys):
+        """
+        This method is used to retrieve several values, one
+        round trip per memcache server involved
+        """
+        found = {}
+        for host, host_keys in self._group(keys).iteritems():
+            found.update(self.servers[host].get_multi(host_keys))
+        return dict((key, found[key.encode('utf-8')]) for key in keys
+                    if key.encode('utf-8') in found)
 
     def delete(self, key):
         """
         This method is used to delete a value from the
         memcached server. Lazy delete
         """
-        self.server.delete(key.encode('utf-8'))
+        key = key.encode('utf-8')
+        self._server(key).delete(key)
+
+    def delete_multi(self, keys):
+        """
+        This method is used to delete several values, one
+        round trip per memcache server involved
+        """
+        for host, host_keys in self._group(keys).iteritems():
+            self.servers[host].delete_multi(host_keys)
 
 
 def register_models(options):
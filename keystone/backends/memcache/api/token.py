@@ -15,38 +15,79 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from datetime import datetime
+
+from keystone.backends import memcache
 from keystone.backends.api import BaseTokenAPI
+from keystone.backends.memcache.models import encode_token, decode_token
+
+
+def user_key(user_id, tenant_id=None):
+    """Key of the latest token of a user, on a tenant if given"""
+    if tenant_id != None:
+        return tenant_id + "::" + user_id
+    return user_id
+
+
+def cache_token(token, keys, add=False):
+    """Cache token under keys for cache_time, but never past its expiry.
+
+    With add, only under the keys that hold nothing yet.
+    """
+    lifetime = token.expires - datetime.now()
+    expiry = min(memcache.CACHE_TIME,
+                 lifetime.days * 86400 + lifetime.seconds)
+    if expiry <= 0:
+        # memcache would read 0 as "never expires"
+        return
+    data = encode_token(token)
+    if add:
+        for key in keys:
+            memcache.MEMCACHE_SERVER.add(key, data, expiry)
+    else:
+        memcache.MEMCACHE_SERVER.set_multi(dict((key, data) for key in keys),
+                                           expiry)
+
+
+def get_cached(key):
+    return decode_token(memcache.MEMCACHE_SERVER.get(key))
+
+
+def get_cached_multi(keys):
+    tokens = {}
+    for key, data in memcache.MEMCACHE_SERVER.get_multi(keys).iteritems():
+        token = decode_token(data)
+        if token != None:
+            tokens[key] = token
+    return tokens
 
 
 class TokenAPI(BaseTokenAPI):
     def create(self, token):
-        if token.tenant_id != None:
-            tenant_user_key = token.tenant_id + "::" + token.user_id
-        else:
-            tenant_user_key = token.user_id
-        #Setting them for  a day.
-        MEMCACHE_SERVER.set(token.id, token)
-        MEMCACHE_SERVER.set(tenant_user_key, token)
+        cache_token(token, [token.id,
+                            user_key(token.user_id, token.tenant_id)])
 
     def get(self, id, session=None):
-        return  MEMCACHE_SERVER.get(id)
+        return get_cached(id)
+
+    def get_multi(self, ids, session=None):
+        return get_cached_multi(ids)
 
     def delete(self, id, session=None):
-        token = MEMCACHE_SERVER.get(id)
+        token = self.get(id)
         if token != None:
-            MEMCACHE_SERVER.delete(id)
+            memcache.MEMCACHE_SERVER.delete_multi(
+                [id, user_key(token.user_id, token.tenant_id)])
 
-            if token.tenant_id != None:
-                MEMCACHE_SERVER.delete(token.tenant_id + "::" + token.user_id)
-            else:
-                MEMCACHE_SERVER.delete(token.id)
-                MEMCACHE_SERVER.delete(token.user_id)
+    def delete_expired(self, before, limit, session=None):
+        # memcache drops expired entries by itself
+        return 0
 
     def get_for_user(self, user_id, session=None):
-        return MEMCACHE_SERVER.get(user_id)
+        return get_cached(user_key(user_id))
 
     def get_for_user_by_tenant(self, user_id, tenant_id, session=None):
-        return MEMCACHE_SERVER.get(tenant_id + "::" + user_id)
+        return get_cached(user_key(user_id, tenant_id))
 
 
 def get():
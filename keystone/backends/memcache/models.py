@@ -16,5 +16,63 @@
 # Not Yet PEP8 standardized
 
 
-class Token():
+
+from datetime import datetime
+import struct
+import time
+
+# Version byte leading every token stored in memcache
+WIRE_VERSION = 1
+# version, expiry (epoch seconds) and the byte lengths of id, user_id and
+# tenant_id; a tenant_id length of NO_TENANT stands for None
+_HEADER = struct.Struct('!BdHHH')
+NO_TENANT = 0xFFFF
+
+
+class Token(object):
     __api__ = 'token'
+    __slots__ = ('id', 'user_id', 'tenant_id', 'expires')
+
+    def __init__(self, id=None, user_id=None, tenant_id=None, expires=None):
+        self.id = id
+        self.user_id = user_id
+        self.tenant_id = tenant_id
+        self.expires = expires
+
+
+def encode_token(token):
+    """Pack any token model into the memcache wire format"""
+    id = token.id.encode('utf-8')
+    user_id = token.user_id.encode('utf-8')
+    if token.tenant_id is None:
+        tenant_id = ''
+        tenant_length = NO_TENANT
+    else:
+        tenant_id = token.tenant_id.encode('utf-8')
+        tenant_length = len(tenant_id)
+    expires = time.mktime(token.expires.timetuple()) + \
+        token.expires.microsecond / 1e6
+    return _HEADER.pack(WIRE_VERSION, expires, len(id), len(user_id),
+                        tenant_length) + id + user_id + tenant_id
+
+
+def decode_token(data):
+    """Unpack a token from the memcache wire format.
+
+    Returns None for anything else, such as entries written in an older
+    format, so they read as cache misses.
+    """
+    if not isinstance(data, str) or len(data) < _HEADER.size or \
+            ord(data[0]) != WIRE_VERSION:
+        return None
+    (_version, expires, id_length, user_length,
+        tenant_length) = _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    id = data[offset:offset + id_length].decode('utf-8')
+    offset += id_length
+    user_id = data[offset:offset + user_length].decode('utf-8')
+    offset += user_length
+    tenant_id = None
+    if tenant_length != NO_TENANT:
+        tenant_id = data[offset:offset + tenant_length].decode('utf-8')
+    return Token(id, user_id, tenant_id, datetime.fromtimestamp(expires))
@@ -18,16 +18,20 @@
 import ast
 import logging
 
-from sqlalchemy import create_engine
+from eventlet import corolocal, tpool
 from sqlalchemy.orm import joinedload, aliased, sessionmaker
 
 from keystone.common import config
-from keystone.backends.sqlalchemy import models
+from keystone.backends.sqlalchemy import models, pool
 import keystone.utils as utils
 import keystone.backends.api as top_api
 import keystone.backends.models as top_models
 _ENGINE = None
 _MAKER = None
+#Sessions of the request handled by the current greenthread, by engine.
+_REQUEST = corolocal.local()
+#Engines whose work runs in eventlet's thread pool, see ThreadedAPI.
+THREADED_ENGINES = set()
 BASE = models.BASE
 
 MODEL_PREFIX = 'keystone.backends.sqlalchemy.models.'
@@ -47,10 +51,9 @@ def configure_backend(options):
             options, 'debug', type='bool', default=False)
         verbose = config.get_option(
             options, 'verbose', type='bool', default=False)
-        timeout = config.get_option(
-            options, 'sql_idle_timeout', type='int', default=3600)
-        _ENGINE = create_engine(options['sql_connection'],
-                                pool_recycle=timeout)
+        _ENGINE = pool.create_pooled_engine(options)
+        if pool.use_tpool(options):
+            THREADED_ENGINES.add(_ENGINE)
         logger = logging.getLogger('sqlalchemy.engine')
         if debug:
             logger.setLevel(logging.DEBUG)
@@ -60,14 +63,112 @@ def configure_backend(options):
 
 
 def get_session(autocommit=True, expire_on_commit=False):
-    """Helper method to grab session"""
+    """Helper method to grab session
+
+    Within a request (see begin_request) this is the request's session.
+    """
     global _MAKER, _ENGINE
     if not _MAKER:
         assert _ENGINE
         _MAKER = sessionmaker(bind=_ENGINE,
                               autocommit=autocommit,
                               expire_on_commit=expire_on_commit)
-    return _MAKER()
+    session = request_session(_MAKER, _ENGINE)
+    if session is None:
+        session = _MAKER()
+    return session
+
+
+def begin_request():
+    """Scope sessions to the request handled by the current greenthread.
+
+    Until end_request, get_session hands out one session per engine, bound to
+    a single connection and transaction checked out on first use.
+    """
+    _REQUEST.sessions = {}
+
+
+def request_session(maker, engine):
+    """The current request's session on engine, made with maker when first
+    asked for, or None outside of a request."""
+    sessions = getattr(_REQUEST, 'sessions', None)
+    if sessions is None:
+        return None
+    if engine not in sessions:
+        connection = engine.connect()
+        transaction = connection.begin()
+        sessions[engine] = (maker(bind=connection), transaction)
+    return sessions[engine][0]
+
+
+def end_request(commit=True):
+    """Commit, or roll back, the work of the current request and return its
+    connections to their pools."""
+    sessions = getattr(_REQUEST, 'sessions', None)
+    _REQUEST.sessions = None
+    for engine, (session, transaction) in (sessions or {}).items():
+        if engine in THREADED_ENGINES:
+            tpool.execute(_end_session, session, transaction, commit)
+        else:
+            _end_session(session, transaction, commit)
+
+
+def _end_session(session, transaction, commit):
+    connection = session.bind
+    try:
+        # a failed session.begin() block has rolled back already
+        if commit and transaction.is_active:
+            transaction.commit()
+        elif transaction.is_active:
+            transaction.rollback()
+    finally:
+        session.close()
+        connection.close()
+
+
+class ThreadedAPI(object):
+    """Stand-in for a backend API running each call in eventlet's thread
+    pool, so that a query blocks one native thread instead of every
+    greenthread. The call sees the sessions of the calling greenthread's
+    request."""
+
+    def __init__(self, api):
+        self.api = api
+
+    def __getattr__(self, name):
+        method = getattr(self.api, name)
+        if not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            return tpool.execute(_call_in_request,
+                                 getattr(_REQUEST, 'sessions', None),
+                                 method, *args, **kwargs)
+        return call
+
+
+def _call_in_request(sessions, method, *args, **kwargs):
+    # calls made from a pool thread run in it directly, and nest
+    outer = getattr(_REQUEST, 'sessions', None)
+    _REQUEST.sessions = sessions
+    try:
+        return method(*args, **kwargs)
+    finally:
+        _REQUEST.sessions = outer
+
+
+def threaded(api):
+    """api, or a ThreadedAPI over it when sql_use_tpool is set"""
+    if _ENGINE in THREADED_ENGINES:
+        return ThreadedAPI(api)
+    return api
+
+
+def unthreaded(api):
+    """The backend API a ThreadedAPI stands in for, or api itself"""
+    if isinstance(api, ThreadedAPI):
+        return api.api
+    return api
 
 
 def register_models(options):
@@ -83,7 +184,7 @@ def register_models(options):
         top_models.set_value(supported_alchemy_model, model)
         if model.__api__ != None:
             model_api = utils.import_module(API_PREFIX + model.__api__)
-            top_api.set_value(model.__api__, model_api.get())
+            top_api.set_value(model.__api__, threaded(model_api.get()))
     creation_tables = []
     for table in reversed(BASE.metadata.sorted_tables):
         if table in supported_alchemy_tables:
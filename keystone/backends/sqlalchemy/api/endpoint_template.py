@@ -16,6 +16,7 @@
 #    under the License.
 
 from keystone.backends.sqlalchemy import get_session, models, aliased
+from keystone.backends.sqlalchemy.pagination import page_markers
 from keystone.backends.api import BaseEndpointTemplateAPI
 
 
@@ -55,39 +56,8 @@ class EndpointTemplateAPI(BaseEndpointTemplateAPI):
     def get_page_markers(self, marker, limit, session=None):
         if not session:
             session = get_session()
-        first = session.query(models.EndpointTemplates).order_by(\
-                            models.EndpointTemplates.id).first()
-        last = session.query(models.EndpointTemplates).order_by(\
-                            models.EndpointTemplates.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next = session.query(models.EndpointTemplates).filter("id > :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.EndpointTemplates.id).limit(limit).all()
-        prev = session.query(models.EndpointTemplates).filter("id < :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.EndpointTemplates.id.desc()).limit(int(limit)).all()
-        if len(next) == 0:
-            next = last
-        else:
-            for t in next:
-                next = t
-        if len(prev) == 0:
-            prev = first
-        else:
-            for t in prev:
-                prev = t
-        if prev.id == marker:
-            prev = None
-        else:
-            prev = prev.id
-        if next.id == last.id:
-            next = None
-        else:
-            next = next.id
-        return (prev, next)
+        return page_markers(session.query(models.EndpointTemplates.id),
+                            models.EndpointTemplates.id, marker, limit)
     
     def endpoint_get_by_tenant_get_page(self, tenant_id, marker, limit,
                                             session=None):
@@ -109,49 +79,9 @@ class EndpointTemplateAPI(BaseEndpointTemplateAPI):
         if not session:
             session = get_session()
         tba = aliased(models.Endpoints)
-        first = session.query(tba).\
-                        filter(tba.tenant_id == tenant_id).\
-                        order_by(tba.id).first()
-        last = session.query(tba).\
-                    filter(tba.tenant_id == tenant_id).\
-                    order_by(tba.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next = session.query(tba).\
-                    filter(tba.tenant_id == tenant_id).\
-                    filter("id>=:marker").params(
-                    marker='%s' % marker).order_by(
-                    tba.id).limit(int(limit)).all()
-    
-        prev = session.query(tba).\
-                        filter(tba.tenant_id == tenant_id).\
-                        filter("id < :marker").params(
-                        marker='%s' % marker).order_by(
-                        tba.id).limit(int(limit) + 1).all()
-        next_len = len(next)
-        prev_len = len(prev)
-    
-        if next_len == 0:
-            next = last
-        else:
-            for t in next:
-                next = t
-        if prev_len == 0:
-            prev = first
-        else:
-            for t in prev:
-                prev = t
-        if first.id == marker:
-            prev = None
-        else:
-            prev = prev.id
-        if marker == last.id:
-            next = None
-        else:
-            next = next.id
-        return (prev, next)
+        return page_markers(session.query(tba.id).\
+                                filter(tba.tenant_id == tenant_id),
+                            tba.id, marker, limit, inclusive=True)
     
     def endpoint_add(self, values):
         endpoints = models.Endpoints()
@@ -16,6 +16,7 @@
 #    under the License.
 
 from keystone.backends.sqlalchemy import get_session, models
+from keystone.backends.sqlalchemy.pagination import page_markers
 from keystone.backends.api import BaseRoleAPI
 
 class RoleAPI(BaseRoleAPI):
@@ -98,88 +99,17 @@ class RoleAPI(BaseRoleAPI):
     def get_page_markers(self, marker, limit, session=None):
         if not session:
             session = get_session()
-        first = session.query(models.Role).order_by(\
-                            models.Role.id).first()
-        last = session.query(models.Role).order_by(\
-                            models.Role.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = session.query(models.Role).filter("id > :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.Role.id).limit(limit).all()
-        prev_page = session.query(models.Role).filter("id < :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.Role.id.desc()).limit(int(limit)).all()
-        if len(next_page) == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if len(prev_page) == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if prev_page.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if next_page.id == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        return page_markers(session.query(models.Role.id), models.Role.id,
+                            marker, limit)
     
     
     def ref_get_page_markers(self, user_id, marker, limit, session=None):
         if not session:
             session = get_session()
-        first = session.query(models.UserRoleAssociation).filter_by(\
-                                            user_id=user_id).order_by(\
-                            models.UserRoleAssociation.id).first()
-        last = session.query(models.UserRoleAssociation).filter_by(\
-                                            user_id=user_id).order_by(\
-                            models.UserRoleAssociation.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = session.query(models.UserRoleAssociation).\
-            filter_by(user_id=user_id).\
-            filter("id > :marker").\
-            params(marker='%s' % marker).\
-            order_by(models.UserRoleAssociation.id).\
-            limit(limit).\
-            all()
-        prev_page = session.query(models.UserRoleAssociation).\
-            filter_by(user_id=user_id).\
-            filter("id < :marker").\
-            params(marker='%s' % marker).\
-            order_by(models.UserRoleAssociation.id.desc()).\
-            limit(int(limit)).\
-            all()
-        
-        if len(next_page) == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if len(prev_page) == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if prev_page.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if next_page.id == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        return page_markers(
+            session.query(models.UserRoleAssociation.id).\
+                filter_by(user_id=user_id),
+            models.UserRoleAssociation.id, marker, limit)
 
 def get():
     return RoleAPI()
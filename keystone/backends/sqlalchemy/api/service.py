@@ -16,6 +16,7 @@
 #    under the License.
 
 from keystone.backends.sqlalchemy import get_session, models
+from keystone.backends.sqlalchemy.pagination import page_markers
 from keystone.backends.api import BaseServiceAPI
 
 
@@ -55,41 +56,8 @@ class ServiceAPI(BaseServiceAPI):
     def get_page_markers(self, marker, limit, session=None):
         if not session:
             session = get_session()
-        first = session.query(models.Service).order_by(\
-                            models.Service.id).first()
-        last = session.query(models.Service).order_by(\
-                            models.Service.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = session.query(models.Service).\
-                        filter("id > :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.Service.id).limit(limit).all()
-        prev_page = session.query(models.Service).\
-                        filter("id < :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.Service.id.desc()).limit(int(limit)).all()
-        if len(next_page) == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if len(prev_page) == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if prev_page.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if next_page.id == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        return page_markers(session.query(models.Service.id),
+                            models.Service.id, marker, limit)
 
     def delete(self, id, session=None):
         if not session:
@@ -16,6 +16,7 @@
 #    under the License.
 
 from keystone.backends.sqlalchemy import get_session, models, aliased
+from keystone.backends.sqlalchemy.pagination import page, page_markers
 from keystone.backends.api import BaseTenantAPI
 
 class TenantAPI(BaseTenantAPI):
@@ -47,13 +48,7 @@ class TenantAPI(BaseTenantAPI):
         q1 = session.query(tenant).join((ura, ura.tenant_id == tenant.id)).\
             filter(ura.user_id == user.id)
         q2 = session.query(tenant).filter(tenant.id == user.tenant_id)
-        q3 = q1.union(q2)
-        if marker:
-            return q3.filter("tenant.id>:marker").params(\
-                    marker='%s' % marker).order_by(\
-                    tenant.id.desc()).limit(limit).all()
-        else:
-            return q3.order_by(tenant.id.desc()).limit(limit).all()
+        return page(q1.union(q2), tenant.id, marker, limit)
     
     
     def tenants_for_user_get_page_markers(self, user, marker, limit, session=None):
@@ -61,42 +56,10 @@ class TenantAPI(BaseTenantAPI):
             session = get_session()
         ura = aliased(models.UserRoleAssociation)
         tenant = aliased(models.Tenant)
-        q1 = session.query(tenant).join((ura, ura.tenant_id == tenant.id)).\
+        q1 = session.query(tenant.id).join((ura, ura.tenant_id == tenant.id)).\
             filter(ura.user_id == user.id)
-        q2 = session.query(tenant).filter(tenant.id == user.tenant_id)
-        q3 = q1.union(q2)
-    
-        first = q3.order_by(\
-                            tenant.id).first()
-        last = q3.order_by(\
-                            tenant.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = q3.filter(tenant.id > marker).order_by(\
-                        tenant.id).limit(limit).all()
-        prev_page = q3.filter(tenant.id > marker).order_by(\
-                        tenant.id.desc()).limit(int(limit)).all()
-        if len(next_page) == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if len(prev_page) == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if prev_page.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if next_page.id == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        q2 = session.query(tenant.id).filter(tenant.id == user.tenant_id)
+        return page_markers(q1.union(q2), tenant.id, marker, limit)
     
     
     def get_page(self, marker, limit, session=None):
@@ -115,39 +78,8 @@ class TenantAPI(BaseTenantAPI):
     def get_page_markers(self, marker, limit, session=None):
         if not session:
             session = get_session()
-        first = session.query(models.Tenant).order_by(\
-                            models.Tenant.id).first()
-        last = session.query(models.Tenant).order_by(\
-                            models.Tenant.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = session.query(models.Tenant).filter("id > :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.Tenant.id).limit(limit).all()
-        prev_page = session.query(models.Tenant).filter("id < :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.Tenant.id.desc()).limit(int(limit)).all()
-        if len(next_page) == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if len(prev_page) == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if prev_page.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if next_page.id == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        return page_markers(session.query(models.Tenant.id),
+                            models.Tenant.id, marker, limit)
     
     
     def is_empty(self, id, session=None):
@@ -15,7 +15,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from keystone.backends.sqlalchemy import get_session, models
+from keystone.backends.sqlalchemy import get_session, models, unthreaded
+from keystone.backends.sqlalchemy.api import user
+import keystone.backends.api as api
 from keystone.backends.api import BaseTokenAPI
 
 
@@ -63,5 +65,56 @@ class TokenAPI(BaseTokenAPI):
             session = get_session()
         return session.query(models.Token).all()
 
+    def delete_expired(self, before, limit, session=None):
+        if not session:
+            session = get_session()
+        with session.begin():
+            ids = [row[0] for row in session.query(models.Token.id).
+                   filter(models.Token.expires < before).limit(limit)]
+            if ids:
+                session.query(models.Token).\
+                    filter(models.Token.id.in_(ids)).\
+                    delete(synchronize_session=False)
+        return len(ids)
+
+    def get_validation_bundle(self, id, session=None):
+        if not isinstance(unthreaded(api.user), user.UserAPI):
+            # Users live in another backend, so they cannot be joined in
+            return super(TokenAPI, self).get_validation_bundle(id)
+        if not session:
+            session = get_session()
+        rows = user.validation_query(session, models.Token.tenant_id,
+                                     (models.Token,)).\
+            filter(models.Token.id == id).all()
+        if not rows:
+            return None
+        return (rows[0][0],) + user.assemble_validation_bundle(
+            [row[1:] for row in rows])
+
+    def get_multi(self, ids, session=None):
+        if not session:
+            session = get_session()
+        result = session.query(models.Token).\
+            filter(models.Token.id.in_(ids)).all()
+        return dict((token.id, token) for token in result)
+
+    def get_validation_bundles(self, ids, session=None):
+        if not isinstance(unthreaded(api.user), user.UserAPI):
+            return super(TokenAPI, self).get_validation_bundles(ids)
+        if not session:
+            session = get_session()
+        rows = user.validation_query(session, models.Token.tenant_id,
+                                     (models.Token,)).\
+            filter(models.Token.id.in_(ids)).all()
+        tokens = {}
+        token_rows = {}
+        for row in rows:
+            tokens[row[0].id] = row[0]
+            token_rows.setdefault(row[0].id, []).append(row[1:])
+        return dict((id, (token,) + user.assemble_validation_bundle(
+                        token_rows[id]))
+                    for id, token in tokens.iteritems())
+
+
 def get():
     return TokenAPI()
\ No newline at end of file
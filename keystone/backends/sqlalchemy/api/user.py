@@ -15,10 +15,57 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from sqlalchemy import and_, or_
+
 import keystone.utils as utils
 from keystone.backends.sqlalchemy import get_session, models, aliased, joinedload
+from keystone.backends.sqlalchemy.pagination import page_markers
 from keystone.backends.api import BaseUserAPI
 
+
+def validation_query(session, token_tenant_id, entities=()):
+    """Query joining a user to its tenants and applicable role refs.
+
+    Rows are (*entities, user, user_tenant, token_tenant, role_ref); the
+    outer joins leave the last three None when there is nothing to join.
+
+    :param token_tenant_id: token tenant id, or a column yielding it
+    :param entities: extra leading entities, e.g. the token itself
+    """
+    user_tenant = aliased(models.Tenant)
+    token_tenant = aliased(models.Tenant)
+    ura = aliased(models.UserRoleAssociation)
+    query = session.query(*(tuple(entities) + (models.User, user_tenant,
+                                               token_tenant, ura)))
+    if entities:
+        query = query.outerjoin((models.User,
+            models.User.id == entities[0].user_id))
+    return query.\
+        outerjoin((user_tenant, user_tenant.id == models.User.tenant_id)).\
+        outerjoin((token_tenant, token_tenant.id == token_tenant_id)).\
+        outerjoin((ura, and_(ura.user_id == models.User.id,
+                             or_(ura.tenant_id == None,
+                                 ura.tenant_id == token_tenant_id))))
+
+
+def assemble_validation_bundle(rows):
+    """Fold validation_query rows into a get_validation_bundle tuple"""
+    if not rows or rows[0][0] is None:
+        return (None, None, None, [], [])
+    (user, user_tenant, token_tenant) = rows[0][:3]
+    tenant_roles = []
+    global_roles = []
+    for row in rows:
+        role_ref = row[3]
+        if role_ref is None:
+            continue
+        if role_ref.tenant_id is None:
+            global_roles.append(role_ref)
+        else:
+            tenant_roles.append(role_ref)
+    return (user, user_tenant, token_tenant, tenant_roles, global_roles)
+
+
 class UserAPI(BaseUserAPI):
     def get_all(self, session=None):
         if not session:
@@ -62,39 +109,8 @@ class UserAPI(BaseUserAPI):
     def get_page_markers(self, marker, limit, session=None):
         if not session:
             session = get_session()
-        first = session.query(models.User).order_by(\
-                            models.User.id).first()
-        last = session.query(models.User).order_by(\
-                            models.User.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = session.query(models.User).filter("id > :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.User.id).limit(limit).all()
-        prev_page = session.query(models.User).filter("id < :marker").params(\
-                        marker='%s' % marker).order_by(\
-                        models.User.id.desc()).limit(int(limit)).all()
-        if len(next_page) == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if len(prev_page) == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if prev_page.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if next_page.id == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        return page_markers(session.query(models.User.id), models.User.id,
+                            marker, limit)
     
     
     def get_by_email(self, email, session=None):
@@ -194,44 +210,8 @@ class UserAPI(BaseUserAPI):
         if not session:
             session = get_session()
         user = aliased(models.User)
-        first = session.query(user).\
-                        order_by(user.id).first()
-        last = session.query(user).\
-                            order_by(user.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = session.query(user).\
-                        filter("id > :marker").params(\
-                        marker='%s' % marker).order_by(user.id).\
-                        limit(int(limit)).all()
-        prev_page = session.query(user).\
-                        filter("id < :marker").params(
-                        marker='%s' % marker).order_by(
-                        user.id.desc()).limit(int(limit)).all()
-        next_len = len(next_page)
-        prev_len = len(prev_page)
-    
-        if next_len == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if prev_len == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if first.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if marker == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        return page_markers(session.query(user.id), user.id, marker, limit,
+                            inclusive=True)
     
     
     def users_get_by_tenant_get_page(self, tenant_id, marker, limit, session=None):
@@ -269,48 +249,17 @@ class UserAPI(BaseUserAPI):
         if not session:
             session = get_session()
         user = aliased(models.UserRoleAssociation)
-        first = session.query(user).\
-                        filter(user.tenant_id == tenant_id).\
-                        order_by(user.id).first()
-        last = session.query(user).\
-                            filter(user.tenant_id == tenant_id).\
-                            order_by(user.id.desc()).first()
-        if first is None:
-            return (None, None)
-        if marker is None:
-            marker = first.id
-        next_page = session.query(user).\
-                        filter(user.tenant_id == tenant_id).\
-                        filter("id > :marker").params(\
-                        marker='%s' % marker).order_by(user.id).\
-                        limit(int(limit)).all()
-        prev_page = session.query(user).\
-                        filter(user.tenant_id == tenant_id).\
-                        filter("id < :marker").params(
-                        marker='%s' % marker).order_by(
-                        user.id.desc()).limit(int(limit)).all()
-        next_len = len(next_page)
-        prev_len = len(prev_page)
-    
-        if next_len == 0:
-            next_page = last
-        else:
-            for t in next_page:
-                next_page = t
-        if prev_len == 0:
-            prev_page = first
-        else:
-            for t in prev_page:
-                prev_page = t
-        if first.id == marker:
-            prev_page = None
-        else:
-            prev_page = prev_page.id
-        if marker == last.id:
-            next_page = None
-        else:
-            next_page = next_page.id
-        return (prev_page, next_page)
+        return page_markers(session.query(user.id).\
+                                filter(user.tenant_id == tenant_id),
+                            user.id, marker, limit, inclusive=True)
     
+    def get_validation_bundle(self, id, tenant_id, session=None):
+        if not session:
+            session = get_session()
+        rows = validation_query(session, tenant_id).\
+            filter(models.User.id == id).all()
+        return assemble_validation_bundle(rows)
+
+
 def get():
     return UserAPI()
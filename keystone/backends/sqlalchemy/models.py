@@ -16,7 +16,7 @@
 # Not Yet PEP8 standardized
 
 from sqlalchemy import Column, String, Integer, ForeignKey, \
-    UniqueConstraint, Boolean, DateTime
+    UniqueConstraint, Boolean, DateTime, Index
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, object_mapper
@@ -149,7 +149,11 @@ class Token(BASE, KeystoneBase):
     id = Column(String(255), primary_key=True, unique=True)
     user_id = Column(String(255))
     tenant_id = Column(String(255))
-    expires = Column(DateTime)
+    expires = Column(DateTime, index=True)
+
+# Serves get_for_user/get_for_user_by_tenant, which pick the latest token
+Index('ix_token_user_tenant_expires', Token.user_id, Token.tenant_id,
+      Token.expires)
 
 
 class EndpointTemplates(BASE, KeystoneBase):
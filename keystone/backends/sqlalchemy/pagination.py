@@ -0,0 +1,79 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Keyset pagination for the list APIs."""
+
+
+def _is_marker(id, marker):
+    # markers come in as strings, integer ids don't
+    return id == marker or (isinstance(id, (int, long)) and
+                            str(id) == marker)
+
+
+def page_markers(ids, column, marker, limit, inclusive=False):
+    """Markers of the pages before and after the one at marker.
+
+    Pages hold `limit` rows in `column` order. `ids` is a query selecting
+    just `column`, so only keys are read: at most limit + 2 of them from
+    marker on, and limit before it.
+
+    :param inclusive: markers name the first row of their page (pages are
+                      fetched with column >= marker) rather than the row
+                      before it (column > marker)
+    :returns: (prev, next), either None when there is no such page
+    """
+    limit = int(limit)
+    forward = ids.order_by(column)
+    before = []
+    if marker is not None:
+        forward = forward.filter(column >= marker)
+        before = [id for id, in ids.filter(column < marker).
+                  order_by(column.desc()).limit(limit)]
+    after = [id for id, in forward.limit(limit + 2)]
+    if not after and not before:
+        return (None, None)
+    if marker is None:
+        marker = after[0]
+    at_marker = len(after) > 0 and _is_marker(after[0], marker)
+    if at_marker:
+        after = after[1:]
+
+    if len(before) > 0:
+        prev = before[-1]
+    elif at_marker:
+        prev = None
+    else:
+        prev = after[0]
+
+    if not inclusive:
+        nxt = after[limit - 1] if len(after) > limit else None
+    elif len(after) > 0:
+        nxt = after[:limit][-1]
+    elif at_marker:
+        nxt = None
+    else:
+        nxt = before[0]
+    return (prev, nxt)
+
+
+def page(query, column, marker, limit, inclusive=False):
+    """Up to limit rows of query in column order, from after marker (from
+    marker itself with inclusive), matching the markers of page_markers"""
+    query = query.order_by(column)
+    if marker is not None:
+        query = query.filter(column >= marker if inclusive
+                             else column > marker)
+    return query.limit(int(limit)).all()
@@ -0,0 +1,234 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Engines and connection pools of the SQL backends.
+
+Databases that pool connections get a QueuePool sized from the backend's
+options, keeping PoolStats on how long checkouts wait and how full the pool
+runs, which are logged periodically. Connections can also be pinged on checkout, so that ones the server
+dropped are replaced before a request fails on them.
+
+Drivers in C (MySQLdb, sqlite) block the whole eventlet hub while they
+wait on the database; with sql_use_tpool the backend's calls are made from
+eventlet's thread pool instead (EVENTLET_THREADPOOL_SIZE threads, 20 by
+default). A pure Python driver such as PyMySQL (mysql+pymysql://) goes
+through eventlet's green sockets and needs no threads.
+"""
+
+import logging
+import time
+
+from sqlalchemy import create_engine, event, exc, pool
+from sqlalchemy.engine import url as sa_url
+
+from keystone.common import config
+
+LOG = logging.getLogger('keystone.backends.sqlalchemy.pool')
+
+#Checkouts that wait longer than this many seconds are logged.
+SLOW_CHECKOUT = 0.1
+
+
+class PoolStats(object):
+    """Checkout metrics of a pool, logged every report_interval seconds
+    (never if 0)"""
+
+    def __init__(self, capacity, report_interval=0):
+        self.capacity = capacity
+        self.report_interval = report_interval
+        self.last_report = time.time()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.hold_time = 0.0
+        self.checkins = 0
+        self.peak_checked_out = 0
+        self._checked_out_at = {}
+
+    @property
+    def mean_wait(self):
+        return self.wait_time / self.checkouts if self.checkouts else 0.0
+
+    @property
+    def mean_hold(self):
+        """Mean seconds a connection stays checked out"""
+        return self.hold_time / self.checkins if self.checkins else 0.0
+
+    @property
+    def checked_out(self):
+        return len(self._checked_out_at)
+
+    @property
+    def saturation(self):
+        """Share of the pool's connections that are checked out"""
+        return float(self.checked_out) / self.capacity
+
+    def waited(self, seconds):
+        self.checkouts += 1
+        self.wait_time += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+    def on_checkout(self, dbapi_connection, connection_record,
+                    connection_proxy):
+        # checkout fires again when a dropped connection is replaced
+        if connection_record not in self._checked_out_at:
+            self._checked_out_at[connection_record] = time.time()
+            self.peak_checked_out = max(self.peak_checked_out,
+                                        self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = self._checked_out_at.pop(connection_record, None)
+        if checked_out_at is not None:
+            self.checkins += 1
+            self.hold_time += time.time() - checked_out_at
+
+    def report(self):
+        """Log the metrics if report_interval has passed since last time"""
+        if not self.report_interval:
+            return
+        now = time.time()
+        if now - self.last_report < self.report_interval:
+            return
+        self.last_report = now
+        LOG.info("Database pool: %(checkouts)d checkouts, %(timeouts)d "
+                 "timeouts, wait mean %(mean_wait).3fs max %(max_wait).3fs, "
+                 "hold mean %(mean_hold).3fs, %(checked_out)d/%(capacity)d "
+                 "checked out (peak %(peak_checked_out)d)" % self.as_dict())
+
+    def as_dict(self):
+        return {'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'mean_wait': self.mean_wait,
+                'max_wait': self.max_wait,
+                'mean_hold': self.mean_hold,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'capacity': self.capacity,
+                'saturation': self.saturation}
+
+
+class TimedQueuePool(pool.QueuePool):
+    """QueuePool keeping PoolStats across its re-creations.
+
+    connect() times how long callers wait for a connection; the checkout
+    and checkin events track how many are out and for how long.
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, **kwargs):
+        super(TimedQueuePool, self).__init__(creator, pool_size=pool_size,
+            max_overflow=max_overflow, **kwargs)
+        self.stats = PoolStats(pool_size + max(max_overflow, 0))
+        if '_dispatch' not in kwargs:
+            # a re-created pool inherits the listeners along with the stats
+            event.listen(self, 'checkout', self.stats.on_checkout)
+            event.listen(self, 'checkin', self.stats.on_checkin)
+
+    def connect(self):
+        start = time.time()
+        try:
+            conn = super(TimedQueuePool, self).connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        waited = time.time() - start
+        self.stats.waited(waited)
+        if waited > SLOW_CHECKOUT:
+            LOG.warning("Waited %.3fs for a database connection: %s" %
+                        (waited, self.status()))
+        self.stats.report()
+        return conn
+
+    def recreate(self):
+        new_pool = super(TimedQueuePool, self).recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+def _ping_listener(dialect):
+    """Checkout listener raising DisconnectionError on dead connections,
+    which the pool then replaces"""
+
+    def ping(dbapi_connection, connection_record, connection_proxy):
+        cursor = None
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute('SELECT 1')
+        except Exception, e:
+            if dialect.is_disconnect(e, dbapi_connection, cursor):
+                LOG.info("Replacing dropped database connection: %s" % e)
+                raise exc.DisconnectionError(str(e))
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+    return ping
+
+
+def create_pooled_engine(options):
+    """Create the engine of a backend from its options.
+
+    sql_pool_size, sql_max_overflow and sql_pool_timeout size the pool of
+    databases that pool connections (sqlite does not), whose PoolStats are
+    logged every sql_pool_stats_interval seconds; sql_pool_pre_ping pings
+    connections as they are checked out.
+    """
+    url = sa_url.make_url(options['sql_connection'])
+    kwargs = {'pool_recycle': config.get_option(
+        options, 'sql_idle_timeout', type='int', default=3600)}
+    if issubclass(url.get_dialect().get_pool_class(url), pool.QueuePool):
+        kwargs['poolclass'] = TimedQueuePool
+        kwargs['pool_size'] = config.get_option(
+            options, 'sql_pool_size', type='int', default=5)
+        kwargs['max_overflow'] = config.get_option(
+            options, 'sql_max_overflow', type='int', default=10)
+        kwargs['pool_timeout'] = config.get_option(
+            options, 'sql_pool_timeout', type='int', default=30)
+    if url.drivername.startswith('sqlite') and config.get_option(
+            options, 'sql_use_tpool', type='bool', default=False):
+        # the thread pool hands a request's connection from thread to thread
+        kwargs['connect_args'] = {'check_same_thread': False}
+    engine = create_engine(url, **kwargs)
+    if 'poolclass' in kwargs:
+        engine.pool.stats.report_interval = config.get_option(
+            options, 'sql_pool_stats_interval', type='int', default=0)
+    if config.get_option(options, 'sql_pool_pre_ping', type='bool',
+                         default=False):
+        event.listen(engine, 'checkout', _ping_listener(engine.dialect))
+    return engine
+
+
+def use_tpool(options):
+    """Whether the backend's calls should be made from eventlet's thread
+    pool, as sql_use_tpool asks"""
+    if not config.get_option(options, 'sql_use_tpool', type='bool',
+                             default=False):
+        return False
+    url = sa_url.make_url(options['sql_connection'])
+    if url.drivername.startswith('sqlite') and \
+            url.database in (None, '', ':memory:'):
+        LOG.warning("Ignoring sql_use_tpool: each thread would see its own "
+                    "in-memory sqlite database")
+        return False
+    return True
+
+
+def get_stats(engine):
+    """Pool metrics of engine as a dict, or None if it does not pool"""
+    stats = getattr(engine.pool, 'stats', None)
+    if stats is None:
+        return None
+    return stats.as_dict()
@@ -0,0 +1,37 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2010 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Token store keeping tokens in the alterdb database and reading them
+through memcache.
+
+Its configuration section takes the options of both the alterdb backend
+(sql_connection, sql_idle_timeout) and the memcache backend
+(memcache_hosts, cache_time).
+"""
+
+from keystone.backends import alterdb
+from keystone.backends import memcache
+from keystone.backends.tiered.api import token
+import keystone.backends.api as top_api
+
+
+def configure_backend(options):
+    memcache.configure_backend(options)
+    # alterdb comes last so that its Token model is the one registered
+    alterdb.configure_backend(options)
+    top_api.set_value('token', token.get())
@@ -0,0 +1,102 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2010 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from keystone.backends import alterdb, memcache
+from keystone.backends.alterdb.api import token as store
+from keystone.backends.api import BaseTokenAPI
+from keystone.backends.memcache.api.token import user_key, cache_token, \
+    get_cached, get_cached_multi
+
+# Deleting a token leaves this in its cache entries for REVOKED_TIME
+# seconds. Reads fill the cache with add, so one that found the token before
+# it was deleted can't cache it again.
+REVOKED = 'revoked'
+REVOKED_TIME = 60
+
+
+class TokenAPI(BaseTokenAPI):
+    """Writes tokens through to alterdb, reads them through memcache.
+
+    A token read from the database is cached under the key it was looked
+    up by only, and only if that key holds nothing, so that a lookup by id
+    never replaces the newer token cached for its user nor a revocation.
+    """
+
+    def __init__(self):
+        self.store = alterdb.threaded(store.get())
+
+    def create(self, values):
+        token = self.store.create(values)
+        cache_token(token, [token.id,
+                            user_key(token.user_id, token.tenant_id)])
+        return token
+
+    def get(self, id, session=None):
+        token = get_cached(id)
+        if token == None:
+            token = self.store.get(id, session)
+            if token != None:
+                cache_token(token, [id], add=True)
+        return token
+
+    def get_multi(self, ids, session=None):
+        tokens = get_cached_multi(ids)
+        missing = [id for id in ids if id not in tokens]
+        if missing:
+            found = self.store.get_multi(missing, session)
+            for id, token in found.iteritems():
+                cache_token(token, [id], add=True)
+            tokens.update(found)
+        return tokens
+
+    def delete(self, id, session=None):
+        token = self.store.get(id, session)
+        keys = [id]
+        if token != None:
+            self.store.delete(id, session)
+            keys.append(user_key(token.user_id, token.tenant_id))
+        # after the delete, or a read racing it could cache the token again
+        memcache.MEMCACHE_SERVER.set_multi(
+            dict((key, REVOKED) for key in keys), REVOKED_TIME)
+
+    def delete_expired(self, before, limit, session=None):
+        # memcache entries never outlive their token
+        return self.store.delete_expired(before, limit, session)
+
+    def get_for_user(self, user_id, session=None):
+        return self.__get_for_user(user_key(user_id), self.store.get_for_user,
+                                   user_id, session=session)
+
+    def get_for_user_by_tenant(self, user_id, tenant_id, session=None):
+        return self.__get_for_user(user_key(user_id, tenant_id),
+                                   self.store.get_for_user_by_tenant,
+                                   user_id, tenant_id, session=session)
+
+    def __get_for_user(self, key, lookup, *args, **kwargs):
+        token = get_cached(key)
+        if token == None:
+            token = lookup(*args, **kwargs)
+            if token != None:
+                cache_token(token, [key], add=True)
+        return token
+
+    def get_all(self, session=None):
+        return self.store.get_all(session)
+
+
+def get():
+    return TokenAPI()
@@ -17,7 +17,8 @@
 Monkey Patch httplib.HTTPResponse to buffer reads of headers. This can improve
 performance when making large numbers of small HTTP requests.  This module
 also provides helper functions to make HTTP connections using
-BufferedHTTPResponse.
+BufferedHTTPResponse, and a pool of keep-alive connections for components
+(such as the auth middlewares) that talk to the same few hosts over and over.
 
 .. warning::
 
@@ -28,10 +29,22 @@ BufferedHTTPResponse.
 
 from urllib import quote
 import logging
+import socket
 import time
 
-from eventlet.green.httplib import CONTINUE, HTTPConnection, HTTPMessage, \
-    HTTPResponse, HTTPSConnection, _UNKNOWN
+from eventlet.green.httplib import BadStatusLine, CannotSendRequest, \
+    CONTINUE, HTTPConnection, HTTPMessage, HTTPResponse, HTTPSConnection, \
+    _UNKNOWN
+from eventlet import semaphore
+
+# Default number of idle connections kept per host, how many seconds an
+# idle connection may be reused for, how many connections may be open to a
+# host at once (0 for no limit) and how many seconds to wait for one when
+# they all are; see pool_options()
+POOL_MAX_SIZE = 10
+POOL_IDLE_TIMEOUT = 30
+POOL_MAX_CONNECTIONS = 100
+POOL_WAIT_TIMEOUT = 10
 
 
 class BufferedHTTPResponse(HTTPResponse):
@@ -163,3 +176,232 @@ def http_connect_raw(ipaddr, port, method, path, headers=None,
             conn.putheader(header, value)
     conn.endheaders()
     return conn
+
+
+class PoolTimeout(Exception):
+    """No connection to a host came free within the pool's wait_timeout"""
+
+
+class HTTPConnectionPool(object):
+    """Keep-alive connections to a single host.
+
+    At most `max_size` idle connections are kept; connections idle for more
+    than `idle_timeout` seconds are closed rather than reused, since the
+    server has likely dropped them by then. At most `max_connections` are
+    handed out at once (0 for no limit); get() waits up to `wait_timeout`
+    seconds for one to be closed, then raises PoolTimeout.
+    Connections are handed out as PooledHTTPConnection objects.
+    """
+
+    def __init__(self, ipaddr, port, ssl=False, max_size=None,
+                 idle_timeout=None, max_connections=None, wait_timeout=None):
+        self.ipaddr = ipaddr
+        self.port = port
+        self.ssl = ssl
+        if max_size is None:
+            max_size = POOL_MAX_SIZE
+        if idle_timeout is None:
+            idle_timeout = POOL_IDLE_TIMEOUT
+        if max_connections is None:
+            max_connections = POOL_MAX_CONNECTIONS
+        if wait_timeout is None:
+            wait_timeout = POOL_WAIT_TIMEOUT
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.wait_timeout = wait_timeout
+        self.slots = None
+        if max_connections > 0:
+            self.slots = semaphore.Semaphore(max_connections)
+        self.idle = []
+        self.created = 0
+        self.reused = 0
+        self.timeouts = 0
+
+    def _new_connection(self):
+        self.created += 1
+        if self.ssl:
+            return HTTPSConnection('%s:%s' % (self.ipaddr, self.port))
+        return BufferedHTTPConnection('%s:%s' % (self.ipaddr, self.port))
+
+    def get(self):
+        """Return a PooledHTTPConnection, reusing an idle one if possible"""
+        if self.slots is not None and \
+                not self.slots.acquire(timeout=self.wait_timeout):
+            self.timeouts += 1
+            raise PoolTimeout('No connection to %s:%s came free in %ss' %
+                              (self.ipaddr, self.port, self.wait_timeout))
+        now = time.time()
+        while self.idle:
+            conn, released = self.idle.pop()
+            if now - released < self.idle_timeout:
+                self.reused += 1
+                return PooledHTTPConnection(self, conn, reused=True)
+            conn.close()
+        return PooledHTTPConnection(self, self._new_connection())
+
+    def put(self, conn):
+        """Keep conn (an idle HTTPConnection) for reuse"""
+        if len(self.idle) < self.max_size:
+            self.idle.append((conn, time.time()))
+        else:
+            conn.close()
+        self.release()
+
+    def release(self):
+        """Free the slot of a connection handed out by get()"""
+        if self.slots is not None:
+            self.slots.release()
+
+    def clear(self):
+        while self.idle:
+            conn, _released = self.idle.pop()
+            conn.close()
+
+
+class PooledHTTPConnection(object):
+    """HTTPConnection borrowed from an HTTPConnectionPool.
+
+    close() hands the connection back to the pool when the response has
+    been read in full and the server agreed to keep it open, and closes it
+    otherwise. A reused connection the server has since dropped is
+    reconnected and the request sent again once, provided no part of the
+    request body had been sent on it yet.
+    """
+
+    _stale_errors = (BadStatusLine, CannotSendRequest, socket.error)
+
+    def __init__(self, pool, conn, reused=False):
+        self.pool = pool
+        self.conn = conn
+        self.reused = reused
+        self.response = None
+        self._request = None
+        self._body_sent = False
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def _send_request(self):
+        method, path, headers = self._request
+        names = [header.lower() for header in headers or ()]
+        self.conn.path = path
+        self.conn.putrequest(method, path, skip_host='host' in names,
+                             skip_accept_encoding='accept-encoding' in names)
+        if headers:
+            for header, value in headers.iteritems():
+                self.conn.putheader(header, value)
+        self.conn.endheaders()
+
+    def _reconnect(self):
+        logging.debug('Reconnecting stale connection to %s:%s',
+                      self.pool.ipaddr, self.pool.port)
+        self.conn.close()
+        self.reused = False
+        self._send_request()
+
+    def request(self, method, path, headers=None):
+        """Send the request line and headers"""
+        self._request = (method, path, headers)
+        self.response = None
+        self._body_sent = False
+        try:
+            self._send_request()
+        except self._stale_errors:
+            if not self.reused:
+                raise
+            self._reconnect()
+
+    def send(self, data):
+        try:
+            self.conn.send(data)
+        except self._stale_errors:
+            if not self.reused or self._body_sent:
+                raise
+            self._reconnect()
+            self.conn.send(data)
+        self._body_sent = True
+
+    def getresponse(self):
+        try:
+            self.response = self.conn.getresponse()
+        except self._stale_errors:
+            if not self.reused or self._body_sent:
+                raise
+            self._reconnect()
+            self.response = self.conn.getresponse()
+        return self.response
+
+    def close(self):
+        pool, self.pool = self.pool, None
+        response = self.response
+        if pool is not None and response is not None and \
+                response.isclosed() and not response.will_close:
+            pool.put(self.conn)
+            return
+        self.conn.close()
+        if pool is not None:
+            pool.release()
+
+
+_POOLS = {}
+
+
+def pool_options(conf):
+    """HTTPConnectionPool settings from a middleware's configuration.
+
+    Reads `http_pool_size` (idle connections kept per host),
+    `http_pool_idle_timeout` (seconds), `http_pool_max_connections`
+    (connections open to a host at once) and `http_pool_wait_timeout`
+    (seconds); pass the result to get_pool or http_connect_pooled.
+    """
+    return {'max_size': int(conf.get('http_pool_size', POOL_MAX_SIZE)),
+            'idle_timeout': int(conf.get('http_pool_idle_timeout',
+                                         POOL_IDLE_TIMEOUT)),
+            'max_connections': int(conf.get('http_pool_max_connections',
+                                            POOL_MAX_CONNECTIONS)),
+            'wait_timeout': float(conf.get('http_pool_wait_timeout',
+                                           POOL_WAIT_TIMEOUT))}
+
+
+def get_pool(ipaddr, port, ssl=False, **options):
+    """Return the process-wide HTTPConnectionPool for ipaddr:port.
+
+    Callers asking with different options (see pool_options) get separate
+    pools.
+    """
+    key = (ipaddr, int(port), bool(ssl), tuple(sorted(options.items())))
+    pool = _POOLS.get(key)
+    if pool is None:
+        pool = _POOLS.setdefault(key, HTTPConnectionPool(ipaddr, int(port),
+                                                         bool(ssl),
+                                                         **options))
+    return pool
+
+
+def http_connect_pooled(ipaddr, port, method, path, headers=None,
+                        query_string=None, ssl=False, pool_options=None):
+    """
+    Same as http_connect_raw, but the connection comes from (and, once the
+    response has been read and the connection closed, goes back to) the
+    pool for ipaddr:port.
+
+    :param ipaddr: IPv4 address to connect to
+    :param port: port to connect to
+    :param method: HTTP method to request ('GET', 'PUT', 'POST', etc.)
+    :param path: request path
+    :param headers: dictionary of headers
+    :param query_string: request query string
+    :param ssl: set True if SSL should be used (default: False)
+    :param pool_options: settings of the pool, see pool_options()
+    :returns: PooledHTTPConnection object
+    """
+    conn = get_pool(ipaddr, port, ssl, **(pool_options or {})).get()
+    if query_string:
+        path += '?' + query_string
+    try:
+        conn.request(method, path, headers)
+    except Exception:
+        conn.close()
+        raise
+    return conn
@@ -0,0 +1,262 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bounded, TTL-aware caches.
+
+LRUCache entries expire after a per-cache default TTL (which callers may
+lower per entry, e.g. to a token's remaining lifetime) and the least
+recently used entry is evicted once the cache holds `max_size` items. A size
+or TTL of zero disables the cache entirely, so callers never need to
+special-case it. MemcacheCache offers the same interface over memcache, and
+TokenCache builds the token validation cache of the auth middlewares on top
+of either.
+"""
+
+import datetime
+import threading
+import time
+
+
+class _Node(object):
+    """Entry in the recency list"""
+    __slots__ = ('key', 'value', 'expires', 'prev', 'next')
+
+    def __init__(self, key=None, value=None, expires=None):
+        self.key = key
+        self.value = value
+        self.expires = expires
+        self.prev = self
+        self.next = self
+
+
+class LRUCache(object):
+    """Least recently used cache with per-entry expiry"""
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._map = {}
+        self._root = _Node()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def __len__(self):
+        return len(self._map)
+
+    def _unlink(self, node):
+        node.prev.next = node.next
+        node.next.prev = node.prev
+
+    def _link_front(self, node):
+        root = self._root
+        node.next = root.next
+        node.prev = root
+        root.next.prev = node
+        root.next = node
+
+    def get(self, key, default=None):
+        """Return the live value for key (marking it recently used)"""
+        with self._lock:
+            node = self._map.get(key)
+            if node is None:
+                self.misses += 1
+                return default
+            if node.expires <= time.time():
+                self._unlink(node)
+                del self._map[key]
+                self.misses += 1
+                return default
+            self._unlink(node)
+            self._link_front(node)
+            self.hits += 1
+            return node.value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (capped at the cache TTL)"""
+        if not self.enabled:
+            return
+        if ttl is None or ttl > self.ttl:
+            ttl = self.ttl
+        if ttl <= 0:
+            self.delete(key)
+            return
+        with self._lock:
+            node = self._map.get(key)
+            if node is not None:
+                self._unlink(node)
+            node = _Node(key, value, time.time() + ttl)
+            self._map[key] = node
+            self._link_front(node)
+            while len(self._map) > self.max_size:
+                lru = self._root.prev
+                self._unlink(lru)
+                del self._map[lru.key]
+
+    def delete(self, key):
+        """Drop key from the cache if present"""
+        with self._lock:
+            node = self._map.pop(key, None)
+            if node is not None:
+                self._unlink(node)
+
+    def delete_matching(self, predicate):
+        """Drop every entry for which predicate(key, value) is true"""
+        with self._lock:
+            for key, node in self._map.items():
+                if predicate(key, node.value):
+                    self._unlink(node)
+                    del self._map[key]
+
+    def clear(self):
+        with self._lock:
+            self._map.clear()
+            self._root = _Node()
+
+
+class MemcacheCache(object):
+    """LRUCache-like view of a memcache client.
+
+    Works with python-memcached clients as well as swift's MemcacheRing;
+    the two disagree on the name of the expiry argument to set(), which is
+    given as `ttl_arg`.
+    """
+
+    def __init__(self, client, ttl=300, prefix='keystone', ttl_arg='time'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.ttl_arg = ttl_arg
+
+    def _key(self, key):
+        return '%s/%s' % (self.prefix, key)
+
+    def get(self, key, default=None):
+        value = self.client.get(self._key(key))
+        if value is None:
+            return default
+        return value
+
+    def set(self, key, value, ttl=None):
+        if ttl is None or ttl > self.ttl:
+            ttl = self.ttl
+        if ttl <= 0:
+            self.delete(key)
+            return
+        self.client.set(self._key(key), value, **{self.ttl_arg: int(ttl)})
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+
+class TokenCache(object):
+    """Cache of token validation outcomes for the auth middlewares.
+
+    Valid tokens are cached with their claims until the earlier of
+    `token_cache_ttl` seconds and the token's expiry; tokens Keystone
+    rejected are remembered as INVALID for `token_cache_negative_ttl`
+    seconds, see store_rejected. The backend is chosen with the `token_cache` option:
+
+    memory   -- in-process LRUCache of `token_cache_size` entries (default)
+    memcache -- `memcache_servers` (comma separated host:port list) or, when
+                none are configured, the memcache client handed in by the
+                middleware for each request (e.g. swift's cache_from_env)
+    none     -- no caching
+
+    Hits and misses are counted per instance, i.e. per middleware.
+    """
+
+    INVALID = 'invalid'
+
+    def __init__(self, conf):
+        self.kind = conf.get('token_cache', 'memory')
+        self.ttl = int(conf.get('token_cache_ttl', 300))
+        self.negative_ttl = int(conf.get('token_cache_negative_ttl', 10))
+        self.hits = 0
+        self.misses = 0
+        # whether Keystone took the middleware's admin token lately
+        self.admin_token_valid = False
+        self.backend = None
+        if self.kind == 'memory':
+            self.backend = LRUCache(int(conf.get('token_cache_size', 1000)),
+                                    self.ttl)
+        elif self.kind == 'memcache' and conf.get('memcache_servers'):
+            import memcache
+            servers = [server.strip() for server in
+                       conf['memcache_servers'].split(',')]
+            self.backend = MemcacheCache(memcache.Client(servers), self.ttl)
+
+    def _get_backend(self, memcache_client):
+        if self.backend is None and self.kind == 'memcache' and \
+                memcache_client is not None:
+            return MemcacheCache(memcache_client, self.ttl,
+                                 ttl_arg='timeout')
+        return self.backend
+
+    def get(self, token_id, memcache_client=None):
+        """Return cached claims, INVALID, or None when unknown"""
+        backend = self._get_backend(memcache_client)
+        if backend is None:
+            return None
+        claims = backend.get(token_id)
+        if claims is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return claims
+
+    def store(self, token_id, claims, expires, memcache_client=None):
+        """Cache claims until expires (an ISO 8601 timestamp or datetime)"""
+        self.admin_token_valid = True
+        backend = self._get_backend(memcache_client)
+        if backend is None:
+            return
+        if not isinstance(expires, datetime.datetime):
+            expires = parse_isotime(expires)
+        lifetime = expires - datetime.datetime.now()
+        backend.set(token_id, claims,
+                    ttl=lifetime.days * 86400 + lifetime.seconds)
+
+    def store_rejected(self, token_id, status, memcache_client=None):
+        """Remember that Keystone rejected token_id with an HTTP status.
+
+        Keystone answers 404 when it does not know the admin token, and 401
+        or 403 for bad tokens but also for an admin token without the admin
+        role or past its expiry. Rejections are thus only cached once the
+        admin token has been taken, until the next 404.
+        """
+        if status == 404:
+            self.admin_token_valid = False
+        elif status in (401, 403) and self.admin_token_valid:
+            self.store_invalid(token_id, memcache_client)
+
+    def store_invalid(self, token_id, memcache_client=None):
+        backend = self._get_backend(memcache_client)
+        if backend is not None:
+            backend.set(token_id, self.INVALID, ttl=self.negative_ttl)
+
+
+def parse_isotime(timestr):
+    """Parse the isoformat() of a naive datetime"""
+    if '.' in timestr:
+        return datetime.datetime.strptime(timestr, '%Y-%m-%dT%H:%M:%S.%f')
+    return datetime.datetime.strptime(timestr, '%Y-%m-%dT%H:%M:%S')
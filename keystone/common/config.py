@@ -370,3 +370,17 @@ def get_option(options, option, **kwargs):
         return kwargs['default']
     else:
         raise KeyError("option '%s' not found" % option)
+
+
+def get_server_options(conf):
+    """Keyword arguments of wsgi.Server from the keepalive_timeout,
+    max_requests_per_connection, tcp_nodelay and drain_timeout options"""
+    return dict(
+        keepalive_timeout=get_option(conf, 'keepalive_timeout',
+            type='int', default=0) or None,
+        max_requests=get_option(conf, 'max_requests_per_connection',
+            type='int', default=0),
+        tcp_nodelay=get_option(conf, 'tcp_nodelay', type='bool',
+            default=False),
+        drain_timeout=get_option(conf, 'drain_timeout', type='int',
+            default=30))
@@ -0,0 +1,128 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Streaming reverse proxy for the auth middlewares.
+
+When an auth middleware has no downstream WSGI app it forwards the request
+to the remote service with forward(). Request and response bodies are
+copied in CHUNK_SIZE pieces rather than read into memory, the upstream
+status and end-to-end headers are passed back unchanged, and upstream
+connections come from the bufferedhttp keep-alive pool.
+"""
+
+from urllib import quote
+
+from keystone.common.bufferedhttp import http_connect_pooled as http_connect
+
+CHUNK_SIZE = 65536
+
+# Headers that describe a single connection rather than the message
+HOP_BY_HOP = ('connection', 'keep-alive', 'proxy-authenticate',
+              'proxy-authorization', 'te', 'trailers', 'transfer-encoding',
+              'upgrade')
+
+
+def request_headers(env):
+    """Return the HTTP headers of the request in env as a dict
+
+    Host is left out so that the upstream connection names its own host.
+    """
+    headers = {}
+    for key, value in env.iteritems():
+        if key.startswith('HTTP_'):
+            name = key[5:].replace('_', '-').title()
+        elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = key.replace('_', '-').title()
+        else:
+            continue
+        if name.lower() in HOP_BY_HOP or name == 'Host' or value == '':
+            continue
+        headers[name] = value
+    return headers
+
+
+class ProxyResponse(object):
+    """WSGI app_iter streaming an upstream response body"""
+
+    def __init__(self, conn, response, chunk_size=CHUNK_SIZE):
+        self.conn = conn
+        self.response = response
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        try:
+            while True:
+                chunk = self.response.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        # the pool only takes the connection back if the body was read
+        # in full; otherwise it is closed
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def _send_body(conn, env, chunked, chunk_size):
+    wsgi_input = env['wsgi.input']
+    if chunked:
+        while True:
+            chunk = wsgi_input.read(chunk_size)
+            if not chunk:
+                break
+            conn.send('%x\r\n%s\r\n' % (len(chunk), chunk))
+        conn.send('0\r\n\r\n')
+    else:
+        left = int(env['CONTENT_LENGTH'])
+        while left > 0:
+            chunk = wsgi_input.read(min(left, chunk_size))
+            if not chunk:
+                break
+            conn.send(chunk)
+            left -= len(chunk)
+
+
+def forward(env, start_response, host, port, ssl=False,
+            chunk_size=CHUNK_SIZE, pool_options=None):
+    """Proxy the request in env to host:port and stream back the reply"""
+    headers = request_headers(env)
+    chunked = 'CONTENT_LENGTH' not in env and \
+        env.get('HTTP_TRANSFER_ENCODING', '').lower() == 'chunked'
+    if chunked:
+        headers['Transfer-Encoding'] = 'chunked'
+    path = quote(env.get('SCRIPT_NAME', '') + env.get('PATH_INFO', ''))
+    conn = http_connect(host, port, env['REQUEST_METHOD'], path, headers,
+                        query_string=env.get('QUERY_STRING'), ssl=ssl,
+                        pool_options=pool_options)
+    try:
+        if chunked or int(env.get('CONTENT_LENGTH') or 0) > 0:
+            _send_body(conn, env, chunked, chunk_size)
+        response = conn.getresponse()
+    except Exception:
+        conn.close()
+        raise
+    response_headers = [(name.title(), value)
+                        for name, value in response.getheaders()
+                        if name.lower() not in HOP_BY_HOP]
+    start_response('%s %s' % (response.status, response.reason),
+                   response_headers)
+    return ProxyResponse(conn, response, chunk_size)
@@ -21,17 +21,28 @@
 Utility methods for working with WSGI servers
 """
 
+import errno
 import json
 import logging
+import os
+import signal
+import socket
 import sys
 import datetime
+import time
 
 import eventlet.wsgi
 eventlet.patcher.monkey_patch(all=False, socket=True)
+from eventlet import event, greenthread, hubs
+import greenlet
 import routes.middleware
 from webob import Response
 import webob.dec
 
+# Python 2 does not name it; 15 is its value on Linux.
+SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', 15)
+
+
 def find_stream_handler(logger):
     """Returns a stream handler, if any"""
     for handler in logger.handlers:
@@ -73,37 +84,275 @@ class WritableLogger(object):
         self.logger.log(self.level, msg.strip("\n"))
 
 
+def bind(port, host='0.0.0.0', backlog=128, reuse_port=False):
+    """Listening socket for Server.start, which may be bound before forking
+    the processes serving on it.
+
+    :param backlog: connections the kernel queues until they are accepted,
+                    capped by net.core.somaxconn
+    :param reuse_port: set SO_REUSEPORT, so that other processes (a new
+                       release, say) can listen on the port meanwhile
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
 def run_server(application, port):
     """Run a WSGI server with the given application."""
     sock = eventlet.listen(('0.0.0.0', port))
     eventlet.wsgi.server(sock, application)
 
 
+class HttpProtocol(eventlet.wsgi.HttpProtocol):
+    """eventlet's HttpProtocol with the connection limits of a Server.
+
+    `server` is eventlet's server; the keystone one, `owner`, is set on the
+    subclass each Server makes.
+    """
+
+    owner = None
+
+    def setup(self):
+        eventlet.wsgi.HttpProtocol.setup(self)
+        if self.owner.tcp_nodelay:
+            self.connection.setsockopt(socket.IPPROTO_TCP,
+                                       socket.TCP_NODELAY, 1)
+        # reads go through a dup of the connection, which times out apart
+        self.reader = self.rfile._sock
+        self.requests = 0
+        self.idle = True
+        self.owner.connections.add(self)
+
+    def handle_one_request(self):
+        # a connection accepted before stop still gets its first request
+        if self.owner.stopping and self.requests:
+            self.close_connection = 1
+            return
+        # until the request line is in, see parse_request
+        self.idle = True
+        self.reader.settimeout(self.owner.keepalive_timeout)
+        eventlet.wsgi.HttpProtocol.handle_one_request(self)
+
+    def parse_request(self):
+        self.idle = False
+        self.reader.settimeout(None)
+        if not eventlet.wsgi.HttpProtocol.parse_request(self):
+            return False
+        self.requests += 1
+        if self.owner.stopping or self.requests == self.owner.max_requests:
+            # answered with Connection: close
+            self.close_connection = 1
+        return True
+
+    def finish(self):
+        self.owner.connections.discard(self)
+        eventlet.wsgi.HttpProtocol.finish(self)
+
+    def close_when_idle(self):
+        """Close the connection now if it waits for its next request, or
+        after the response to the one in progress or still to come"""
+        self.close_connection = 1
+        if self.idle and self.requests:
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
 class Server(object):
-    """Server class to manage multiple WSGI sockets and applications."""
+    """Server class to manage multiple WSGI sockets and applications.
+
+    :param keepalive_timeout: seconds a connection may wait for its next
+                              request (None waits for ever)
+    :param max_requests: requests served on a connection before it is
+                         closed (0 for no limit)
+    :param tcp_nodelay: disable Nagle's algorithm on client connections
+    :param drain_timeout: seconds the requests in progress get to finish
+                          once the server is stopped (None for no limit)
+    """
 
-    def __init__(self, threads=1000):
+    def __init__(self, threads=1000, keepalive_timeout=None, max_requests=0,
+                 tcp_nodelay=False, drain_timeout=None):
         self.pool = eventlet.GreenPool(threads)
+        self.servers = []
+        self.connections = set()
+        self.stopping = False
+        self.keepalive_timeout = keepalive_timeout
+        self.max_requests = max_requests
+        self.tcp_nodelay = tcp_nodelay
+        self.drain_timeout = drain_timeout
+
+        class Protocol(HttpProtocol):
+            owner = self
+        self.protocol = Protocol
+
+    def start(self, application, port, host='0.0.0.0', backlog=128,
+              socket=None):
+        """Run a WSGI server with the given application.
+
+        :param socket: listening socket to serve on, see bind; by default
+                       one is bound to host and port
+        """
+        if socket is None:
+            socket = bind(port, host, backlog)
+        self.servers.append(eventlet.spawn(self._run, application, socket))
 
-    def start(self, application, port, host='0.0.0.0', backlog=128):
-        """Run a WSGI server with the given application."""
-        socket = eventlet.listen((host, port), backlog=backlog)
-        self.pool.spawn_n(self._run, application, socket)
+    def stop(self):
+        """Stop accepting connections and close the idle ones.
+
+        The requests in progress go on for up to drain_timeout seconds, and
+        their connections are closed once they are answered.
+        """
+        if self.stopping:
+            return
+        self.stopping = True
+        for server in self.servers:
+            server.kill()
+        for connection in list(self.connections):
+            connection.close_when_idle()
+        if self.drain_timeout is not None:
+            eventlet.spawn_after(self.drain_timeout, self._abort)
+
+    def _abort(self):
+        for request in list(self.pool.coroutines_running):
+            greenthread.kill(request)
 
     def wait(self):
-        """Wait until all servers have completed running."""
-        try:
-            self.pool.waitall()
-        except KeyboardInterrupt:
-            pass
+        """Wait until all servers have completed running: stop has been
+        called and the requests in progress are done."""
+        for server in self.servers:
+            try:
+                server.wait()
+            except greenlet.GreenletExit:
+                pass  # stopped before it started
 
     def _run(self, application, socket):
         """Start a WSGI server in a new green thread."""
         logger = logging.getLogger('eventlet.wsgi.server')
         # TODO(Ziad): figure out why root logger is not set to same level as
         # caller. Maybe something to do with paste?
-        eventlet.wsgi.server(socket, application, custom_pool=self.pool,
-                             log=WritableLogger(logger, logging.root.level))
+        try:
+            eventlet.wsgi.server(socket, application, custom_pool=self.pool,
+                log=WritableLogger(logger, logging.root.level),
+                protocol=self.protocol)
+        except greenlet.GreenletExit:
+            pass  # stopped, once the requests in progress were done
+
+
+def serve(servers, stop_signals=(signal.SIGTERM, signal.SIGINT)):
+    """Wait on started servers until one of stop_signals arrives, then stop
+    them and wait for the requests in progress."""
+    stopping = event.Event()
+
+    def stop(signum, frame):
+        if not stopping.ready():
+            stopping.send()
+    for signum in stop_signals:
+        signal.signal(signum, stop)
+    stopping.wait()
+    for server in servers:
+        server.stop()
+    for server in servers:
+        server.wait()
+
+
+def run_workers(count, start):
+    """Serve from `count` forked worker processes until SIGTERM or SIGINT.
+
+    start(index) is called in worker number index to start its Servers, on
+    sockets bound before forking, and returns them. A worker that dies is
+    replaced. SIGHUP replaces every worker, so that the apps start afresh
+    from their config, while the old workers finish the requests they have.
+    """
+    workers = {}
+    signals = []
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            # the handler inherited from the parent would only queue a
+            # SIGTERM sent before serve() handles it
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if signals:
+                os._exit(0)
+            status = 1
+            try:
+                _run_worker(start, index)
+                status = 0
+            except Exception:
+                logging.exception("Worker %s failed", os.getpid())
+            finally:
+                # never return into the parent's loop, even on SystemExit
+                os._exit(status)
+        workers[pid] = (index, time.time())
+
+    def stop_all():
+        for pid in workers.keys():
+            _kill(pid, signal.SIGTERM)
+        workers.clear()
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, lambda signum, frame: signals.append(signum))
+    for index in range(count):
+        spawn(index)
+    while True:
+        while signals:
+            signum = signals.pop(0)
+            stop_all()
+            if signum != signal.SIGHUP:
+                _wait_all()
+                return
+            logging.info("Reloading workers")
+            for index in range(count):
+                spawn(index)
+        try:
+            pid, status = os.wait()
+        except OSError, e:
+            if e.errno != errno.EINTR:
+                raise
+            continue
+        if pid not in workers:
+            continue  # a replaced worker done draining
+        index, started = workers.pop(pid)
+        logging.warning("Worker %s exited with status %s, restarting",
+                        pid, status)
+        if time.time() - started < 1:
+            # do not spin on a worker that cannot start
+            time.sleep(1)
+        spawn(index)
+
+
+def _run_worker(start, index):
+    hubs.use_hub()
+    # signals from the terminal reach the whole process group, and the
+    # parent acts on them for us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    serve(start(index), [signal.SIGTERM])
+
+
+def _kill(pid, signum):
+    try:
+        os.kill(pid, signum)
+    except OSError, e:
+        if e.errno != errno.ESRCH:
+            raise
+
+
+def _wait_all():
+    while True:
+        try:
+            os.wait()
+        except OSError, e:
+            if e.errno == errno.ECHILD:
+                return
+            if e.errno != errno.EINTR:
+                raise
 
 
 class Middleware(object):
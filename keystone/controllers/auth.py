@@ -1,6 +1,6 @@
 from keystone import utils
 from keystone.common import wsgi
-from keystone.logic.types.auth import PasswordCredentials
+from keystone.logic.types.auth import PasswordCredentials, TokenIds
 import keystone.config as config
 
 class AuthController(wsgi.Controller):
@@ -27,6 +27,16 @@ class AuthController(wsgi.Controller):
 
         return utils.send_result(200, req, rval)
 
+    @utils.wrap_error
+    def validate_tokens(self, req):
+        belongs_to = req.GET["belongsTo"] if "belongsTo" in req.GET else None
+        token_ids = utils.get_normalized_request_content(TokenIds, req)
+
+        rval = config.SERVICE.validate_tokens(
+            utils.get_auth_token(req), token_ids.ids, belongs_to)
+
+        return utils.send_result(200, req, rval)
+
     @utils.wrap_error
     def delete_token(self, req, token_id):
         return utils.send_result(204, req,
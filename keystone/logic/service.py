@@ -20,6 +20,7 @@ from keystone.logic.types import auth, atom
 import keystone.backends as backends
 import keystone.backends.api as api
 import keystone.backends.models as models
+from keystone.common import cache
 from keystone.logic.types import fault
 from keystone.logic.types.tenant import \
     Tenant, Tenants, User as TenantUser
@@ -30,10 +31,24 @@ from keystone.logic.types.endpoint import Endpoint, Endpoints, \
     EndpointTemplate, EndpointTemplates
 import keystone.utils as utils
 
+# Admin levels a caller token can be granted, in increasing order.
+_NO_ADMIN = 0
+_SERVICE_ADMIN = 1
+_KEYSTONE_ADMIN = 2
+
 
 class IdentityService(object):
     """Implements Identity service"""
 
+    def __init__(self):
+        # ValidateData for recently validated tokens keyed by
+        # (token_id, belongs_to); created on first use so the configured
+        # bounds are known by then.
+        self.validate_cache = None
+        # Admin level of recent caller tokens keyed by token_id, so admin
+        # calls skip re-resolving global roles.
+        self.admin_cache = None
+
     #
     #  Token Operations
     #
@@ -81,10 +96,38 @@ class IdentityService(object):
 
     def validate_token(self, admin_token, token_id, belongs_to=None):
         self.__validate_admin_token(admin_token)
-        if not api.token.get(token_id):
-            raise fault.UnauthorizedFault("Bad token, please reauthenticate")
-        (token, user) = self.__validate_token(token_id, belongs_to)
-        return self.__get_validate_data(token, user)
+        validate_cache = self.__get_cache('validate_cache',
+            backends.VALIDATE_CACHE_SIZE, backends.VALIDATE_CACHE_TTL)
+        validate_data = validate_cache.get((token_id, belongs_to))
+        if validate_data is not None:
+            return validate_data
+        bundle = api.token.get_validation_bundle(token_id)
+        return self.__validate_bundle(validate_cache, token_id, bundle,
+                                      belongs_to)
+
+    def validate_tokens(self, admin_token, token_ids, belongs_to=None):
+        """validate several tokens, fetching the uncached ones at once"""
+        self.__validate_admin_token(admin_token)
+        validate_cache = self.__get_cache('validate_cache',
+            backends.VALIDATE_CACHE_SIZE, backends.VALIDATE_CACHE_TTL)
+        results = {}
+        for token_id in token_ids:
+            validate_data = validate_cache.get((token_id, belongs_to))
+            if validate_data is not None:
+                results[token_id] = validate_data
+        missing = [token_id for token_id in set(token_ids)
+                   if token_id not in results]
+        if missing:
+            bundles = api.token.get_validation_bundles(missing)
+            for token_id in missing:
+                try:
+                    results[token_id] = self.__validate_bundle(
+                        validate_cache, token_id, bundles.get(token_id),
+                        belongs_to)
+                except fault.IdentityFault as err:
+                    results[token_id] = err
+        return auth.ValidateDataList(
+            [(token_id, results[token_id]) for token_id in token_ids])
 
     def revoke_token(self, admin_token, token_id):
         self.__validate_admin_token(admin_token)
@@ -94,6 +137,7 @@ class IdentityService(object):
             raise fault.ItemNotFoundFault("Token not found")
 
         api.token.delete(token_id)
+        self.__invalidate_token_caches(token_id=token_id)
 
     #
     #   Tenant Operations
@@ -125,7 +169,7 @@ class IdentityService(object):
     ##
     def get_tenants(self, admin_token, marker, limit, url):
         try:
-            (_token, user) = self.__validate_admin_token(admin_token)
+            self.__validate_admin_token(admin_token)
             # If Global admin return all
             ts = []
             dtenants = api.tenant.get_page(marker, limit)
@@ -179,6 +223,7 @@ class IdentityService(object):
             raise fault.ItemNotFoundFault("The tenant could not be found")
         values = {'desc': tenant.description, 'enabled': tenant.enabled}
         api.tenant.update(tenant_id, values)
+        self.__invalidate_token_caches(tenant_id=tenant_id)
         return Tenant(dtenant.id, tenant.description, tenant.enabled)
 
     def delete_tenant(self, admin_token, tenant_id):
@@ -190,22 +235,9 @@ class IdentityService(object):
             raise fault.ForbiddenFault("You may not delete a tenant that "
                                        "contains get_users")
         api.tenant.delete(dtenant.id)
+        self.__invalidate_token_caches(tenant_id=dtenant.id)
         return None
 
-    #
-    # Private Operations
-    #
-    def __get_dauth_data(self, token_id):
-        """return token and user object for a token_id"""
-
-        token = None
-        user = None
-        if token_id:
-            token = api.token.get(token_id)
-            if token:
-                user = api.user.get(token.user_id)
-        return (token, user)
-
     #
     #   User Operations
     #
@@ -365,6 +397,7 @@ class IdentityService(object):
         values = {'enabled': user.enabled}
 
         api.user.update(user_id, values)
+        self.__invalidate_token_caches(user_id=user_id)
 
         return User_Update(None,
             None, None, None, user.enabled)
@@ -384,6 +417,7 @@ class IdentityService(object):
         dtenant = self.validate_and_fetch_user_tenant(user.tenant_id)
         values = {'tenant_id': user.tenant_id}
         api.user.update(user_id, values)
+        self.__invalidate_token_caches(user_id=user_id)
         return User_Update(None,
             None, user.tenant_id, None, None)
 
@@ -398,6 +432,7 @@ class IdentityService(object):
             api.user.delete_tenant_user(user_id, dtenant.id)
         else:
             api.user.delete(user_id)
+        self.__invalidate_token_caches(user_id=user_id)
         return None
 
     def __get_auth_data(self, dtoken, tenant_id):
@@ -408,67 +443,135 @@ class IdentityService(object):
         token = auth.Token(dtoken.expires, dtoken.id, tenant_id)
         return auth.AuthData(token, endpoints)
 
-    def __get_validate_data(self, dtoken, duser):
+    def __get_validate_data(self, dtoken, duser, tenant_roles, global_roles):
         """return ValidateData object for a token/user pair"""
 
         token = auth.Token(dtoken.expires, dtoken.id, dtoken.tenant_id)
         ts = []
         if dtoken.tenant_id:
-            droleRefs = api.role.ref_get_all_tenant_roles(duser.id,
-                                                             dtoken.tenant_id)
-            for droleRef in droleRefs:
+            for droleRef in tenant_roles:
                 ts.append(RoleRef(droleRef.id, droleRef.role_id,
                                          droleRef.tenant_id))
-        droleRefs = api.role.ref_get_all_global_roles(duser.id)
-        for droleRef in droleRefs:
+        for droleRef in global_roles:
             ts.append(RoleRef(droleRef.id, droleRef.role_id,
                                      droleRef.tenant_id))
         user = auth.User(duser.id, duser.tenant_id, RoleRefs(ts, []))
         return auth.ValidateData(token, user)
 
-    def __validate_tenant(self, tenant_id):
-        if not tenant_id:
-            raise fault.UnauthorizedFault("Missing tenant")
-        tenant = api.tenant.get(tenant_id)
+    def __validate_bundle(self, validate_cache, token_id, bundle,
+                          belongs_to=None):
+        """return and cache the ValidateData of a token's bundle"""
+        if not bundle:
+            raise fault.UnauthorizedFault("Bad token, please reauthenticate")
+        (token, user, _user_tenant, _token_tenant, tenant_roles,
+            global_roles) = self.__check_token_bundle(bundle, belongs_to)
+        validate_data = self.__get_validate_data(token, user, tenant_roles,
+                                                 global_roles)
+        validate_cache.set((token_id, belongs_to), validate_data,
+            ttl=self.__get_lifetime(token))
+        return validate_data
+
+    def __get_cache(self, name, max_size, ttl):
+        """return the named token cache, creating it on first use"""
+        token_cache = getattr(self, name)
+        if token_cache is None:
+            token_cache = cache.LRUCache(max_size, ttl)
+            setattr(self, name, token_cache)
+        return token_cache
+
+    def __get_lifetime(self, dtoken):
+        """return the seconds left before a token expires"""
+        lifetime = dtoken.expires - datetime.now()
+        return lifetime.days * 86400 + lifetime.seconds
+
+    def __invalidate_token_caches(self, token_id=None, user_id=None,
+                                  tenant_id=None):
+        """drop cached token data affected by a token/user/tenant change"""
+
+        def affected(token, user_id_, user_tenant_id):
+            if token_id and token.id == token_id:
+                return True
+            if user_id and user_id_ == user_id:
+                return True
+            if tenant_id and tenant_id in (token.tenant_id, user_tenant_id):
+                return True
+            return False
+
+        if self.validate_cache is not None:
+            self.validate_cache.delete_matching(
+                lambda key, data: affected(data.token, data.user.username,
+                                           data.user.tenant_id))
+        if self.admin_cache is not None:
+            # entries hold just the level; any user or tenant change drops
+            # them all
+            if user_id or tenant_id:
+                self.admin_cache.clear()
+            elif token_id:
+                self.admin_cache.delete(token_id)
+
+    def __validate_tenant(self, tenant):
         if not tenant.enabled:
             raise fault.TenantDisabledFault("Tenant %s has been disabled!"
                                           % tenant.id)
 
-    def __validate_token(self, token_id, belongs_to=None):
-        if not token_id:
-            raise fault.UnauthorizedFault("Missing token")
-        (token, user) = self.__get_dauth_data(token_id)
-        if not token:
-            raise fault.ItemNotFoundFault("Bad token, please reauthenticate")
+    def __check_token_bundle(self, bundle, belongs_to=None):
+        """check a token validation bundle, returning it when valid"""
+        (token, user, user_tenant, token_tenant, _tenant_roles,
+            _global_roles) = bundle
         if token.expires < datetime.now():
             raise fault.ForbiddenFault("Token expired, please renew")
         if not user.enabled:
             raise fault.UserDisabledFault("User %s has been disabled!"
                                           % user.id)
         if user.tenant_id:
-            self.__validate_tenant(user.tenant_id)
+            self.__validate_tenant(user_tenant)
         if token.tenant_id:
-            self.__validate_tenant(token.tenant_id)
+            self.__validate_tenant(token_tenant)
         if belongs_to and token.tenant_id != belongs_to:
             raise fault.UnauthorizedFault("Unauthorized on this tenant")
-        return (token, user)
+        return bundle
+
+    def __validate_token_bundle(self, token_id, belongs_to=None):
+        """return the checked validation bundle for a token_id"""
+        if not token_id:
+            raise fault.UnauthorizedFault("Missing token")
+        bundle = api.token.get_validation_bundle(token_id)
+        if not bundle:
+            raise fault.ItemNotFoundFault("Bad token, please reauthenticate")
+        return self.__check_token_bundle(bundle, belongs_to)
+
+    def __validate_token(self, token_id, belongs_to=None):
+        return self.__validate_token_bundle(token_id, belongs_to)[:2]
+
+    def __get_admin_level(self, token_id):
+        """return the admin level granted to a caller token"""
+        admin_cache = self.__get_cache('admin_cache',
+            backends.ADMIN_CACHE_SIZE, backends.ADMIN_CACHE_TTL)
+        level = admin_cache.get(token_id)
+        if level is not None:
+            return level
+        (token, _user, _user_tenant, _token_tenant, _tenant_roles,
+            global_roles) = self.__validate_token_bundle(token_id)
+        level = _NO_ADMIN
+        for roleRef in global_roles:
+            if roleRef.tenant_id is not None:
+                continue
+            if roleRef.role_id == backends.KEYSTONEADMINROLE:
+                level = _KEYSTONE_ADMIN
+            elif roleRef.role_id == backends.KEYSTONESERVICEADMINROLE:
+                level = max(level, _SERVICE_ADMIN)
+        admin_cache.set(token_id, level, ttl=self.__get_lifetime(token))
+        return level
 
     def __validate_admin_token(self, token_id):
-        (token, user) = self.__validate_token(token_id)
-        for roleRef in api.role.ref_get_all_global_roles(user.id):
-            if roleRef.role_id == backends.KEYSTONEADMINROLE and \
-                    roleRef.tenant_id is None:
-                return (token, user)
+        if self.__get_admin_level(token_id) >= _KEYSTONE_ADMIN:
+            return
         raise fault.UnauthorizedFault(
             "You are not authorized to make this call")
 
     def __validate_service_or_keystone_admin_token(self, token_id):
-        (token, user) = self.__validate_token(token_id)
-        for roleRef in api.role.ref_get_all_global_roles(user.id):
-            if (roleRef.role_id == backends.KEYSTONEADMINROLE or \
-                roleRef.role_id == backends.KEYSTONESERVICEADMINROLE) and \
-                    roleRef.tenant_id is None:
-                return (token, user)
+        if self.__get_admin_level(token_id) >= _SERVICE_ADMIN:
+            return
         raise fault.UnauthorizedFault(
             "You are not authorized to make this call")
 
@@ -544,12 +647,16 @@ class IdentityService(object):
         if roleRef.tenant_id != None:
             drole_ref.tenant_id = dtenant.id
         user_role_ref = api.user.user_role_add(drole_ref)
+        self.__invalidate_token_caches(user_id=duser.id)
         roleRef.role_ref_id = user_role_ref.id
         return roleRef
 
     def delete_role_ref(self, admin_token, role_ref_id):
         self.__validate_admin_token(admin_token)
+        drole_ref = api.role.ref_get(role_ref_id)
         api.role.ref_delete(role_ref_id)
+        if drole_ref:
+            self.__invalidate_token_caches(user_id=drole_ref.user_id)
         return None
 
     def get_user_roles(self, admin_token, marker, limit, url, user_id):
@@ -18,6 +18,9 @@ from lxml import etree
 
 from keystone.logic.types import fault
 
+# Most token ids accepted by a single bulk validation call
+MAX_TOKEN_IDS = 1000
+
 class PasswordCredentials(object):
     """Credentials based on username, password, and (optional) tenant_id.
         To handle multiple token for a user depending on tenants.
@@ -183,7 +186,7 @@ class ValidateData(object):
         self.token = token
         self.user = user
 
-    def to_xml(self):
+    def to_dom(self):
         dom = etree.Element("auth",
                         xmlns="http://docs.openstack.org/identity/api/v2.0")
         token = etree.Element("token",
@@ -198,9 +201,12 @@ class ValidateData(object):
             user.append(self.user.role_refs.to_dom())
         dom.append(token)
         dom.append(user)
-        return etree.tostring(dom)
+        return dom
 
-    def to_json(self):
+    def to_xml(self):
+        return etree.tostring(self.to_dom())
+
+    def to_dict(self):
         token = {}
         token["id"] = self.token.id
         token["expires"] = self.token.expires.isoformat()
@@ -217,4 +223,84 @@ class ValidateData(object):
         auth["user"] = user
         ret = {}
         ret["auth"] = auth
-        return json.dumps(ret)
+        return ret
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+class TokenIds(object):
+    """Ids of the tokens to validate in a single call."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    @staticmethod
+    def from_xml(xml_str):
+        try:
+            dom = etree.Element("root")
+            dom.append(etree.fromstring(xml_str))
+            root = dom.find("{http://docs.openstack.org/identity/api/v2.0}"
+                            "tokenIds")
+            if root == None:
+                raise fault.BadRequestFault("Expecting tokenIds")
+            ids = []
+            for token in root.findall(
+                    "{http://docs.openstack.org/identity/api/v2.0}tokenId"):
+                if token.get("id") == None:
+                    raise fault.BadRequestFault("Expecting a token id")
+                ids.append(token.get("id"))
+            return TokenIds.__check(ids)
+        except etree.LxmlError as e:
+            raise fault.BadRequestFault("Cannot parse token ids", str(e))
+
+    @staticmethod
+    def from_json(json_str):
+        try:
+            obj = json.loads(json_str)
+            if not "tokenIds" in obj:
+                raise fault.BadRequestFault("Expecting tokenIds")
+            ids = obj["tokenIds"]
+            if not isinstance(ids, list) or \
+                    [id for id in ids if not isinstance(id, basestring)]:
+                raise fault.BadRequestFault("Expecting a list of token ids")
+            return TokenIds.__check(ids)
+        except (ValueError, TypeError) as e:
+            raise fault.BadRequestFault("Cannot parse token ids", str(e))
+
+    @staticmethod
+    def __check(ids):
+        if not ids:
+            raise fault.BadRequestFault("Expecting at least one token id")
+        if len(ids) > MAX_TOKEN_IDS:
+            raise fault.BadRequestFault("At most %d token ids are allowed"
+                                        % MAX_TOKEN_IDS)
+        return TokenIds(ids)
+
+
+class ValidateDataList(object):
+    """Per-token outcome of validating several tokens.
+
+    values is a list of (token_id, result) pairs where result is the
+    ValidateData of a valid token or the IdentityFault it failed with.
+    """
+
+    def __init__(self, values):
+        self.values = values
+
+    def to_xml(self):
+        dom = etree.Element("validations",
+                        xmlns="http://docs.openstack.org/identity/api/v2.0")
+        for token_id, result in self.values:
+            validation = etree.Element("validation", tokenId=token_id)
+            validation.append(result.to_dom())
+            dom.append(validation)
+        return etree.tostring(dom)
+
+    def to_json(self):
+        values = []
+        for token_id, result in self.values:
+            validation = {"tokenId": token_id}
+            validation.update(result.to_dict())
+            values.append(validation)
+        return json.dumps({"validations": values})
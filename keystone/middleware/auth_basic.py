@@ -32,19 +32,17 @@ This is an Auth component as per: http://wiki.openstack.org/openstack-authn
 """
 
 import os
-import urlparse
 import eventlet
 from eventlet import wsgi
 from paste.deploy import loadapp
-from keystone.common.bufferedhttp import http_connect_raw as http_connect
-from webob.exc import Request, Response
+from keystone.common import bufferedhttp
+from keystone.common import proxy
 from webob.exc import HTTPUnauthorized
 
 PROTOCOL_NAME = "Basic Authentication"
 
 
-def _decorate_request_headers(header, value, proxy_headers, env):
-        proxy_headers[header] = value
+def _decorate_request_headers(header, value, env):
         env["HTTP_%s" % header] = value
 
 
@@ -75,6 +73,9 @@ class AuthProtocol(object):
         # through and we let the downstream service make the final decision
         self.delay_auth_decision = int(conf.get('delay_auth_decision', 0))
 
+        # Keep-alive connections to the service
+        self.pool_options = bufferedhttp.pool_options(conf)
+
     def __call__(self, env, start_response):
         def custom_start_response(status, headers):
             if self.delay_auth_decision:
@@ -82,8 +83,6 @@ class AuthProtocol(object):
                                 "Basic realm='Use guest/guest'"))
             return start_response(status, headers)
 
-        #Prep headers to proxy request to remote service
-        proxy_headers = env.copy()
         user = ''
 
         #Look for authentication
@@ -91,7 +90,7 @@ class AuthProtocol(object):
             #No credentials were provided
             if self.delay_auth_decision:
                 _decorate_request_headers("X_IDENTITY_STATUS", "Invalid",
-                                          proxy_headers, env)
+                                          env)
             else:
                 # If the user isn't authenticated, we reject the request and
                 # return 401 indicating we need Basic Auth credentials.
@@ -116,35 +115,28 @@ class AuthProtocol(object):
                 else:
                     # Claims are valid, forward request
                     _decorate_request_headers("X_IDENTITY_STATUS", "Invalid",
-                                              proxy_headers, env)
+                                              env)
 
             # TODO(Ziad): add additional details we may need,
             #             like tenant and group info
             _decorate_request_headers('X_AUTHORIZATION', "Proxy %s" % user,
-                                      proxy_headers, env)
+                                      env)
             _decorate_request_headers("X_IDENTITY_STATUS", "Confirmed",
-                                      proxy_headers, env)
+                                      env)
             _decorate_request_headers('X_TENANT', 'blank',
-                                      proxy_headers, env)
+                                      env)
             #Auth processed, headers added now decide how to pass on the call
             if self.app:
                 # Pass to downstream WSGI component
                 env['HTTP_AUTHORIZATION'] = "Basic %s" % self.service_pass
                 return self.app(env, custom_start_response)
 
-            proxy_headers['AUTHORIZATION'] = "Basic %s" % self.service_pass
+            env['HTTP_AUTHORIZATION'] = "Basic %s" % self.service_pass
             # We are forwarding to a remote service (no downstream WSGI app)
-            req = Request(proxy_headers)
-            parsed = urlparse(req.url)
-            conn = http_connect(self.service_host, self.service_port, \
-                                req.method, parsed.path, \
-                                proxy_headers, \
-                                ssl=(self.service_protocol == 'https'))
-            resp = conn.getresponse()
-            data = resp.read()
-            #TODO(ziad): use a more sophisticated proxy
-            # we are rewriting the headers now
-            return Response(status=resp.status, body=data)(env, start_response)
+            return proxy.forward(env, start_response,
+                                 self.service_host, self.service_port,
+                                 ssl=(self.service_protocol == 'https'),
+                                 pool_options=self.pool_options)
 
     def validateCreds(self, username, password):
         #stub for password validation.
@@ -18,11 +18,10 @@
 # Not Yet PEP8 standardized
 
 import os
-import urlparse
 import eventlet
 from eventlet import wsgi
-from keystone.common.bufferedhttp import http_connect_raw as http_connect
-from webob.exc import Request, Response
+from keystone.common import bufferedhttp
+from keystone.common import proxy
 from paste.deploy import loadapp
 
 """
@@ -68,6 +67,9 @@ class AuthProtocol(object):
         # through and we let the downstream service make the final decision
         self.delay_auth_decision = int(conf.get('delay_auth_decision', 0))
 
+        # Keep-alive connections to the service
+        self.pool_options = bufferedhttp.pool_options(conf)
+
     def __call__(self, env, start_response):
         def custom_start_response(status, headers):
             if self.delay_auth_decision:
@@ -82,20 +84,12 @@ class AuthProtocol(object):
             env['HTTP_AUTHORIZATION'] = "Basic %s" % self.service_pass
             return self.app(env, custom_start_response)
 
-        proxy_headers = []
-        proxy_headers['AUTHORIZATION'] = "Basic %s" % self.service_pass
+        env['HTTP_AUTHORIZATION'] = "Basic %s" % self.service_pass
         # We are forwarding to a remote service (no downstream WSGI app)
-        req = Request(proxy_headers)
-        parsed = urlparse(req.url)
-        conn = http_connect(self.service_host, self.service_port, \
-             req.method, parsed.path, \
-             proxy_headers, \
-             ssl=(self.service_protocol == 'https'))
-        resp = conn.getresponse()
-        data = resp.read()
-        #TODO(ziad): use a more sophisticated proxy
-        # we are rewriting the headers now
-        return Response(status=resp.status, body=data)(env, start_response)
+        return proxy.forward(env, start_response,
+                             self.service_host, self.service_port,
+                             ssl=(self.service_protocol == 'https'),
+                             pool_options=self.pool_options)
 
 
 def filter_factory(global_conf, **local_conf):
@@ -57,15 +57,25 @@ import httplib
 import json
 import os
 from paste.deploy import loadapp
-from urlparse import urlparse
 from webob.exc import HTTPUnauthorized, HTTPUseProxy
-from webob.exc import Request, Response
 
-from keystone.common.bufferedhttp import http_connect_raw as http_connect
+from keystone.common import bufferedhttp
+from keystone.common.bufferedhttp import http_connect_pooled as http_connect
+from keystone.common import cache
+from keystone.common import proxy
 
 PROTOCOL_NAME = "Token Authentication"
 
 
+class RequestContext(object):
+    """State of a single request passing through AuthProtocol"""
+
+    def __init__(self, env, start_response):
+        self.env = env
+        self.start_response = start_response
+        self.claims = None
+
+
 class AuthProtocol(object):
     """Auth Middleware that handles authenticating client calls"""
 
@@ -109,6 +119,12 @@ class AuthProtocol(object):
         # validating tokens is a priviledged call
         self.admin_token = conf.get('admin_token')
 
+        # Recently validated (and rejected) tokens, see cache.TokenCache
+        self.token_cache = cache.TokenCache(conf)
+
+        # Keep-alive connections to Keystone and the service
+        self.pool_options = bufferedhttp.pool_options(conf)
+
     def __init__(self, app, conf):
         """ Common initialization code """
 
@@ -119,65 +135,50 @@ class AuthProtocol(object):
     def __call__(self, env, start_response):
         """ Handle incoming request. Authenticate. And send downstream. """
 
-        self.start_response = start_response
-        self.env = env
-
-        #Prep headers to forward request to local or remote downstream service
-        self.proxy_headers = env.copy()
-        for header in self.proxy_headers.iterkeys():
-            if header[0:5] == 'HTTP_':
-                self.proxy_headers[header[5:]] = self.proxy_headers[header]
-                del self.proxy_headers[header]
+        # One instance serves many concurrent requests, so everything that
+        # belongs to this request lives in ctx rather than on self
+        ctx = RequestContext(env, start_response)
 
         #Look for authentication claims
-        self.claims = self._get_claims(env)
-        if not self.claims:
+        ctx.claims = self._get_claims(env)
+        if not ctx.claims:
             #No claim(s) provided
             if self.delay_auth_decision:
                 #Configured to allow downstream service to make final decision.
                 #So mark status as Invalid and forward the request downstream
-                self._decorate_request("X_IDENTITY_STATUS", "Invalid")
+                self._decorate_request(ctx, "X_IDENTITY_STATUS", "Invalid")
             else:
                 #Respond to client as appropriate for this auth protocol
-                return self._reject_request()
+                return self._reject_request(ctx)
         else:
             # this request is presenting claims. Let's validate them
-            valid = self._validate_claims(self.claims)
+            claims = self._validate_claims(ctx.claims)
+            valid = bool(claims)
             if not valid:
                 # Keystone rejected claim
                 if self.delay_auth_decision:
                     # Downstream service will receive call still and decide
-                    self._decorate_request("X_IDENTITY_STATUS", "Invalid")
+                    self._decorate_request(ctx, "X_IDENTITY_STATUS",
+                                           "Invalid")
                 else:
                     #Respond to client as appropriate for this auth protocol
-                    return self._reject_claims()
+                    return self._reject_claims(ctx)
             else:
-                self._decorate_request("X_IDENTITY_STATUS", "Confirmed")
+                self._decorate_request(ctx, "X_IDENTITY_STATUS", "Confirmed")
 
             #Collect information about valid claims
             if valid:
-                claims = self._expound_claims()
-
                 # Store authentication data
-                if claims:
-                    self._decorate_request('X_AUTHORIZATION', "Proxy %s" % 
-                        claims['user'])
-                    self._decorate_request('X_TENANT', claims['tenant'])
-                    self._decorate_request('X_USER', claims['user'])
-                    if 'roles' in claims and len(claims['roles']) > 0:
-                        if claims['roles'] != None:
-                            roles = ''
-                            for role in claims['roles']:
-                                if len(roles) > 0:
-                                    roles += ','
-                                roles += role
-                            self._decorate_request('X_ROLE', roles)
-
-                    # NOTE(todd): unused
-                    self.expanded = True
-
-            #Send request downstream
-            return self._forward_request()
+                self._decorate_request(ctx, 'X_AUTHORIZATION', "Proxy %s" %
+                    claims['user'])
+                self._decorate_request(ctx, 'X_TENANT', claims['tenant'])
+                self._decorate_request(ctx, 'X_USER', claims['user'])
+                if claims.get('roles'):
+                    self._decorate_request(ctx, 'X_ROLE',
+                                           ','.join(claims['roles']))
+
+        #Send request downstream
+        return self._forward_request(ctx)
 
     # NOTE(todd): unused
     def get_admin_auth_token(self, username, password, tenant):
@@ -203,18 +204,27 @@ class AuthProtocol(object):
         claims = env.get('HTTP_X_AUTH_TOKEN', env.get('HTTP_X_STORAGE_TOKEN'))
         return claims
 
-    def _reject_request(self):
+    def _reject_request(self, ctx):
         """Redirect client to auth server"""
-        return HTTPUseProxy(location=self.auth_location)(self.env,
-            self.start_response)
+        return HTTPUseProxy(location=self.auth_location)(ctx.env,
+            ctx.start_response)
 
-    def _reject_claims(self):
+    def _reject_claims(self, ctx):
         """Client sent bad claims"""
-        return HTTPUnauthorized()(self.env,
-            self.start_response)
+        return HTTPUnauthorized()(ctx.env,
+            ctx.start_response)
 
     def _validate_claims(self, claims):
-        """Validate claims, and provide identity information isf applicable """
+        """Validate claims, and provide identity information if applicable
+
+        Returns the verified claims (see _expound_claims) when Keystone
+        accepts the token, False otherwise.
+        """
+        cached = self.token_cache.get(claims)
+        if cached == self.token_cache.INVALID:
+            return False
+        elif cached is not None:
+            return cached
 
         # Step 1: We need to auth with the keystone service, so get an
         # admin token
@@ -235,40 +245,28 @@ class AuthProtocol(object):
                     # "X-Auth-Token": admin_token}
                     # we're using a test token from the ini file for now
         conn = http_connect(self.auth_host, self.auth_port, 'GET',
-                            '/v2.0/tokens/%s' % claims, headers=headers)
-        resp = conn.getresponse()
-        # data = resp.read()
-        conn.close()
+                            '/v2.0/tokens/%s' % claims, headers=headers,
+                            pool_options=self.pool_options)
+        try:
+            resp = conn.getresponse()
+            data = resp.read()
+        finally:
+            conn.close()
 
         if not str(resp.status).startswith('20'):
             # Keystone rejected claim
+            self.token_cache.store_rejected(claims, resp.status)
             return False
-        else:
-            #TODO(Ziad): there is an optimization we can do here. We have just
-            #received data from Keystone that we can use instead of making
-            #another call in _expound_claims
-            return True
+        # The validation response already carries the identity, so expound
+        # the claims from it rather than asking Keystone a second time
+        verified_claims = self._expound_claims(data)
+        self.token_cache.store(claims, verified_claims,
+                               verified_claims['expires'])
+        return verified_claims
 
-    def _expound_claims(self):
+    def _expound_claims(self, data):
         # Valid token. Get user data and put it in to the call
         # so the downstream service can use it
-        headers = {"Content-type": "application/json",
-                    "Accept": "text/json",
-                    "X-Auth-Token": self.admin_token}
-                    ##TODO(ziad):we need to figure out how to auth to keystone
-                    #since validate_token is a priviledged call
-                    #Khaled's version uses creds to get a token
-                    # "X-Auth-Token": admin_token}
-                    # we're using a test token from the ini file for now
-        conn = http_connect(self.auth_host, self.auth_port, 'GET',
-                            '/v2.0/tokens/%s' % self.claims, headers=headers)
-        resp = conn.getresponse()
-        data = resp.read()
-        conn.close()
-
-        if not str(resp.status).startswith('20'):
-            raise LookupError('Unable to locate claims: %s' % resp.status)
-
         token_info = json.loads(data)
         roles = []
         role_refs = token_info["auth"]["user"]["roleRefs"]
@@ -278,39 +276,28 @@ class AuthProtocol(object):
 
         verified_claims = {'user': token_info['auth']['user']['username'],
                     'tenant': token_info['auth']['user']['tenantId'],
-                    'roles': roles}
+                    'roles': roles,
+                    'expires': token_info['auth']['token']['expires']}
         return verified_claims
 
-    def _decorate_request(self, index, value):
+    def _decorate_request(self, ctx, index, value):
         """Add headers to request"""
-        self.proxy_headers[index] = value
-        self.env["HTTP_%s" % index] = value
+        ctx.env["HTTP_%s" % index] = value
 
-    def _forward_request(self):
+    def _forward_request(self, ctx):
         """Token/Auth processed & claims added to headers"""
-        self._decorate_request('AUTHORIZATION',
-                                  "Basic %s" % self.service_pass)
+        self._decorate_request(ctx, 'AUTHORIZATION',
+                               "Basic %s" % self.service_pass)
         #now decide how to pass on the call
         if self.app:
             # Pass to downstream WSGI component
-            return self.app(self.env, self.start_response)
-            #.custom_start_response)
+            return self.app(ctx.env, ctx.start_response)
         else:
             # We are forwarding to a remote service (no downstream WSGI app)
-            req = Request(self.proxy_headers)
-            parsed = urlparse(req.url)
-            conn = http_connect(self.service_host,
-                                self.service_port,
-                                req.method,
-                                parsed.path,
-                                self.proxy_headers,
-                                ssl=(self.service_protocol == 'https'))
-            resp = conn.getresponse()
-            data = resp.read()
-            #TODO(ziad): use a more sophisticated proxy
-            # we are rewriting the headers now
-            return Response(status=resp.status, body=data)(self.proxy_headers,
-                                                           self.start_response)
+            return proxy.forward(ctx.env, ctx.start_response,
+                                 self.service_host, self.service_port,
+                                 ssl=(self.service_protocol == 'https'),
+                                 pool_options=self.pool_options)
 
 
 def filter_factory(global_conf, **local_conf):
@@ -23,8 +23,8 @@ TOKEN-BASED AUTH MIDDLEWARE FOR SWIFT
 
 Authentication on incoming request
     * grab token from X-Auth-Token header
-    * TODO: grab the memcache servers from the request env
-    * TODOcheck for auth information in memcache
+    * check for auth information in the token cache (memcache servers from
+      the request env when token_cache = memcache)
     * check for auth information from keystone
     * return if unauthorized
     * decorate the request for authorization in swift
@@ -43,7 +43,9 @@ import json
 from urlparse import urlparse
 from webob.exc import HTTPUnauthorized, HTTPNotFound, HTTPExpectationFailed
 
-from keystone.common.bufferedhttp import http_connect_raw as http_connect
+from keystone.common import bufferedhttp
+from keystone.common.bufferedhttp import http_connect_pooled as http_connect
+from keystone.common import cache
 
 from swift.common.middleware.acl import clean_acl, parse_acl, referrer_allowed
 from swift.common.utils import cache_from_env, get_logger, split_path
@@ -64,6 +66,7 @@ class AuthProtocol(object):
         use = egg:keystone#swiftauth
         keystone_url = http://127.0.0.1:8080
         keystone_admin_token = 999888777666
+        token_cache = memcache
 
     """
 
@@ -73,6 +76,8 @@ class AuthProtocol(object):
         self.keystone_url = urlparse(conf.get('keystone_url'))
         self.admin_token = conf.get('keystone_admin_token')
         self.reseller_prefix = conf.get('reseller_prefix', 'AUTH')
+        self.token_cache = cache.TokenCache(conf)
+        self.pool_options = bufferedhttp.pool_options(conf)
         self.log = get_logger(conf, log_route='keystone')
         self.log.info('Keystone middleware started')
 
@@ -88,7 +93,7 @@ class AuthProtocol(object):
         token = self._get_claims(env)
         self.log.debug('token: %s', token)
         if token:
-            identity = self._validate_claims(token)
+            identity = self._validate_claims(token, env)
             if identity:
                 self.log.debug('request authenticated: %r', identity)
                 return self.perform_authenticated_request(identity, env,
@@ -193,10 +198,19 @@ class AuthProtocol(object):
         claims = env.get('HTTP_X_AUTH_TOKEN', env.get('HTTP_X_STORAGE_TOKEN'))
         return claims
 
-    def _validate_claims(self, claims):
+    def _validate_claims(self, claims, env=None):
         """Ask keystone (as keystone admin) for information for this user."""
 
-        # TODO(todd): cache
+        memcache_client = None
+        if env is not None and self.token_cache.kind == 'memcache':
+            memcache_client = cache_from_env(env)
+        identity = self.token_cache.get(claims, memcache_client)
+        self.log.debug('token cache hits: %d misses: %d',
+                       self.token_cache.hits, self.token_cache.misses)
+        if identity == self.token_cache.INVALID:
+            return False
+        elif identity is not None:
+            return identity
 
         self.log.debug('Asking keystone to validate token')
         headers = {"Content-type": "application/json",
@@ -205,13 +219,18 @@ class AuthProtocol(object):
         self.log.debug('headers: %r', headers)
         self.log.debug('url: %s', self.keystone_url)
         conn = http_connect(self.keystone_url.hostname, self.keystone_url.port,
-                            'GET', '/v2.0/tokens/%s' % claims, headers=headers)
-        resp = conn.getresponse()
-        data = resp.read()
-        conn.close()
+                            'GET', '/v2.0/tokens/%s' % claims, headers=headers,
+                            pool_options=self.pool_options)
+        try:
+            resp = conn.getresponse()
+            data = resp.read()
+        finally:
+            conn.close()
 
         # Check http status code for the "OK" family of responses
         if not str(resp.status).startswith('20'):
+            self.token_cache.store_rejected(claims, resp.status,
+                                            memcache_client)
             return False
 
         identity_info = json.loads(data)
@@ -224,6 +243,9 @@ class AuthProtocol(object):
         identity = {'user': identity_info['auth']['user']['username'],
                     'tenant': identity_info['auth']['user']['tenantId'],
                     'roles':roles}
+        self.token_cache.store(claims, identity,
+                               identity_info['auth']['token']['expires'],
+                               memcache_client)
 
         return identity
 
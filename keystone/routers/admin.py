@@ -25,6 +25,10 @@ class AdminApi(wsgi.Router):
         mapper.connect("/v2.0/tokens", controller=auth_controller,
                        action="authenticate",
                        conditions=dict(method=["POST"]))
+        mapper.connect("/v2.0/tokens/validations",
+                       controller=auth_controller,
+                       action="validate_tokens",
+                       conditions=dict(method=["POST"]))
         mapper.connect("/v2.0/tokens/{token_id}", controller=auth_controller,
                         action="validate_token",
                         conditions=dict(method=["GET"]))
@@ -35,17 +35,42 @@ HTTP_AUTHORIZATION  : basic auth password used to validate the connection
 HTTP_X_AUTHORIZATION: the client identity being passed in
 
 """
+import webob.dec
+
+from keystone.backends import sqlalchemy
+from keystone.common import wsgi
 from keystone.routers.service import ServiceApi
 from keystone.routers.admin import AdminApi
 
+
+class RequestSession(wsgi.Middleware):
+    """Makes each request one unit of work against the SQL backends.
+
+    The backends' sessions are shared for the duration of the request, and
+    their work is committed before a successful response goes out or rolled
+    back when the request fails.
+    """
+
+    @webob.dec.wsgify
+    def __call__(self, req):
+        sqlalchemy.begin_request()
+        commit = False
+        try:
+            response = req.get_response(self.application)
+            commit = response.status_int < 400
+        finally:
+            sqlalchemy.end_request(commit)
+        return response
+
+
 def service_app_factory(global_conf, **local_conf):
     """paste.deploy app factory for creating OpenStack API server apps"""
     conf = global_conf.copy()
     conf.update(local_conf)
-    return ServiceApi(conf)
+    return RequestSession(ServiceApi(conf))
 
 def admin_app_factory(global_conf, **local_conf):
     """paste.deploy app factory for creating OpenStack API server apps"""
     conf = global_conf.copy()
     conf.update(local_conf)
-    return AdminApi(conf)
+    return RequestSession(AdminApi(conf))
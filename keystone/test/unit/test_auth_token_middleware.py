@@ -0,0 +1,201 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import json
+import unittest
+
+import eventlet
+
+from keystone.middleware import auth_token
+
+
+TOKENS = {
+    'joeuser_token': {'auth': {
+        'token': {'id': 'joeuser_token',
+                  'expires': '2015-02-05T00:00:00'},
+        'user': {'username': 'joeuser', 'tenantId': '1234',
+                 'roleRefs': [{'id': 1, 'roleId': 'Admin',
+                               'tenantId': '1234'}]}}},
+}
+for i in range(20):
+    TOKENS['user%d_token' % i] = {'auth': {
+        'token': {'id': 'user%d_token' % i},
+        'user': {'username': 'user%d' % i, 'tenantId': 'tenant%d' % i,
+                 'roleRefs': [{'id': i, 'roleId': 'Role%d' % i,
+                               'tenantId': 'tenant%d' % i}]}}}
+for token in TOKENS.values():
+    token['auth']['token']['expires'] = \
+        (datetime.datetime.now() + datetime.timedelta(days=1)).isoformat()
+
+
+class FakeResponse(object):
+
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    def read(self):
+        return self.body
+
+
+class FakeConnection(object):
+
+    def __init__(self, response):
+        self.response = response
+
+    def getresponse(self):
+        # yield, as a real connection would, so requests interleave
+        eventlet.sleep(0)
+        return self.response
+
+    def close(self):
+        pass
+
+
+class FakeKeystone(object):
+    """Stands in for http_connect, answering token validation requests"""
+
+    def __init__(self):
+        self.requests = []
+        # status of tokens Keystone does not know, 404 when it is the
+        # admin token it does not know
+        self.rejection = 401
+
+    def __call__(self, host, port, method, path, headers=None, **kwargs):
+        self.requests.append((method, path))
+        token_id = path.rsplit('/', 1)[-1]
+        if token_id in TOKENS:
+            response = FakeResponse(200, json.dumps(TOKENS[token_id]))
+        else:
+            response = FakeResponse(self.rejection, '')
+        return FakeConnection(response)
+
+
+class FakeApp(object):
+
+    def __call__(self, env, start_response):
+        self.env = env
+        eventlet.sleep(0)
+        start_response('200 OK', [])
+        return [env.get('HTTP_X_USER', 'ok')]
+
+
+class AuthTokenMiddlewareTest(unittest.TestCase):
+
+    conf = {'service_host': '127.0.0.1', 'service_port': '8100',
+            'auth_host': '127.0.0.1', 'auth_port': '5001',
+            'admin_token': '999888777666', 'service_pass': 'dTpw'}
+
+    def setUp(self):
+        self.keystone = FakeKeystone()
+        self.real_http_connect = auth_token.http_connect
+        auth_token.http_connect = self.keystone
+        self.app = FakeApp()
+        self.middleware = auth_token.AuthProtocol(self.app, self.conf)
+
+    def tearDown(self):
+        auth_token.http_connect = self.real_http_connect
+
+    def call(self, token):
+        env = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/',
+               'HTTP_X_AUTH_TOKEN': token}
+        self.statuses = []
+        body = self.middleware(env,
+            lambda status, headers: self.statuses.append(status))
+        return env, body
+
+    def test_valid_token_validated_once(self):
+        env, body = self.call('joeuser_token')
+        self.assertEqual(body, ['joeuser'])
+        self.assertEqual(len(self.keystone.requests), 1)
+        self.assertEqual(env['HTTP_X_IDENTITY_STATUS'], 'Confirmed')
+        self.assertEqual(env['HTTP_X_USER'], 'joeuser')
+        self.assertEqual(env['HTTP_X_TENANT'], '1234')
+        self.assertEqual(env['HTTP_X_ROLE'], 'Admin')
+
+    def test_invalid_token_rejected(self):
+        env, body = self.call('bad_token')
+        self.assertEqual(self.statuses[0][:3], '401')
+        self.assertEqual(len(self.keystone.requests), 1)
+        self.assertFalse('HTTP_X_USER' in env)
+
+    def test_valid_token_cached(self):
+        self.call('joeuser_token')
+        env, body = self.call('joeuser_token')
+        self.assertEqual(len(self.keystone.requests), 1)
+        self.assertEqual(env['HTTP_X_USER'], 'joeuser')
+        self.assertEqual(self.middleware.token_cache.hits, 1)
+        self.assertEqual(self.middleware.token_cache.misses, 1)
+
+    def test_invalid_token_cached(self):
+        self.call('joeuser_token')
+        self.call('bad_token')
+        self.call('bad_token')
+        self.assertEqual(self.statuses[0][:3], '401')
+        self.assertEqual(len(self.keystone.requests), 2)
+
+    def test_rejections_cached_once_the_admin_token_is_taken(self):
+        self.call('bad_token')
+        self.call('bad_token')
+        self.assertEqual(len(self.keystone.requests), 2)
+
+    def test_rejections_not_cached_after_admin_token_refused(self):
+        self.call('joeuser_token')
+        self.keystone.rejection = 404
+        self.call('bad_token')
+        self.keystone.rejection = 401
+        self.call('bad_token')
+        self.call('bad_token')
+        self.assertEqual(self.statuses[0][:3], '401')
+        self.assertEqual(len(self.keystone.requests), 4)
+
+    def test_concurrent_requests_keep_their_identity(self):
+        self.middleware.token_cache.backend = None
+
+        def call(i):
+            if i % 4 == 3:
+                token = 'bad_token'
+            else:
+                token = 'user%d_token' % (i % 20)
+            env = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/',
+                   'HTTP_X_AUTH_TOKEN': token}
+            statuses = []
+            body = self.middleware(env,
+                lambda status, headers: statuses.append(status))
+            return token, env, statuses, ''.join(body)
+
+        pool = eventlet.GreenPool(200)
+        results = list(pool.imap(call, range(1000)))
+        self.assertEqual(len(self.keystone.requests), 1000)
+        for token, env, statuses, body in results:
+            self.assertEqual(len(statuses), 1)
+            if token == 'bad_token':
+                self.assertEqual(statuses[0][:3], '401')
+                self.assertFalse('HTTP_X_USER' in env)
+                continue
+            i = token[4:-6]
+            self.assertEqual(statuses[0][:3], '200')
+            self.assertEqual(body, 'user%s' % i)
+            self.assertEqual(env['HTTP_X_USER'], 'user%s' % i)
+            self.assertEqual(env['HTTP_X_TENANT'], 'tenant%s' % i)
+            self.assertEqual(env['HTTP_X_ROLE'], 'Role%s' % i)
+            self.assertEqual(env['HTTP_X_AUTHORIZATION'], 'Proxy user%s' % i)
+
+
+if __name__ == '__main__':
+    unittest.main()
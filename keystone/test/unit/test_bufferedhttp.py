@@ -0,0 +1,133 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+import eventlet
+from eventlet import wsgi
+
+from keystone.common import bufferedhttp
+
+
+class NullLog(object):
+
+    def write(self, data):
+        pass
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = set()
+
+        def app(env, start_response):
+            start_response('200 OK', [('Content-Length', '2')])
+            return ['ok']
+
+        self.sock = eventlet.listen(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.server = eventlet.spawn(wsgi.server, self.sock, app,
+                                     log=NullLog())
+        self.pool = bufferedhttp.get_pool('127.0.0.1', self.port)
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.kill()
+        self.sock.close()
+
+    def request(self):
+        conn = bufferedhttp.http_connect_pooled('127.0.0.1', self.port,
+                                                'GET', '/')
+        resp = conn.getresponse()
+        data = resp.read()
+        # the local port tells the client connections apart
+        self.clients.add(conn.sock.getsockname()[1])
+        conn.close()
+        return resp.status, data
+
+    def test_connection_is_reused(self):
+        for _i in range(3):
+            self.assertEquals(self.request(), (200, 'ok'))
+        self.assertEquals(len(self.clients), 1)
+        self.assertEquals(self.pool.created, 1)
+        self.assertEquals(self.pool.reused, 2)
+
+    def test_unread_response_is_not_reused(self):
+        conn = bufferedhttp.http_connect_pooled('127.0.0.1', self.port,
+                                                'GET', '/')
+        conn.getresponse()
+        conn.close()
+        self.assertEquals(self.pool.idle, [])
+
+    def test_idle_connection_expires(self):
+        self.pool.idle_timeout = 0
+        self.request()
+        self.request()
+        self.assertEquals(self.pool.created, 2)
+        self.assertEquals(len(self.clients), 2)
+
+    def test_stale_connection_is_retried(self):
+        self.request()
+        idle_conn = self.pool.idle[0][0]
+        idle_conn.sock.close()
+        self.assertEquals(self.request(), (200, 'ok'))
+        self.assertEquals(self.pool.created, 1)
+        self.assertEquals(len(self.clients), 2)
+
+    def test_pool_size_is_bounded(self):
+        self.pool.max_size = 1
+        conns = [self.pool.get() for _i in range(3)]
+        for conn in conns:
+            conn.request('GET', '/')
+            conn.getresponse().read()
+        for conn in conns:
+            conn.close()
+        self.assertEquals(len(self.pool.idle), 1)
+
+    def test_connections_per_host_are_limited(self):
+        pool = bufferedhttp.get_pool('127.0.0.1', self.port,
+                                     max_connections=2, wait_timeout=0.05)
+        conns = [pool.get(), pool.get()]
+        self.assertRaises(bufferedhttp.PoolTimeout, pool.get)
+        self.assertEquals(pool.timeouts, 1)
+        waiter = eventlet.spawn(pool.get)
+        eventlet.sleep(0)
+        # unused, so closed rather than kept, which frees its slot all
+        # the same
+        conns[0].close()
+        conns[1] = waiter.wait()
+        for conn in conns[1:]:
+            conn.close()
+        self.assertEquals(pool.timeouts, 1)
+        pool.get().close()
+
+    def test_pools_follow_their_options(self):
+        pool = bufferedhttp.get_pool('127.0.0.1', self.port, max_size=1)
+        self.assertFalse(pool is self.pool)
+        self.assertEquals(pool.max_size, 1)
+        self.assertEquals(self.pool.max_size, bufferedhttp.POOL_MAX_SIZE)
+        self.assertTrue(pool is bufferedhttp.get_pool('127.0.0.1',
+            str(self.port), max_size=1))
+        self.assertEquals(bufferedhttp.pool_options(
+            {'http_pool_size': '1', 'http_pool_max_connections': '0'}),
+            {'max_size': 1, 'idle_timeout': bufferedhttp.POOL_IDLE_TIMEOUT,
+             'max_connections': 0,
+             'wait_timeout': bufferedhttp.POOL_WAIT_TIMEOUT})
+
+
+if __name__ == '__main__':
+    unittest.main()
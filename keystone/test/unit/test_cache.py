@@ -0,0 +1,146 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import time
+import unittest
+
+from keystone.common import cache
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = cache.LRUCache(max_size=3, ttl=60)
+
+    def test_get_set(self):
+        self.assertEqual(self.cache.get('a'), None)
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.set('c', 3)
+        self.cache.get('a')
+        self.cache.set('d', 4)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.get('b'), None)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('d'), 4)
+
+    def test_entry_ttl_is_capped(self):
+        self.cache.set('a', 1, ttl=0.01)
+        self.cache.set('b', 2, ttl=3600)
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(self.cache.get('b'), 2)
+        self.cache.set('c', 3, ttl=-5)
+        self.assertEqual(self.cache.get('c'), None)
+
+    def test_delete_matching(self):
+        self.cache.set(('t1', None), 'user1')
+        self.cache.set(('t1', 'tenant'), 'user1')
+        self.cache.set(('t2', None), 'user2')
+        self.cache.delete_matching(lambda key, value: key[0] == 't1')
+        self.assertEqual(len(self.cache), 1)
+        self.cache.delete(('t2', None))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_disabled(self):
+        disabled = cache.LRUCache(max_size=0)
+        disabled.set('a', 1)
+        self.assertEqual(disabled.get('a'), None)
+        self.assertEqual(len(disabled), 0)
+
+
+class FakeMemcache(object):
+    """Minimal swift MemcacheRing look-alike"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key, (None, None))[0]
+
+    def set(self, key, value, serialize=True, timeout=0):
+        self.store[key] = (value, timeout)
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+
+class TokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.expires = datetime.datetime.now() + datetime.timedelta(hours=1)
+        self.claims = {'user': 'joeuser', 'tenant': '1234', 'roles': []}
+
+    def test_memory(self):
+        token_cache = cache.TokenCache({'token_cache_ttl': '60'})
+        self.assertEqual(token_cache.get('token'), None)
+        token_cache.store('token', self.claims, self.expires.isoformat())
+        self.assertEqual(token_cache.get('token'), self.claims)
+        self.assertEqual(token_cache.hits, 1)
+        self.assertEqual(token_cache.misses, 1)
+
+    def test_expired_token_not_cached(self):
+        token_cache = cache.TokenCache({})
+        token_cache.store('token', self.claims,
+                          datetime.datetime.now() - datetime.timedelta(1))
+        self.assertEqual(token_cache.get('token'), None)
+
+    def test_negative(self):
+        token_cache = cache.TokenCache({'token_cache_negative_ttl': '5'})
+        token_cache.store_invalid('token')
+        self.assertEqual(token_cache.get('token'), token_cache.INVALID)
+
+    def test_rejections(self):
+        token_cache = cache.TokenCache({})
+        token_cache.store_rejected('unknown', 401)
+        self.assertEqual(token_cache.get('unknown'), None)
+        token_cache.store('token', self.claims, self.expires)
+        token_cache.store_rejected('unknown', 401)
+        token_cache.store_rejected('expired', 403)
+        self.assertEqual(token_cache.get('unknown'), token_cache.INVALID)
+        self.assertEqual(token_cache.get('expired'), token_cache.INVALID)
+        # the admin token is no longer known
+        token_cache.store_rejected('other', 404)
+        token_cache.store_rejected('other', 401)
+        self.assertEqual(token_cache.get('other'), None)
+
+    def test_memcache_from_env(self):
+        memcache_client = FakeMemcache()
+        token_cache = cache.TokenCache({'token_cache': 'memcache',
+                                        'token_cache_ttl': '60'})
+        token_cache.store('token', self.claims, self.expires, memcache_client)
+        self.assertEqual(memcache_client.store['keystone/token'],
+                         (self.claims, 60))
+        self.assertEqual(token_cache.get('token', memcache_client),
+                         self.claims)
+        self.assertEqual(token_cache.get('token'), None)
+
+    def test_disabled(self):
+        token_cache = cache.TokenCache({'token_cache': 'none'})
+        token_cache.store_invalid('token')
+        self.assertEqual(token_cache.get('token'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import ldap
+
+from keystone.backends.ldap import fakeldap
+
+USERS = 'ou=Users,dc=example,dc=com'
+GROUPS = 'ou=Groups,dc=example,dc=com'
+
+QUERIES = [
+    (USERS, ldap.SCOPE_ONELEVEL, '(objectClass=keystoneUser)'),
+    (USERS, ldap.SCOPE_ONELEVEL, '(&(mail=user3@example.com)'
+                                 '(objectClass=keystoneUser))'),
+    (USERS, ldap.SCOPE_ONELEVEL, '(|(mail=user1@example.com)(cn=user2)'
+                                 '(mail=nobody@example.com))'),
+    (GROUPS, ldap.SCOPE_ONELEVEL, '(&(|(member=cn=user1,%s)'
+                                  '(member=cn=user4,%s))'
+                                  '(objectClass=keystoneTenant))'
+                                  % (USERS, USERS)),
+    (GROUPS, ldap.SCOPE_ONELEVEL, '(&(!(member=cn=user1,%s))'
+                                  '(objectClass=keystoneTenant))' % USERS),
+    (GROUPS, ldap.SCOPE_SUBTREE, '(&(objectClass=keystoneTenantRole)'
+                                 '(member=cn=user2,%s))' % USERS),
+    (GROUPS, ldap.SCOPE_SUBTREE, '(member=*)'),
+    (USERS, ldap.SCOPE_ONELEVEL, None),
+]
+
+
+def populate(conn):
+    for i in range(6):
+        conn.add_s('cn=user%d,%s' % (i, USERS),
+                   [('objectClass', 'keystoneUser'),
+                    ('mail', 'user%d@example.com' % i)])
+    for tenant in ('even', 'odd'):
+        members = ['cn=user%d,%s' % (i, USERS)
+                   for i in range(tenant == 'odd', 6, 2)]
+        conn.add_s('cn=%s,%s' % (tenant, GROUPS),
+                   [('objectClass', 'keystoneTenant'), ('member', members)])
+        conn.add_s('cn=Admin,cn=%s,%s' % (tenant, GROUPS),
+                   [('objectClass', 'keystoneTenantRole'),
+                    ('member', members[:1])])
+
+
+class FakeLdapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.shelved = fakeldap.initialize(
+            'fake://' + os.path.join(self.tmpdir, 'db'))
+        self.memory = fakeldap.initialize(fakeldap.MEMORY_URL)
+        for conn in (self.shelved, self.memory):
+            populate(conn)
+
+    def tearDown(self):
+        self.shelved.db.close()
+        fakeldap.memory_db.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def assertSameResults(self):
+        for base, scope, query in QUERIES:
+            self.assertEquals(
+                sorted(self.memory.search_s(base, scope, query)),
+                sorted(self.shelved.search_s(base, scope, query)),
+                query)
+
+    def test_memory_matches_shelve(self):
+        self.assertSameResults()
+        self.assertEquals(len(self.memory.search_s(GROUPS,
+            ldap.SCOPE_ONELEVEL, QUERIES[3][2])), 2)
+
+    def test_indexes_follow_writes(self):
+        for conn in (self.shelved, self.memory):
+            user1 = 'cn=user1,%s' % USERS
+            conn.modify_s(user1, [(ldap.MOD_REPLACE, 'mail',
+                                   'user1@example.org')])
+            conn.modify_s('cn=odd,%s' % GROUPS,
+                          [(ldap.MOD_DELETE, 'member', user1)])
+            conn.modify_s('cn=even,%s' % GROUPS,
+                          [(ldap.MOD_ADD, 'member', user1)])
+            conn.delete_s('cn=user3,%s' % USERS)
+        self.assertSameResults()
+        self.assertEquals(fakeldap.memory_db.indexes['mail'].get(
+            'user3@example.com'), None)
+
+    def test_parsed_queries_are_bounded(self):
+        for i in range(fakeldap._parsed_queries.max_size + 10):
+            self.memory.search_s(USERS, ldap.SCOPE_ONELEVEL,
+                                 '(mail=user%d@example.com)' % i)
+        self.assertEquals(len(fakeldap._parsed_queries),
+                          fakeldap._parsed_queries.max_size)
+        self.assertSameResults()
+
+    def test_results_are_copies(self):
+        res = self.memory.search_s(GROUPS, ldap.SCOPE_ONELEVEL,
+                                   '(objectClass=keystoneTenant)')
+        res[0][1]['member'].append('cn=intruder')
+        self.assertEquals(fakeldap.memory_db.indexes['member'].get(
+            'cn=intruder'), None)
+        self.assertSameResults()
+
+
+if __name__ == '__main__':
+    unittest.main()
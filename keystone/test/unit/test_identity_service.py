@@ -0,0 +1,167 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+from datetime import datetime, timedelta
+import unittest
+
+import keystone.backends as backends
+from keystone.backends import api, sqlalchemy
+from keystone.backends.sqlalchemy import get_session, models
+from keystone.logic import service
+from keystone.logic.types import fault
+from keystone.logic.types.role import RoleRef
+from keystone.logic.types.user import User
+
+OPTIONS = {'sql_connection': 'sqlite://',
+           'backend_entities': "['UserRoleAssociation', 'Role', 'Tenant', "
+                               "'User', 'Token']"}
+
+
+def populate():
+    """Tenants 1234 and 0000 (disabled), admin holding the global Admin
+    role, joeuser of tenant 1234 holding Member on it, and a token of each
+    user, joeuser's scoped to 1234."""
+    sqlalchemy.configure_backend(OPTIONS)
+    sqlalchemy.register_models(OPTIONS)
+    expires = datetime.now() + timedelta(days=1)
+    api.tenant.create({'id': '1234', 'desc': None, 'enabled': 1})
+    api.tenant.create({'id': '0000', 'desc': None, 'enabled': 0})
+    for role_id in ('Admin', 'KeystoneServiceAdmin', 'Member'):
+        api.role.create({'id': role_id, 'desc': None})
+    api.user.create({'id': 'admin', 'password': 'secret', 'enabled': 1,
+                     'tenant_id': None})
+    api.user.create({'id': 'joeuser', 'password': 'secret', 'enabled': 1,
+                     'tenant_id': '1234'})
+    add_role_ref('admin', 'Admin')
+    add_role_ref('joeuser', 'Member', '1234')
+    api.token.create({'id': 'admin-token', 'user_id': 'admin',
+                      'expires': expires})
+    api.token.create({'id': 'joe-token', 'user_id': 'joeuser',
+                      'tenant_id': '1234', 'expires': expires})
+
+
+def add_role_ref(user_id, role_id, tenant_id=None):
+    role_ref = models.UserRoleAssociation()
+    role_ref.update({'user_id': user_id, 'role_id': role_id,
+                     'tenant_id': tenant_id})
+    return api.user.user_role_add(role_ref)
+
+
+def depopulate():
+    session = get_session()
+    for model in (models.UserRoleAssociation, models.Token, models.User,
+                  models.Role, models.Tenant):
+        session.query(model).delete()
+
+
+class ValidateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        populate()
+        self.admin_role = backends.KEYSTONEADMINROLE
+        backends.KEYSTONEADMINROLE = 'Admin'
+        self.service = service.IdentityService()
+
+    def tearDown(self):
+        backends.KEYSTONEADMINROLE = self.admin_role
+        depopulate()
+
+    def validate(self):
+        return self.service.validate_token('admin-token', 'joe-token')
+
+    def role_ids(self):
+        return sorted(role_ref.role_id
+                      for role_ref in self.validate().user.role_refs.values)
+
+    def test_validations_are_cached(self):
+        self.assertEquals(self.role_ids(), ['Member'])
+        # changed behind the service's back
+        api.token.delete('joe-token')
+        self.assertEquals(self.validate().token.id, 'joe-token')
+
+    def test_revoke_evicts(self):
+        self.validate()
+        self.service.revoke_token('admin-token', 'joe-token')
+        self.assertRaises(fault.UnauthorizedFault, self.validate)
+
+    def test_disabling_the_user_evicts(self):
+        self.validate()
+        self.service.enable_disable_user('admin-token', 'joeuser',
+            User(None, 'joeuser', None, None, False))
+        self.assertRaises(fault.UserDisabledFault, self.validate)
+
+    def test_adding_a_role_ref_evicts(self):
+        self.assertEquals(self.role_ids(), ['Member'])
+        self.service.create_role_ref('admin-token', 'joeuser',
+            RoleRef(None, 'KeystoneServiceAdmin', None))
+        self.assertEquals(self.role_ids(), ['KeystoneServiceAdmin', 'Member'])
+
+    def test_deleting_a_role_ref_evicts(self):
+        self.assertEquals(self.role_ids(), ['Member'])
+        role_ref = api.role.ref_get_all_tenant_roles('joeuser', '1234')[0]
+        self.service.delete_role_ref('admin-token', role_ref.id)
+        self.assertEquals(self.role_ids(), [])
+
+
+class AdminLevelTest(unittest.TestCase):
+
+    def setUp(self):
+        populate()
+        self.admin_role = backends.KEYSTONEADMINROLE
+        backends.KEYSTONEADMINROLE = 'Admin'
+        self.service = service.IdentityService()
+        self.role_ref = add_role_ref('joeuser', 'Admin')
+
+    def tearDown(self):
+        backends.KEYSTONEADMINROLE = self.admin_role
+        depopulate()
+
+    def admin_call(self, token_id):
+        return self.service.get_role(token_id, 'Member')
+
+    def test_admin_level_is_memoized(self):
+        self.admin_call('joe-token')
+        # changed behind the service's back
+        api.role.ref_delete(self.role_ref.id)
+        self.admin_call('joe-token')
+        self.assertEquals(self.service.admin_cache.get('joe-token'),
+                          service._KEYSTONE_ADMIN)
+
+    def test_role_ref_removal_ends_admin_access(self):
+        self.admin_call('joe-token')
+        self.service.delete_role_ref('admin-token', self.role_ref.id)
+        self.assertRaises(fault.UnauthorizedFault, self.admin_call,
+                          'joe-token')
+        self.admin_call('admin-token')
+
+    def test_revoke_ends_admin_access(self):
+        self.admin_call('joe-token')
+        self.service.revoke_token('admin-token', 'joe-token')
+        self.assertRaises(fault.ItemNotFoundFault, self.admin_call,
+                          'joe-token')
+
+    def test_non_admins_are_refused(self):
+        api.role.ref_delete(self.role_ref.id)
+        self.assertRaises(fault.UnauthorizedFault, self.admin_call,
+                          'joe-token')
+        self.assertEquals(self.service.admin_cache.get('joe-token'),
+                          service._NO_ADMIN)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,19 +5,39 @@ import unittest
 MODULE_EXTENSIONS = set('.py'.split())
 TEST_FILES = [
     'test_auth.py',
+    'test_auth_token_middleware.py',
     'test_authentication.py',
+    'test_bufferedhttp.py',
+    'test_cache.py',
+    'test_memcache_backend.py',
+    'test_pagination.py',
+    'test_proxy.py',
+    'test_request_session.py',
     #'test_authn_v2.py', # this is largely failing
     'test_common.py', # this doesn't actually contain tests
     'test_endpoints.py',
+    'test_fakeldap.py',
+    'test_identity_service.py',
     #'test_urlrewritefilter.py',
     'test_keystone.py', # not sure why this is referencing itself
+    'test_ldap_cache.py',
+    'test_ldap_paging.py',
+    'test_ldap_pool.py',
+    'test_ldap_users.py',
     'test_roles.py',
     #'test_server.py', # this is largely failing
     'test_tenants.py',
     'test_token.py',
+    'test_token_purge.py',
     'test_users.py',
+    'test_validation_bundle.py',
     'test_services.py',
-    'test_version.py']
+    'test_sql_pool.py',
+    'test_sql_tpool.py',
+    'test_tiered_backend.py',
+    'test_version.py',
+    'test_wsgi_server.py',
+    'test_wsgi_workers.py']
 
 
 def unit_test_extractor(tup, path, filenames):
@@ -0,0 +1,117 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+import ldap
+
+from keystone.backends.ldap import fakeldap
+from keystone.backends.ldap.api import API
+from keystone.backends.ldap.cache import CachedConnection, poll_once
+from keystone.backends.ldap.pool import PooledConnection
+
+
+class ChangedEntries(object):
+    """Connection answering every search with the same entries"""
+
+    def __init__(self, dns):
+        self.dns = dns
+        self.queries = []
+
+    def search_s(self, base, scope, query=None, attrlist=None):
+        self.queries.append(query)
+        return [(dn, {}) for dn in self.dns if dn.endswith(base)]
+
+
+class LdapCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = API({'ldap_url': fakeldap.MEMORY_URL,
+                        'ldap_user': 'cn=Admin',
+                        'ldap_password': 'password',
+                        'ldap_cache_ttl': '60'})
+        self.api.tenant.create({'id': 'acme', 'desc': None, 'enabled': 1})
+        self.api.user.create({'id': 'joeuser', 'password': 'secret',
+                              'email': 'joe@example.com', 'enabled': 1,
+                              'tenant_id': None})
+        self.searches = 0
+        self.search_s = fakeldap.FakeLDAP.search_s
+
+        def search_s(conn, *args, **kwargs):
+            self.searches += 1
+            return self.search_s(conn, *args, **kwargs)
+        fakeldap.FakeLDAP.search_s = search_s
+
+    def tearDown(self):
+        fakeldap.FakeLDAP.search_s = self.search_s
+        fakeldap.memory_db.clear()
+
+    def test_reads_are_cached(self):
+        self.assertTrue(isinstance(self.api.get_connection(),
+                                   CachedConnection))
+        self.api.user.get('joeuser')
+        searches = self.searches
+        self.assertEquals(self.api.user.get('joeuser').email,
+                          'joe@example.com')
+        self.assertEquals(self.searches, searches)
+        self.assertEquals(self.api.user.get('nobody'), None)
+
+    def test_results_are_copies(self):
+        conn = self.api.get_connection()
+        dn = self.api.user._id_to_dn('joeuser')
+        res = conn.search_s(dn, ldap.SCOPE_BASE)
+        res[0][1]['mail'].append('intruder@example.com')
+        res[0][1]['cn'] = ['intruder']
+        res.append(('cn=intruder', {}))
+        self.assertEquals(conn.search_s(dn, ldap.SCOPE_BASE),
+                          conn.conn.search_s(dn, ldap.SCOPE_BASE))
+        # once for the cache, once uncached
+        self.assertEquals(self.searches, 2)
+
+    def test_writes_invalidate(self):
+        self.api.user.get('joeuser')
+        self.api.user.update('joeuser', {'email': 'joe@acme.com'})
+        self.assertEquals(self.api.user.get('joeuser').email, 'joe@acme.com')
+        # membership lives on the tenant entry, in another tree
+        self.api.tenant.add_user('acme', 'joeuser')
+        self.assertEquals(self.api.user.get('joeuser').tenant_id, 'acme')
+        self.api.tenant.remove_user('acme', 'joeuser')
+        self.assertEquals(self.api.user.get('joeuser').tenant_id, None)
+
+    def test_other_writers_are_polled(self):
+        self.api.user.get('joeuser')
+        # a write that does not go through the cache
+        other = PooledConnection(self.api.pool)
+        other.modify_s(self.api.user._id_to_dn('joeuser'),
+                       [(ldap.MOD_REPLACE, 'mail', 'joe@other.com')])
+        self.assertEquals(self.api.user.get('joeuser').email,
+                          'joe@example.com')
+        changes = ChangedEntries([self.api.user._id_to_dn('joeuser')])
+        poll_once(changes, self.api.cache, [self.api.user.tree_dn], 0)
+        self.assertEquals(changes.queries,
+                          ['(modifyTimestamp>=19700101000000Z)'])
+        self.assertEquals(self.api.user.get('joeuser').email,
+                          'joe@other.com')
+
+    def test_cache_is_off_by_default(self):
+        api = API({'ldap_url': fakeldap.MEMORY_URL, 'ldap_user': 'cn=Admin',
+                   'ldap_password': 'password'})
+        self.assertFalse(isinstance(api.get_connection(), CachedConnection))
+
+
+if __name__ == '__main__':
+    unittest.main()
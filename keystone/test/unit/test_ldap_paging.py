@@ -0,0 +1,186 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import re
+import unittest
+
+import ldap
+
+from keystone.backends.ldap.api.tenant import TenantAPI
+from keystone.backends.ldap.controls import (SORT_OID, PAGE_OID,
+    sort_control, page_control, page_cookie)
+from keystone.backends.ldap.pool import ConnectionPool, PooledConnection
+
+TREE_DN = 'ou=Groups,dc=example,dc=com'
+
+
+class SortingServer(object):
+    """Connection to a server holding tenants, honouring sort and paging.
+
+    Like servers using caseIgnore matching on cn, it sorts and compares ids
+    without regard to case.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.sorts = True
+        self.error = ldap.UNAVAILABLE_CRITICAL_EXTENSION
+        self.searches = []
+        self.abandoned = []
+        self.results = {}
+
+    def _entries(self, ids):
+        return [('cn=%s,%s' % (id, TREE_DN),
+                 {'objectClass': ['keystoneTenant']}) for id in ids]
+
+    def search_s(self, base, scope, query=None, attrlist=None):
+        self.searches.append(None)
+        return self._entries(self.ids)
+
+    def search_ext(self, base, scope, query, attrlist=None,
+                   serverctrls=None):
+        if not self.sorts:
+            raise self.error
+        ctrls = dict((c.controlType, c.controlValue) for c in serverctrls)
+        reverse = ctrls[SORT_OID].endswith('\x81\x01\xff')
+        size = ord(ctrls[PAGE_OID][4])
+        ids = sorted(self.ids, key=str.lower, reverse=reverse)
+        match = re.match(r'\(&(\(!)?\(cn([<>])=([^)]*)\)', query)
+        if match:
+            negate, op, marker = match.groups()
+            marker = marker.lower()
+            if op == '>':
+                keep = lambda id: id.lower() >= marker
+            else:
+                keep = lambda id: id.lower() <= marker
+            ids = [id for id in ids if keep(id) != bool(negate)]
+        self.searches.append(size)
+        msgid = len(self.searches)
+        cookie = len(ids) > size and 'cookie%d' % msgid or ''
+        self.results[msgid] = (self._entries(ids[:size]),
+                               [page_control(0, cookie)])
+        return msgid
+
+    def result3(self, msgid):
+        entries, ctrls = self.results.pop(msgid)
+        return ldap.RES_SEARCH_RESULT, entries, msgid, ctrls
+
+    def search_ext_s(self, base, scope, query, attrlist=None,
+                     serverctrls=None):
+        ctrls = dict((c.controlType, c.controlValue) for c in serverctrls)
+        self.abandoned.append((ord(ctrls[PAGE_OID][4]), ctrls[PAGE_OID][7:]))
+        return []
+
+
+class FakeAPI(object):
+
+    def __init__(self, conn):
+        self.pool = ConnectionPool(lambda: conn)
+        self.server_sort = True
+
+    def get_connection(self):
+        return PooledConnection(self.pool)
+
+
+class LdapPagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SortingServer(['tenant%02d' % i for i in range(20)])
+        self.api = FakeAPI(self.server)
+        self.tenants = TenantAPI(self.api, {})
+
+    def whole_tree(self):
+        return self.tenants.get_all()
+
+    def test_control_encoding(self):
+        self.assertEquals(sort_control('cn').controlValue,
+                          '0\x060\x04\x04\x02cn')
+        self.assertEquals(sort_control('cn', True).controlValue,
+                          '0\x090\x07\x04\x02cn\x81\x01\xff')
+        self.assertEquals(page_control(5).controlValue,
+                          '0\x05\x02\x01\x05\x04\x00')
+        self.assertEquals(page_control(200, 'ab').controlValue,
+                          '0\x08\x02\x02\x00\xc8\x04\x02ab')
+        self.assertEquals(page_cookie([page_control(0, 'x' * 200)]),
+                          'x' * 200)
+        self.assertEquals(page_cookie([(PAGE_OID, False,
+                                        '0\x05\x02\x01\x00\x04\x00')]), '')
+        self.assertEquals(page_cookie([]), '')
+
+    def test_page_is_fetched_sorted_and_bounded(self):
+        for marker in (None, 'tenant00', 'tenant07', 'tenant185'):
+            page = self.tenants.get_page(marker, 5)
+            expected = self.tenants._get_page(marker, 5, self.whole_tree())
+            self.assertEquals([t.id for t in page], [t.id for t in expected])
+        self.assertEquals([size for size in self.server.searches
+                           if size is not None], [5, 5, 5, 5])
+        # paged searches with entries left over are ended with a page of 0
+        self.assertEquals(self.server.abandoned,
+                          [(0, 'cookie1'), (0, 'cookie3'), (0, 'cookie5')])
+
+    def test_markers_match_the_whole_tree(self):
+        markers = [None, 'tenant', 'tenant00', 'tenant01', 'tenant055',
+                   'tenant10', 'tenant17', 'tenant18', 'tenant19', 'zzz']
+        for limit in (1, 3, 5, 18, 19, 20, 25):
+            for marker in markers:
+                self.assertEquals(
+                    self.tenants.get_page_markers(marker, limit),
+                    self.tenants._get_page_markers(marker, limit,
+                                                   self.whole_tree()),
+                    (marker, limit))
+
+    def test_servers_without_sort_fall_back(self):
+        self.server.sorts = False
+        page = self.tenants.get_page('tenant03', 2)
+        self.assertEquals([t.id for t in page], ['tenant04', 'tenant05'])
+        self.assertFalse(self.api.server_sort)
+        self.assertEquals(self.tenants.get_page_markers('tenant03', 2),
+                          ('tenant01', 'tenant05'))
+        # the sort is not attempted again
+        self.assertEquals(self.server.searches, [None, None])
+
+    def test_servers_without_ordering_on_cn_fall_back(self):
+        self.server.sorts = False
+        self.server.error = ldap.INAPPROPRIATE_MATCHING
+        page = self.tenants.get_page('tenant03', 2)
+        self.assertEquals([t.id for t in page], ['tenant04', 'tenant05'])
+        self.assertFalse(self.api.server_sort)
+
+    def test_mixed_case_ids(self):
+        self.server.ids = ['Bob', 'alice', 'carl', 'Dave', 'eve']
+        self.assertEquals([t.id for t in self.tenants.get_page('alice', 5)],
+                          ['Bob', 'carl', 'Dave', 'eve'])
+        self.assertEquals([t.id for t in self.tenants.get_page('BOB', 2)],
+                          ['carl', 'Dave'])
+        for limit in (1, 2, 3, 5):
+            for marker in (None, 'alice', 'Bob', 'bob', 'Carl', 'dave',
+                           'eve', 'b'):
+                self.assertEquals(
+                    self.tenants.get_page_markers(marker, limit),
+                    self.tenants._get_page_markers(marker, limit,
+                                                   self.whole_tree()),
+                    (marker, limit))
+        self.assertEquals(self.tenants.get_page_markers('carl', 1),
+                          ('Bob', 'Dave'))
+        # the fallback orders the whole tree the same way
+        self.server.sorts = False
+        self.assertEquals([t.id for t in self.tenants.get_page('alice', 5)],
+                          ['Bob', 'carl', 'Dave', 'eve'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+import eventlet
+import ldap
+
+from keystone.backends.ldap.pool import ConnectionPool, PooledConnection
+
+
+class FakeConnection(object):
+
+    def __init__(self, server):
+        self.server = server
+        self.unbound = False
+        self.dead = False
+
+    def search_s(self, base, scope, query=None):
+        if self.server.down:
+            raise ldap.SERVER_DOWN
+        self.server.searches += 1
+        # let other greenthreads run while this one holds the connection
+        eventlet.sleep(0)
+        return [(base, {'conn': [id(self)]})]
+
+    def delete_s(self, dn):
+        raise ldap.NO_SUCH_OBJECT
+
+    def whoami_s(self):
+        self.server.checks += 1
+        if self.dead or self.server.down:
+            raise ldap.SERVER_DOWN
+        return ''
+
+    def unbind_s(self):
+        self.unbound = True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.down = False
+        self.searches = 0
+        self.checks = 0
+        self.pool = ConnectionPool(lambda: FakeConnection(self), max_size=2)
+        self.conn = PooledConnection(self.pool)
+
+    def search(self):
+        return self.conn.search_s('cn=joeuser', ldap.SCOPE_BASE)
+
+    def test_connections_are_reused(self):
+        for _i in range(3):
+            self.search()
+        self.assertEquals(self.pool.created, 1)
+        self.assertEquals(self.pool.reused, 2)
+
+    def test_pool_is_bounded(self):
+        pool = eventlet.GreenPool()
+        for _i in range(10):
+            pool.spawn(self.search)
+        pool.waitall()
+        self.assertEquals(self.searches, 10)
+        self.assertEquals(self.pool.created, 2)
+
+    def test_idle_connection_expires(self):
+        self.pool.idle_timeout = 0
+        self.search()
+        stale = self.pool.idle[0][0]
+        self.search()
+        self.assertEquals(self.pool.created, 2)
+        self.assertTrue(stale.unbound)
+
+    def test_idle_connections_are_checked(self):
+        self.pool.check_interval = 0
+        self.search()
+        dead = self.pool.idle[0][0]
+        dead.dead = True
+        self.search()
+        self.assertEquals(self.checks, 1)
+        self.assertTrue(dead.unbound)
+        self.assertEquals(self.pool.created, 2)
+        self.assertEquals(self.pool.reused, 0)
+
+    def test_recently_used_connections_are_not_checked(self):
+        self.pool.check_interval = 60
+        self.search()
+        self.search()
+        self.assertEquals(self.checks, 0)
+        self.assertEquals(self.pool.reused, 1)
+
+    def test_server_down_is_retried_on_a_new_connection(self):
+        self.search()
+        first = self.pool.idle[0][0]
+        self.pool.connect = lambda: FakeConnection(self)
+        original = first.search_s
+
+        def fail_once(*args, **kwargs):
+            first.search_s = original
+            raise ldap.SERVER_DOWN
+        first.search_s = fail_once
+        self.search()
+        self.assertTrue(first.unbound)
+        self.assertEquals(self.pool.created, 2)
+        self.assertEquals(len(self.pool.idle), 1)
+
+    def test_server_down_twice_is_raised(self):
+        self.down = True
+        self.assertRaises(ldap.SERVER_DOWN, self.search)
+        self.assertEquals(self.pool.idle, [])
+        # both slots were handed back
+        self.down = False
+        self.search()
+        self.search()
+
+    def test_ldap_errors_keep_the_connection(self):
+        self.assertRaises(ldap.NO_SUCH_OBJECT, self.conn.delete_s,
+                          'cn=nobody')
+        self.assertEquals(len(self.pool.idle), 1)
+
+    def test_run_shares_one_connection(self):
+        def twice(conn, base):
+            return conn.search_s(base, ldap.SCOPE_BASE) + \
+                conn.search_s(base, ldap.SCOPE_BASE)
+        pool = eventlet.GreenPool()
+        results = [pool.spawn(self.conn.run, twice, 'cn=joeuser')
+                   for _i in range(4)]
+        for result in results:
+            first, second = result.wait()
+            self.assertEquals(first, second)
+        self.assertEquals(self.searches, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from keystone.backends.ldap import fakeldap
+from keystone.backends.ldap.api import API
+
+
+class LdapUserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = API({'ldap_url': fakeldap.MEMORY_URL,
+                        'ldap_user': 'cn=Admin',
+                        'ldap_password': 'password'})
+        for tenant_id in ('even', 'odd'):
+            self.api.tenant.create({'id': tenant_id, 'desc': None,
+                                    'enabled': 1})
+        for i in range(10):
+            self.api.user.create({'id': 'user%d' % i, 'password': 'secret',
+                                  'email': 'user%d@example.com' % i,
+                                  'enabled': 1,
+                                  'tenant_id': ('odd' if i % 2 else 'even')
+                                               if i < 8 else None})
+        self.searches = 0
+        self.search_s = fakeldap.FakeLDAP.search_s
+
+        def search_s(conn, *args, **kwargs):
+            self.searches += 1
+            return self.search_s(conn, *args, **kwargs)
+        fakeldap.FakeLDAP.search_s = search_s
+
+    def tearDown(self):
+        fakeldap.FakeLDAP.search_s = self.search_s
+        fakeldap.memory_db.clear()
+
+    def test_users_are_listed_in_two_searches(self):
+        users = self.api.user.get_all()
+        self.assertEquals(self.searches, 2)
+        self.assertEquals(sorted((user.id, user.tenant_id) for user in users),
+                          [('user0', 'even'), ('user1', 'odd'),
+                           ('user2', 'even'), ('user3', 'odd'),
+                           ('user4', 'even'), ('user5', 'odd'),
+                           ('user6', 'even'), ('user7', 'odd'),
+                           ('user8', None), ('user9', None)])
+
+    def test_tenant_users_are_fetched_together(self):
+        users = self.api.tenant.get_users('odd')
+        self.assertEquals(self.searches, 3)
+        self.assertEquals([user.id for user in users],
+                          ['user1', 'user3', 'user5', 'user7'])
+        self.assertEquals(set(user.tenant_id for user in users),
+                          set(['odd']))
+
+    def test_single_user(self):
+        self.assertEquals(self.api.user.get('user4').tenant_id, 'even')
+        self.assertEquals(self.api.user.get('user9').tenant_id, None)
+        self.assertEquals(self.api.user.get_multi([]), [])
+        self.assertEquals(self.searches, 4)
+
+    def test_member_dns_are_matched_however_spelled(self):
+        # as a server would find them, which fakeldap does not
+        def get_all(query, fields):
+            return [('cn=odd,%s' % self.api.tenant.tree_dn,
+                     {'member': ['CN=User1, ou=users,DC=example,dc=com',
+                                 'cn=user3,ou=Users,dc=example,dc=com']})]
+        self.api.tenant._ldap_get_all = get_all
+        self.assertEquals(self.api.tenant.get_user_tenant_ids(
+            ['user1', 'user3', 'user5']),
+            {'user1': ['odd'], 'user3': ['odd'], 'user5': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from datetime import datetime, timedelta
+import cPickle
+import unittest
+
+from keystone.backends import memcache
+from keystone.backends.memcache import models
+from keystone.backends.memcache.api import token as token_api
+
+
+class FakeClient(object):
+    """In-process stand-in for a python-memcached client of one server.
+
+    Entries expire like in memcached; advance() moves the clock forward.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.expiry = {}
+        self.deadline = {}
+        self.now = 0
+        self.calls = 0
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def _set(self, key, value, time):
+        self.store[key] = value
+        self.expiry[key] = time
+        self.deadline[key] = self.now + time if time else None
+
+    def _get(self, key):
+        deadline = self.deadline.get(key)
+        if deadline is not None and deadline <= self.now:
+            self.store.pop(key, None)
+        return self.store.get(key)
+
+    def set(self, key, value, time=0):
+        self.calls += 1
+        self._set(key, value, time)
+
+    def set_multi(self, mapping, time=0):
+        self.calls += 1
+        for key, value in mapping.iteritems():
+            self._set(key, value, time)
+        return []
+
+    def add(self, key, value, time=0):
+        self.calls += 1
+        if self._get(key) is not None:
+            return False
+        self._set(key, value, time)
+        return True
+
+    def get(self, key):
+        self.calls += 1
+        return self._get(key)
+
+    def get_multi(self, keys):
+        self.calls += 1
+        found = {}
+        for key in keys:
+            value = self._get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def delete(self, key):
+        self.calls += 1
+        self.store.pop(key, None)
+
+    def delete_multi(self, keys):
+        self.calls += 1
+        for key in keys:
+            self.store.pop(key, None)
+
+
+def fake_server(hosts):
+    server = memcache.Memcache_Server(hosts)
+    server.servers = dict((host, FakeClient()) for host in server.hosts)
+    return server
+
+
+class HashRingTest(unittest.TestCase):
+
+    def test_adding_a_server_moves_few_keys(self):
+        keys = ['token%s' % i for i in range(1000)]
+        hosts = ['10.0.0.%s:11211' % i for i in range(1, 4)]
+        before = memcache.HashRing(hosts)
+        after = memcache.HashRing(hosts + ['10.0.0.4:11211'])
+        moved = [key for key in keys
+                 if before.get_host(key) != after.get_host(key)]
+        # about a quarter of the keys belong to the new server
+        self.assertTrue(len(moved) < 400)
+        for key in moved:
+            self.assertEquals(after.get_host(key), '10.0.0.4:11211')
+
+
+class MemcacheServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fake_server('10.0.0.1:11211, 10.0.0.2:11211')
+
+    def calls(self):
+        return sum(client.calls for client in self.server.servers.values())
+
+    def test_hosts_are_parsed(self):
+        self.assertEquals(self.server.hosts,
+                          ['10.0.0.1:11211', '10.0.0.2:11211'])
+
+    def test_multi_calls_take_one_round_trip_per_server(self):
+        keys = ['token%s' % i for i in range(20)]
+        self.server.set_multi(dict((key, key) for key in keys))
+        self.assertEquals(self.calls(), 2)
+        self.assertEquals(self.server.get_multi(keys + ['missing']),
+                          dict((key, key) for key in keys))
+        self.assertEquals(self.calls(), 4)
+        self.server.delete_multi(keys)
+        self.assertEquals(self.server.get_multi(keys), {})
+
+    def test_keys_are_spread_across_servers(self):
+        for i in range(20):
+            self.server.set('token%s' % i, i)
+        for client in self.server.servers.values():
+            self.assertTrue(client.store)
+
+
+class TokenExpiryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = memcache.MEMCACHE_SERVER
+        self.cache_time = memcache.CACHE_TIME
+        memcache.MEMCACHE_SERVER = fake_server('10.0.0.1:11211')
+        self.client = memcache.MEMCACHE_SERVER.servers['10.0.0.1:11211']
+        self.api = token_api.get()
+
+    def tearDown(self):
+        memcache.MEMCACHE_SERVER = self.server
+        memcache.CACHE_TIME = self.cache_time
+
+    def create(self, lifetime):
+        token = models.Token('887665443383838', 'joeuser', '1234',
+                             datetime.now() + timedelta(seconds=lifetime))
+        self.api.create(token)
+
+    def test_entries_expire_with_the_token(self):
+        memcache.CACHE_TIME = 3600
+        self.create(600)
+        self.assertTrue(595 <= self.client.expiry['887665443383838'] <= 600)
+        self.client.advance(590)
+        self.assertNotEquals(self.api.get('887665443383838'), None)
+        self.client.advance(11)
+        self.assertEquals(self.api.get('887665443383838'), None)
+        self.assertEquals(self.api.get_for_user_by_tenant('joeuser', '1234'),
+                          None)
+
+    def test_configured_cache_time_is_honored(self):
+        memcache.CACHE_TIME = 60
+        self.create(600)
+        self.assertEquals(self.client.expiry['887665443383838'], 60)
+        self.assertEquals(self.client.expiry['1234::joeuser'], 60)
+
+    def test_expired_token_is_not_stored(self):
+        self.create(-10)
+        self.assertEquals(self.client.store, {})
+
+    def test_long_cache_time_is_sent_as_epoch_time(self):
+        memcache.MEMCACHE_SERVER.set('key', 'value', 60 * 86400)
+        self.assertTrue(self.client.expiry['key'] > 60 * 86400)
+
+
+class WireFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.token = models.Token('887665443383838', 'joeuser', '1234',
+                                  datetime(2015, 2, 5, 0, 0, 0, 250000))
+
+    def test_round_trip(self):
+        token = models.decode_token(models.encode_token(self.token))
+        self.assertEquals((token.id, token.user_id, token.tenant_id,
+                           token.expires),
+                          ('887665443383838', 'joeuser', '1234',
+                           datetime(2015, 2, 5, 0, 0, 0, 250000)))
+
+    def test_round_trip_without_tenant(self):
+        self.token.tenant_id = None
+        token = models.decode_token(models.encode_token(self.token))
+        self.assertEquals(token.tenant_id, None)
+
+    def test_smaller_than_pickled_attributes(self):
+        attributes = dict((name, getattr(self.token, name))
+                          for name in models.Token.__slots__)
+        self.assertTrue(len(models.encode_token(self.token)) <
+                        len(cPickle.dumps(attributes, 2)))
+
+    def test_other_data_reads_as_miss(self):
+        self.assertEquals(models.decode_token(None), None)
+        self.assertEquals(models.decode_token('\x00garbage'), None)
+        self.assertEquals(models.decode_token(object()), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
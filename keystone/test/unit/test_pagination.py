@@ -0,0 +1,133 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from sqlalchemy import event
+
+from keystone.backends import api, sqlalchemy
+from keystone.backends.sqlalchemy import get_session, models
+from keystone.backends.sqlalchemy.pagination import page_markers
+from keystone.test.unit.test_identity_service import add_role_ref, \
+    depopulate, populate
+
+
+class PageMarkersTest(unittest.TestCase):
+
+    def setUp(self):
+        sqlalchemy.configure_backend({'sql_connection': 'sqlite://',
+            'backend_entities': "['Tenant', 'EndpointTemplates']"})
+        self.session = get_session()
+        for i in range(10):
+            tenant = models.Tenant()
+            tenant.update({'id': 't%02d' % i, 'desc': None, 'enabled': 1})
+            self.session.add(tenant)
+            template = models.EndpointTemplates()
+            template.update({'id': i + 1, 'region': 'North'})
+            self.session.add(template)
+        self.session.flush()
+        self.statements = []
+        event.listen(sqlalchemy._ENGINE, 'before_cursor_execute',
+                     self.count)
+
+    def tearDown(self):
+        self.session.query(models.Tenant).delete()
+        self.session.query(models.EndpointTemplates).delete()
+
+    def count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def markers(self, marker, limit, **kwargs):
+        return page_markers(self.session.query(models.Tenant.id),
+                            models.Tenant.id, marker, limit, **kwargs)
+
+    def test_markers(self):
+        self.assertEquals(self.markers(None, 3), (None, 't03'))
+        self.assertEquals(self.markers('t00', 3), (None, 't03'))
+        self.assertEquals(self.markers('t05', 3), ('t02', 't08'))
+        self.assertEquals(self.markers('t06', 3), ('t03', None))
+        self.assertEquals(self.markers('t09', 3), ('t06', None))
+        self.assertEquals(self.markers('t01', 3), ('t00', 't04'))
+        # markers need not be ids
+        self.assertEquals(self.markers('t', 3), ('t00', 't02'))
+        self.assertEquals(self.markers('t045', 3), ('t02', 't07'))
+        self.assertEquals(self.markers('t10', 3), ('t07', None))
+
+    def test_inclusive_markers(self):
+        self.assertEquals(self.markers(None, 3, inclusive=True),
+                          (None, 't03'))
+        self.assertEquals(self.markers('t05', 3, inclusive=True),
+                          ('t02', 't08'))
+        self.assertEquals(self.markers('t07', 3, inclusive=True),
+                          ('t04', 't09'))
+        self.assertEquals(self.markers('t09', 3, inclusive=True),
+                          ('t06', None))
+        self.assertEquals(self.markers('t10', 3, inclusive=True),
+                          ('t07', 't09'))
+
+    def test_empty(self):
+        ids = self.session.query(models.Tenant.id).\
+                filter(models.Tenant.id == 'nope')
+        self.assertEquals(page_markers(ids, models.Tenant.id, None, 3),
+                          (None, None))
+        self.assertEquals(page_markers(ids, models.Tenant.id, 't01', 3),
+                          (None, None))
+
+    def test_integer_ids_take_string_markers(self):
+        ids = self.session.query(models.EndpointTemplates.id)
+        self.assertEquals(page_markers(ids, models.EndpointTemplates.id,
+                                       '1', 3), (None, 4))
+        self.assertEquals(page_markers(ids, models.EndpointTemplates.id,
+                                       '6', 3), (3, 9))
+
+    def test_two_id_only_queries(self):
+        self.markers('t05', 3)
+        self.assertEquals(len(self.statements), 2)
+        for statement in self.statements:
+            self.assertTrue(statement.startswith(
+                'SELECT tenants.id AS tenants_id \nFROM tenants'), statement)
+
+
+class TenantsForUserPageTest(unittest.TestCase):
+
+    def setUp(self):
+        populate()
+        api.tenant.create({'id': '5678', 'desc': None, 'enabled': 1})
+        add_role_ref('joeuser', 'Member', '0000')
+        add_role_ref('joeuser', 'Member', '5678')
+        self.user = api.user.get('joeuser')
+
+    def tearDown(self):
+        depopulate()
+
+    def ids(self, marker, limit):
+        return [tenant.id for tenant in
+                api.tenant.tenants_for_user_get_page(self.user, marker,
+                                                     limit)]
+
+    def test_pages_follow_the_markers(self):
+        self.assertEquals(self.ids(None, 2), ['0000', '1234'])
+        self.assertEquals(self.ids('0000', 2), ['1234', '5678'])
+        self.assertEquals(api.tenant.tenants_for_user_get_page_markers(
+            self.user, '0000', 1), (None, '1234'))
+        self.assertEquals(self.ids('1234', 1), ['5678'])
+        self.assertEquals(api.tenant.tenants_for_user_get_page_markers(
+            self.user, '1234', 1), ('0000', None))
+        self.assertEquals(self.ids('5678', 2), [])
+
+if __name__ == '__main__':
+    unittest.main()
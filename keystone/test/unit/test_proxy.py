@@ -0,0 +1,93 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+import eventlet
+from eventlet import wsgi
+from webob import Request
+
+from keystone.common import bufferedhttp
+from keystone.common import proxy
+
+
+class NullLog(object):
+
+    def write(self, data):
+        pass
+
+
+class ForwardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.seen = {}
+
+        def app(env, start_response):
+            self.seen['path'] = env['PATH_INFO']
+            self.seen['query'] = env.get('QUERY_STRING')
+            self.seen['auth'] = env.get('HTTP_X_AUTHORIZATION')
+            self.seen['body'] = env['wsgi.input'].read()
+            start_response('201 Created', [('X-Object-Meta', 'kept'),
+                                           ('Content-Length', '10')])
+            return ['0123456789']
+
+        self.sock = eventlet.listen(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.server = eventlet.spawn(wsgi.server, self.sock, app,
+                                     log=NullLog())
+        self.pool = bufferedhttp.get_pool('127.0.0.1', self.port)
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.kill()
+        self.sock.close()
+
+    def forward(self, req, chunk_size=proxy.CHUNK_SIZE):
+        def app(env, start_response):
+            return proxy.forward(env, start_response, '127.0.0.1',
+                                 self.port, chunk_size=chunk_size)
+        return req.get_response(app)
+
+    def test_status_headers_and_body_are_passed_back(self):
+        req = Request.blank('/v1/obj?format=json', method='PUT',
+                            body='x' * 1000)
+        req.headers['X-Authorization'] = 'Proxy joeuser'
+        resp = self.forward(req, chunk_size=3)
+        self.assertEquals(resp.status_int, 201)
+        self.assertEquals(resp.headers['X-Object-Meta'], 'kept')
+        self.assertEquals(resp.body, '0123456789')
+        self.assertEquals(self.seen['path'], '/v1/obj')
+        self.assertEquals(self.seen['query'], 'format=json')
+        self.assertEquals(self.seen['auth'], 'Proxy joeuser')
+        self.assertEquals(self.seen['body'], 'x' * 1000)
+
+    def test_response_is_streamed_in_chunks(self):
+        req = Request.blank('/')
+        app_iter = proxy.forward(req.environ, lambda *args: None,
+                                 '127.0.0.1', self.port, chunk_size=4)
+        self.assertEquals(list(app_iter), ['0123', '4567', '89'])
+
+    def test_connection_returns_to_pool(self):
+        for _i in range(2):
+            self.assertEquals(self.forward(Request.blank('/')).body,
+                              '0123456789')
+        self.assertEquals(self.pool.created, 1)
+        self.assertEquals(self.pool.reused, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
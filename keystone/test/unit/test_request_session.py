@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import unittest
+
+from sqlalchemy import event
+import webob
+import webob.exc
+
+from keystone.backends import api, sqlalchemy
+from keystone.backends.sqlalchemy import get_session, models
+from keystone.server import RequestSession
+
+
+class RequestSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        sqlalchemy.configure_backend({'sql_connection': 'sqlite://',
+            'backend_entities': "['Tenant', 'EndpointTemplates']"})
+        self.checkouts = 0
+        event.listen(sqlalchemy._ENGINE, 'checkout', self.checkout)
+
+    def tearDown(self):
+        get_session().query(models.Tenant).delete()
+
+    def checkout(self, *args):
+        self.checkouts += 1
+
+    def request(self, status, *tenant_ids):
+        def app(environ, start_response):
+            for tenant_id in tenant_ids:
+                api.tenant.create({'id': tenant_id, 'desc': None,
+                                   'enabled': 1})
+                api.tenant.get(tenant_id)
+            if status >= 500:
+                raise Exception('failed')
+            return webob.exc.status_map[status]()(environ, start_response)
+        return webob.Request.blank('/').get_response(RequestSession(app))
+
+    def tenant_ids(self):
+        return sorted(tenant.id for tenant in api.tenant.get_all())
+
+    def test_one_session_per_request(self):
+        sqlalchemy.begin_request()
+        try:
+            self.assertTrue(get_session() is get_session())
+        finally:
+            sqlalchemy.end_request()
+        self.assertFalse(get_session() is get_session())
+
+    def test_success_commits(self):
+        self.request(200, 'acme', 'initech')
+        self.assertEquals(self.checkouts, 1)
+        self.assertEquals(self.tenant_ids(), ['acme', 'initech'])
+
+    def test_error_response_rolls_back(self):
+        self.request(409, 'acme')
+        self.assertEquals(self.tenant_ids(), [])
+
+    def test_exception_rolls_back(self):
+        self.assertRaises(Exception, self.request, 500, 'acme')
+        self.assertEquals(self.tenant_ids(), [])
+        # the request's session is gone with it
+        self.assertEquals(sqlalchemy.request_session(None, None), None)
+
+    def test_failed_write_rolls_back(self):
+        self.request(200, 'acme')
+        self.assertRaises(Exception, self.request, 200, 'initech', 'acme')
+        self.assertEquals(self.tenant_ids(), ['acme'])
+
+
+if __name__ == '__main__':
+    unittest.main()
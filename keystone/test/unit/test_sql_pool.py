@@ -0,0 +1,104 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import logging
+import sqlite3
+import unittest
+
+from sqlalchemy import event, exc
+
+from keystone.backends.sqlalchemy import pool
+
+
+class SqlPoolTest(unittest.TestCase):
+
+    def test_stats(self):
+        timed = pool.TimedQueuePool(lambda: sqlite3.connect(':memory:'),
+                                    pool_size=1, max_overflow=1, timeout=0)
+        first = timed.connect()
+        second = timed.connect()
+        self.assertEquals(timed.stats.saturation, 1.0)
+        self.assertRaises(exc.TimeoutError, timed.connect)
+        first.close()
+        second.close()
+        timed.connect().close()
+        stats = timed.recreate().stats.as_dict()
+        self.assertEquals(stats['checkouts'], 3)
+        self.assertEquals(stats['timeouts'], 1)
+        self.assertEquals(stats['peak_checked_out'], 2)
+        self.assertEquals(stats['saturation'], 0.0)
+        self.assertEquals(stats['checked_out'], 0)
+
+    def test_stats_survive_dropped_connections(self):
+        timed = pool.TimedQueuePool(lambda: sqlite3.connect(':memory:'),
+                                    pool_size=1, max_overflow=0)
+        dropped = []
+
+        def drop_once(dbapi_connection, connection_record, connection_proxy):
+            if not dropped:
+                dropped.append(dbapi_connection)
+                raise exc.DisconnectionError('dropped')
+        event.listen(timed, 'checkout', drop_once)
+        conn = timed.connect()
+        self.assertEquals(len(dropped), 1)
+        self.assertEquals(timed.stats.checked_out, 1)
+        conn.close()
+        self.assertEquals(timed.stats.checked_out, 0)
+        self.assertEquals(timed.stats.checkouts, 1)
+
+    def test_stats_are_logged(self):
+        records = []
+
+        class Handler(logging.Handler):
+            def emit(self, record):
+                records.append(record.getMessage())
+        handler = Handler()
+        pool.LOG.addHandler(handler)
+        pool.LOG.setLevel(logging.INFO)
+        try:
+            timed = pool.TimedQueuePool(
+                lambda: sqlite3.connect(':memory:'), pool_size=2)
+            timed.connect().close()
+            self.assertEquals(records, [])
+            timed.stats.report_interval = 60
+            timed.stats.last_report -= 60
+            timed.connect().close()
+            timed.connect().close()
+        finally:
+            pool.LOG.removeHandler(handler)
+        self.assertEquals(len(records), 1)
+        self.assertTrue(records[0].startswith('Database pool: 2 checkouts'))
+
+    def test_sqlite_does_not_pool(self):
+        engine = pool.create_pooled_engine({'sql_connection': 'sqlite://',
+                                            'sql_pool_size': '20'})
+        self.assertEquals(pool.get_stats(engine), None)
+
+    def test_pre_ping_replaces_dropped_connections(self):
+        engine = pool.create_pooled_engine({'sql_connection': 'sqlite://',
+                                            'sql_pool_pre_ping': 'True'})
+        conn = engine.connect()
+        dbapi_connection = conn.connection.connection
+        conn.close()
+        # dropped while idle in the pool
+        dbapi_connection.close()
+        self.assertEquals(engine.execute('SELECT 2').scalar(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from keystone.backends import api, sqlalchemy
+from keystone.backends.sqlalchemy import pool
+from keystone.test.unit.test_identity_service import OPTIONS, populate
+
+
+class Recorder(object):
+    """API recording the thread and request sessions of its calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, name):
+        self.calls.append((name, threading.current_thread(),
+                           getattr(sqlalchemy._REQUEST, 'sessions', None)))
+
+    def nested(self, api):
+        api.record('inner')
+        self.record('outer')
+
+
+class SqlTpoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.engine, self.maker = sqlalchemy._ENGINE, sqlalchemy._MAKER
+
+    def tearDown(self):
+        sqlalchemy.THREADED_ENGINES.clear()
+        sqlalchemy._ENGINE, sqlalchemy._MAKER = self.engine, self.maker
+        if self.engine:
+            sqlalchemy.register_models(OPTIONS)
+        shutil.rmtree(self.tmpdir)
+
+    def test_calls_run_in_threads_within_the_request(self):
+        recorder = Recorder()
+        api = sqlalchemy.ThreadedAPI(recorder)
+        sqlalchemy.begin_request()
+        try:
+            api.record('call')
+            api.nested(api)
+            sessions = sqlalchemy._REQUEST.sessions
+        finally:
+            sqlalchemy.end_request()
+        self.assertEquals([call[0] for call in recorder.calls],
+                          ['call', 'inner', 'outer'])
+        for _name, thread, call_sessions in recorder.calls:
+            self.assertFalse(thread is threading.current_thread())
+            self.assertTrue(call_sessions is sessions)
+
+    def test_request_work_is_committed(self):
+        options = {'sql_connection': 'sqlite:///' +
+                                     os.path.join(self.tmpdir, 'db'),
+                   'sql_use_tpool': 'True'}
+        self.assertTrue(pool.use_tpool(options))
+        engine = pool.create_pooled_engine(options)
+        engine.execute('CREATE TABLE things (name VARCHAR(10))')
+        sqlalchemy.THREADED_ENGINES.add(engine)
+        maker = sessionmaker(bind=engine, autocommit=True)
+
+        class Things(object):
+            def add(self, name):
+                session = sqlalchemy.request_session(maker, engine)
+                session.execute("INSERT INTO things VALUES ('%s')" % name)
+
+        api = sqlalchemy.ThreadedAPI(Things())
+        sqlalchemy.begin_request()
+        for name in ('a', 'b', 'c'):
+            api.add(name)
+        sqlalchemy.end_request(commit=True)
+        self.assertEquals(engine.execute('SELECT COUNT(*) FROM things').
+                          scalar(), 3)
+
+    def test_validation_bundle_is_joined(self):
+        options = dict(OPTIONS, sql_use_tpool='True',
+                       sql_connection='sqlite:///' +
+                                      os.path.join(self.tmpdir, 'db'))
+        sqlalchemy._ENGINE = pool.create_pooled_engine(options)
+        sqlalchemy._MAKER = None
+        sqlalchemy.THREADED_ENGINES.add(sqlalchemy._ENGINE)
+        populate()
+        self.assertTrue(isinstance(api.user, sqlalchemy.ThreadedAPI))
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(sqlalchemy._ENGINE, 'before_cursor_execute', count)
+        bundle = api.token.get_validation_bundle('joe-token')
+        self.assertEquals((bundle[0].id, bundle[1].id), ('joe-token',
+                                                         'joeuser'))
+        self.assertEquals(len(statements), 1)
+        bundles = api.token.get_validation_bundles(['joe-token',
+                                                    'admin-token'])
+        self.assertEquals(sorted(bundles), ['admin-token', 'joe-token'])
+        self.assertEquals(len(statements), 2)
+
+    def test_not_for_in_memory_sqlite(self):
+        self.assertFalse(pool.use_tpool({'sql_connection': 'sqlite://',
+                                         'sql_use_tpool': 'True'}))
+        self.assertFalse(pool.use_tpool({'sql_connection': 'sqlite:///x'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from datetime import datetime, timedelta
+import unittest
+
+from keystone.backends import alterdb
+from keystone.backends import memcache
+from keystone.backends.alterdb import models
+from keystone.backends.tiered.api import token as token_api
+from keystone.test.unit.test_memcache_backend import fake_server
+
+
+class TieredTokenTest(unittest.TestCase):
+
+    def setUp(self):
+        alterdb.configure_backend({'sql_connection': 'sqlite://',
+                                   'backend_entities': "['Token']"})
+        self.server = memcache.MEMCACHE_SERVER
+        memcache.MEMCACHE_SERVER = fake_server('10.0.0.1:11211')
+        self.client = memcache.MEMCACHE_SERVER.servers['10.0.0.1:11211']
+        self.api = token_api.get()
+        self.api.create(self.token('old', 1))
+        self.api.create(self.token('new', 2))
+
+    def tearDown(self):
+        for token in self.api.get_all():
+            self.api.delete(token.id)
+        memcache.MEMCACHE_SERVER = self.server
+
+    def token(self, id, days):
+        token = models.Token()
+        token.id = id
+        token.user_id = 'joeuser'
+        token.tenant_id = '1234'
+        token.expires = datetime.now() + timedelta(days=days)
+        return token
+
+    def test_writes_go_to_both_tiers(self):
+        self.assertEquals(sorted(token.id for token in self.api.get_all()),
+                          ['new', 'old'])
+        self.assertEquals(sorted(self.client.store),
+                          ['1234::joeuser', 'new', 'old'])
+
+    def test_tokens_survive_a_cache_flush(self):
+        self.client.store.clear()
+        self.assertEquals(self.api.get('old').id, 'old')
+        self.assertEquals(
+            self.api.get_for_user_by_tenant('joeuser', '1234').id, 'new')
+        self.assertEquals(sorted(self.client.store),
+                          ['1234::joeuser', 'old'])
+
+    def test_reads_are_served_from_memcache(self):
+        api = token_api.get()
+        api.store = None
+        self.assertEquals(api.get('old').id, 'old')
+        self.assertEquals(sorted(api.get_multi(['old', 'new'])),
+                          ['new', 'old'])
+
+    def test_read_through_keeps_latest_user_token(self):
+        self.client.store.pop('old')
+        self.api.get('old')
+        self.assertEquals(
+            self.api.get_for_user_by_tenant('joeuser', '1234').id, 'new')
+
+    def test_delete_invalidates_the_cache(self):
+        self.api.delete('new')
+        self.assertEquals(self.api.get('new'), None)
+        self.assertEquals(
+            self.api.get_for_user_by_tenant('joeuser', '1234').id, 'old')
+
+    def racing_delete(self, method, id):
+        """Make the next store lookup by method delete token id once it has
+        read from the database"""
+        lookup = getattr(self.api.store, method)
+
+        def read_then_delete(*args, **kwargs):
+            token = lookup(*args, **kwargs)
+            setattr(self.api.store, method, lookup)
+            self.api.delete(id)
+            return token
+        setattr(self.api.store, method, read_then_delete)
+
+    def test_reads_racing_a_delete_do_not_cache_the_token(self):
+        self.client.store.clear()
+        self.racing_delete('get', 'old')
+        # the read itself was served before the delete
+        self.assertEquals(self.api.get('old').id, 'old')
+        self.assertEquals(self.api.get('old'), None)
+        self.racing_delete('get_multi', 'new')
+        self.assertEquals(self.api.get_multi(['new']).keys(), ['new'])
+        self.assertEquals(self.api.get_multi(['new']), {})
+        self.assertEquals(
+            self.api.get_for_user_by_tenant('joeuser', '1234'), None)
+
+    def test_user_reads_racing_a_delete_do_not_cache_the_token(self):
+        self.client.store.clear()
+        self.racing_delete('get_for_user_by_tenant', 'new')
+        self.assertEquals(
+            self.api.get_for_user_by_tenant('joeuser', '1234').id, 'new')
+        self.assertEquals(
+            self.api.get_for_user_by_tenant('joeuser', '1234').id, 'old')
+        self.assertEquals(self.api.get('new'), None)
+        # a new token takes the user's entry over
+        self.api.create(self.token('newer', 3))
+        self.assertEquals(
+            self.api.get_for_user_by_tenant('joeuser', '1234').id, 'newer')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -170,5 +170,62 @@ class ValidateToken(unittest.TestCase):
         self.assertEqual(401, int(resp['status']))
         self.assertEqual('application/json', utils.content_type(resp))
 
+    def validate_tokens(self, token_ids, content_type="application/json"):
+        header = httplib2.Http(".cache")
+        url = '%stokens/validations?belongsTo=%s' % (utils.URL_V2,
+                                                      self.tenant)
+        if content_type == "application/json":
+            body = json.dumps({"tokenIds": token_ids})
+        else:
+            body = '<tokenIds ' \
+                'xmlns="http://docs.openstack.org/identity/api/v2.0">%s' \
+                '</tokenIds>' % ''.join('<tokenId id="%s"/>' % token_id
+                                        for token_id in token_ids)
+        return header.request(url, "POST", body=body,
+                              headers={"Content-Type": content_type,
+                                       "X-Auth-Token": self.auth_token,
+                                       "ACCEPT": content_type})
+
+    def test_validate_tokens(self):
+        resp, content = self.validate_tokens([self.token, 'NonExistingToken',
+                                              self.exp_auth_token])
+        if int(resp['status']) == 500:
+            self.fail('Identity Fault')
+        elif int(resp['status']) == 503:
+            self.fail('Service Not Available')
+        self.assertEqual(200, int(resp['status']))
+        self.assertEqual('application/json', utils.content_type(resp))
+        validations = json.loads(content)["validations"]
+        self.assertEqual([self.token, 'NonExistingToken',
+                          self.exp_auth_token],
+                         [validation["tokenId"] for validation in validations])
+        role_ref = validations[0]["auth"]["user"]["roleRefs"][0]
+        self.assertEqual(self.role_ref_id, role_ref["id"])
+        self.assertEqual("401", validations[1]["unauthorized"]["code"])
+        self.assertEqual("403", validations[2]["forbidden"]["code"])
+
+    def test_validate_tokens_xml(self):
+        resp, content = self.validate_tokens([self.token, 'NonExistingToken'],
+                                             "application/xml")
+        if int(resp['status']) == 500:
+            self.fail('Identity Fault')
+        elif int(resp['status']) == 503:
+            self.fail('Service Not Available')
+        self.assertEqual(200, int(resp['status']))
+        self.assertEqual('application/xml', utils.content_type(resp))
+        ns = "{http://docs.openstack.org/identity/api/v2.0}"
+        validations = etree.fromstring(content).findall(ns + "validation")
+        self.assertEqual([self.token, 'NonExistingToken'],
+                         [validation.get("tokenId")
+                          for validation in validations])
+        if validations[0].find(ns + "auth") == None:
+            self.fail("Expecting Auth")
+        if validations[1].find(ns + "unauthorized") == None:
+            self.fail("Expecting Unauthorized")
+
+    def test_validate_tokens_empty(self):
+        resp, _content = self.validate_tokens([])
+        self.assertEqual(400, int(resp['status']))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,61 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from datetime import datetime, timedelta
+import unittest
+
+import keystone.backends as db
+import keystone.backends.api as db_api
+from keystone.backends import sqlalchemy
+
+
+class TokenPurgeTest(unittest.TestCase):
+
+    def setUp(self):
+        sqlalchemy.configure_backend({'sql_connection': 'sqlite://',
+                                      'backend_entities': "['Token']"})
+        now = datetime.now()
+        for i in range(7):
+            db_api.token.create({'id': 'expired%s' % i, 'user_id': 'joeuser',
+                                 'expires': now - timedelta(minutes=i + 1)})
+        db_api.token.create({'id': 'valid', 'user_id': 'joeuser',
+                             'expires': now + timedelta(days=1)})
+
+    def tearDown(self):
+        for token in db_api.token.get_all():
+            db_api.token.delete(token.id)
+
+    def test_delete_expired_is_bounded(self):
+        self.assertEquals(db_api.token.delete_expired(datetime.now(), 5), 5)
+        self.assertEquals(len(db_api.token.get_all()), 3)
+
+    def test_purge_removes_only_expired_tokens(self):
+        self.assertEquals(db.purge_expired_tokens(batch_size=3), 7)
+        self.assertEquals([token.id for token in db_api.token.get_all()],
+                          ['valid'])
+
+    def test_purge_can_be_disabled(self):
+        interval = db.TOKEN_PURGE_INTERVAL
+        db.TOKEN_PURGE_INTERVAL = 0
+        try:
+            self.assertEquals(db.start_token_purge(), None)
+        finally:
+            db.TOKEN_PURGE_INTERVAL = interval
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+from datetime import datetime, timedelta
+import unittest
+
+from sqlalchemy import event
+
+from keystone.backends import api, sqlalchemy
+from keystone.backends.api import BaseTokenAPI, BaseUserAPI
+from keystone.test.unit.test_identity_service import add_role_ref, \
+    depopulate, populate
+
+
+def describe(bundle):
+    """Ids of a token validation bundle, role refs as (role, tenant)"""
+    if bundle is None:
+        return None
+    (token, user, user_tenant, token_tenant, tenant_roles,
+        global_roles) = bundle
+    return (token and token.id, user and user.id,
+            user_tenant and user_tenant.id, token_tenant and token_tenant.id,
+            sorted((ref.role_id, ref.tenant_id) for ref in tenant_roles),
+            sorted((ref.role_id, ref.tenant_id) for ref in global_roles))
+
+
+class ValidationBundleTest(unittest.TestCase):
+
+    def setUp(self):
+        populate()
+        add_role_ref('joeuser', 'KeystoneServiceAdmin')
+        add_role_ref('joeuser', 'Admin', '0000')
+        expires = datetime.now() + timedelta(days=1)
+        for id, user_id, tenant_id in (('joe-global', 'joeuser', None),
+                                       ('joe-0000', 'joeuser', '0000'),
+                                       ('ghost-token', 'ghost', None)):
+            api.token.create({'id': id, 'user_id': user_id,
+                              'tenant_id': tenant_id, 'expires': expires})
+        self.statements = []
+        event.listen(sqlalchemy._ENGINE, 'before_cursor_execute',
+                     self.count)
+
+    def tearDown(self):
+        depopulate()
+
+    def count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def bundle(self, token_id):
+        return describe(api.token.get_validation_bundle(token_id))
+
+    def test_token_with_a_tenant(self):
+        self.assertEquals(self.bundle('joe-token'),
+            ('joe-token', 'joeuser', '1234', '1234',
+             [('Member', '1234')], [('KeystoneServiceAdmin', None)]))
+        self.assertEquals(len(self.statements), 1)
+
+    def test_token_without_a_tenant(self):
+        self.assertEquals(self.bundle('admin-token'),
+            ('admin-token', 'admin', None, None, [], [('Admin', None)]))
+
+    def test_global_and_tenant_roles(self):
+        # roles on other tenants than the token's are left out
+        self.assertEquals(self.bundle('joe-global'),
+            ('joe-global', 'joeuser', '1234', None,
+             [], [('KeystoneServiceAdmin', None)]))
+        self.assertEquals(self.bundle('joe-0000'),
+            ('joe-0000', 'joeuser', '1234', '0000',
+             [('Admin', '0000')], [('KeystoneServiceAdmin', None)]))
+
+    def test_disabled_tenant(self):
+        bundle = api.token.get_validation_bundle('joe-0000')
+        self.assertEquals(bundle[3].id, '0000')
+        self.assertFalse(bundle[3].enabled)
+        self.assertTrue(bundle[2].enabled)
+
+    def test_missing_user(self):
+        self.assertEquals(self.bundle('ghost-token'),
+                          ('ghost-token', None, None, None, [], []))
+        self.assertEquals(api.user.get_validation_bundle('ghost', '1234'),
+                          (None, None, None, [], []))
+
+    def test_unknown_token(self):
+        self.assertEquals(api.token.get_validation_bundle('nope'), None)
+        self.assertEquals(api.token.get_validation_bundles(['nope']), {})
+
+    def test_matches_the_composed_calls(self):
+        ids = ['joe-token', 'admin-token', 'joe-global', 'joe-0000',
+               'ghost-token']
+        for id in ids + ['nope']:
+            self.assertEquals(self.bundle(id), describe(
+                BaseTokenAPI.get_validation_bundle(api.token, id)), id)
+        for id, tenant_id in (('joeuser', '1234'), ('joeuser', None),
+                              ('admin', None), ('ghost', None)):
+            self.assertEquals(
+                describe((None,) + api.user.get_validation_bundle(id,
+                                                                  tenant_id)),
+                describe((None,) + BaseUserAPI.get_validation_bundle(
+                    api.user, id, tenant_id)))
+        bundles = api.token.get_validation_bundles(ids + ['nope'])
+        composed = BaseTokenAPI.get_validation_bundles(api.token,
+                                                       ids + ['nope'])
+        self.assertEquals(sorted(bundles), sorted(ids))
+        self.assertEquals(
+            dict((id, describe(bundle)) for id, bundle in bundles.items()),
+            dict((id, describe(bundle)) for id, bundle in composed.items()))
+
+
+if __name__ == '__main__':
+    unittest.main()
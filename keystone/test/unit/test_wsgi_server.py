@@ -0,0 +1,133 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import httplib
+import socket
+import time
+import unittest
+
+import eventlet
+
+from keystone.common import wsgi
+
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = None
+        self.finished = []
+
+    def tearDown(self):
+        self.server.stop()
+        self.server.wait()
+
+    def app(self, env, start_response):
+        if env['PATH_INFO'] == '/slow':
+            eventlet.sleep(float(env['QUERY_STRING']))
+        nodelay = [connection.connection.getsockopt(socket.IPPROTO_TCP,
+                                                    socket.TCP_NODELAY)
+                   for connection in self.server.connections]
+        self.finished.append(env['PATH_INFO'])
+        start_response('200 OK', [('Content-Length', '1')])
+        return [str(int(all(nodelay)))]
+
+    def start(self, **kwargs):
+        listening = wsgi.bind(0, '127.0.0.1')
+        self.port = listening.getsockname()[1]
+        self.server = wsgi.Server(**kwargs)
+        self.server.start(self.app, None, socket=listening)
+
+    def connect(self):
+        connection = httplib.HTTPConnection('127.0.0.1', self.port)
+        connection.connect()
+        return connection
+
+    def get(self, connection, path='/'):
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.getheader('connection'), response.read()
+
+    def assertClosed(self, connection):
+        connection.sock.settimeout(5)
+        self.assertEquals(connection.sock.recv(1), '')
+
+    def test_max_requests_per_connection(self):
+        self.start(max_requests=2)
+        connection = self.connect()
+        self.assertEquals(self.get(connection), (None, '0'))
+        self.assertEquals(self.get(connection), ('close', '0'))
+        # httplib drops it on Connection: close
+        self.assertEquals(connection.sock, None)
+
+    def test_tcp_nodelay(self):
+        self.start(tcp_nodelay=True)
+        self.assertEquals(self.get(self.connect()), (None, '1'))
+
+    def test_keepalive_timeout(self):
+        self.start(keepalive_timeout=0.2)
+        connection = self.connect()
+        self.get(connection)
+        started = time.time()
+        self.assertClosed(connection)
+        self.assertTrue(time.time() - started < 1)
+
+    def test_stop_drains_requests_in_progress(self):
+        self.start(drain_timeout=5)
+        idle = self.connect()
+        self.get(idle)
+        busy = self.connect()
+        busy.request('GET', '/slow?0.3')
+        eventlet.sleep(0.1)
+        self.server.stop()
+        self.assertClosed(idle)
+        response = busy.getresponse()
+        self.assertEquals(response.getheader('connection'), 'close')
+        self.assertEquals(response.read(), '0')
+        self.assertRaises(socket.error, self.connect)
+        self.server.wait()
+
+    def test_stop_serves_first_request_of_new_connections(self):
+        self.start(drain_timeout=5)
+        fresh = self.connect()
+        eventlet.sleep(0.1)
+        self.server.stop()
+        self.assertEquals(self.get(fresh), ('close', '0'))
+        self.server.wait()
+
+    def test_drain_timeout(self):
+        self.start(drain_timeout=0.2)
+        busy = self.connect()
+        busy.request('GET', '/slow?5')
+        eventlet.sleep(0.1)
+        started = time.time()
+        self.server.stop()
+        self.server.wait()
+        self.assertTrue(time.time() - started < 1)
+        self.assertEquals(self.finished, [])
+
+    def test_reuse_port(self):
+        first = wsgi.bind(0, '127.0.0.1', reuse_port=True)
+        port = first.getsockname()[1]
+        second = wsgi.bind(port, '127.0.0.1', reuse_port=True)
+        self.assertEquals(second.getsockname()[1], port)
+        first.close()
+        second.close()
+        self.start()
+
+
+if __name__ == '__main__':
+    unittest.main()
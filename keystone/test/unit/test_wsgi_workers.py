@@ -0,0 +1,98 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright (c) 2010-2011 OpenStack, LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import signal
+import time
+import unittest
+import urllib2
+
+import eventlet
+
+from keystone.common import wsgi
+
+
+def app(env, start_response):
+    if env['PATH_INFO'] == '/slow':
+        eventlet.sleep(1)
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid())]
+
+
+class WorkersTest(unittest.TestCase):
+
+    def setUp(self):
+        socket = wsgi.bind(0, '127.0.0.1')
+        self.url = 'http://127.0.0.1:%s' % socket.getsockname()[1]
+
+        def start(index):
+            server = wsgi.Server(drain_timeout=5)
+            server.start(app, None, socket=socket)
+            return [server]
+        self.launcher = os.fork()
+        if self.launcher == 0:
+            try:
+                wsgi.run_workers(2, start)
+            finally:
+                os._exit(0)
+        socket.close()
+        self.wait_for(lambda: self.worker_pid())
+
+    def tearDown(self):
+        if self.launcher:
+            os.kill(self.launcher, signal.SIGTERM)
+            os.waitpid(self.launcher, 0)
+
+    def worker_pid(self, path='/'):
+        try:
+            return int(urllib2.urlopen(self.url + path,
+                                       timeout=5).read())
+        except IOError:
+            return None
+
+    def wait_for(self, condition, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return
+            time.sleep(0.1)
+        self.fail('timed out')
+
+    def test_dead_workers_are_replaced(self):
+        pid = self.worker_pid()
+        os.kill(pid, signal.SIGKILL)
+        self.wait_for(lambda: self.worker_pid() not in (None, pid))
+
+    def test_hup_replaces_workers(self):
+        old = set([self.worker_pid() for i in range(10)])
+        os.kill(self.launcher, signal.SIGHUP)
+        self.wait_for(lambda: self.worker_pid() not in old | set([None]))
+        time.sleep(0.5)
+        for i in range(10):
+            self.assertFalse(self.worker_pid() in old)
+
+    def test_term_finishes_requests_in_progress(self):
+        slow = eventlet.spawn(self.worker_pid, '/slow')
+        eventlet.sleep(0.3)
+        os.kill(self.launcher, signal.SIGTERM)
+        self.assertTrue(slow.wait())
+        self.assertEquals(os.waitpid(self.launcher, 0)[1], 0)
+        self.launcher = None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2011 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the sqlalchemy user page markers.
+
+Compares the markers computed the way users_get_page_markers used to (four
+queries reading full User rows) with keystone.backends.sqlalchemy.pagination
+(two queries reading ids only), on an in-memory sqlite database. Prints the
+queries run, rows fetched and time taken per call, and checks that both
+give the same markers.
+
+    python tools/bench_page_markers.py --users 5000 --limit 1000
+"""
+
+import optparse
+import os
+import sqlite3
+import sys
+import time
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'keystone', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import aliased, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from keystone.backends.sqlalchemy import models
+from keystone.backends.sqlalchemy.api.user import UserAPI
+
+
+class Counter(object):
+    """Counts the statements run and rows fetched on an engine"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def reset(self):
+        self.queries = 0
+        self.rows = 0
+
+
+class CountingCursor(object):
+
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._counter.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._counter.rows += len(rows)
+        return rows
+
+
+class CountingConnection(object):
+
+    def __init__(self, connection, counter):
+        self._connection = connection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args):
+        return CountingCursor(self._connection.cursor(*args), self._counter)
+
+
+def old_users_get_page_markers(session, marker, limit):
+    """users_get_page_markers as it was before pagination.page_markers"""
+    user = aliased(models.User)
+    first = session.query(user).order_by(user.id).first()
+    last = session.query(user).order_by(user.id.desc()).first()
+    if first is None:
+        return (None, None)
+    if marker is None:
+        marker = first.id
+    next_page = session.query(user).filter("id > :marker").\
+        params(marker='%s' % marker).order_by(user.id).\
+        limit(int(limit)).all()
+    prev_page = session.query(user).filter("id < :marker").\
+        params(marker='%s' % marker).order_by(user.id.desc()).\
+        limit(int(limit)).all()
+    if len(next_page) == 0:
+        next_page = last
+    else:
+        next_page = next_page[-1]
+    if len(prev_page) == 0:
+        prev_page = first
+    else:
+        prev_page = prev_page[-1]
+    if first.id == marker:
+        prev_page = None
+    else:
+        prev_page = prev_page.id
+    if marker == last.id:
+        next_page = None
+    else:
+        next_page = next_page.id
+    return (prev_page, next_page)
+
+
+def measure(name, counter, calls, function):
+    counter.reset()
+    start = time.time()
+    for _i in range(calls):
+        result = function()
+    elapsed = (time.time() - start) / calls
+    print "%-7s %d queries, %d rows, %.1f ms per call" % (
+        name + ':', counter.queries / calls, counter.rows / calls,
+        elapsed * 1000)
+    return result
+
+
+def main():
+    parser = optparse.OptionParser(usage=__doc__.strip().split('\n')[-1])
+    parser.add_option('--users', type='int', default=5000,
+                      help="users in the table (default: %default)")
+    parser.add_option('--limit', type='int', default=1000,
+                      help="page size (default: %default)")
+    parser.add_option('--calls', type='int', default=20,
+                      help="calls timed per variant (default: %default)")
+    options, _args = parser.parse_args()
+
+    counter = Counter()
+    engine = create_engine('sqlite://', poolclass=StaticPool,
+        creator=lambda: CountingConnection(sqlite3.connect(':memory:'),
+                                           counter))
+    event.listen(engine, 'before_cursor_execute',
+                 lambda *args: setattr(counter, 'queries',
+                                       counter.queries + 1))
+    models.User.__table__.create(engine)
+    engine.execute(models.User.__table__.insert(),
+                   [{'id': 'user%06d' % i, 'enabled': 1}
+                    for i in range(options.users)])
+    session = sessionmaker(bind=engine, autocommit=True)()
+    marker = 'user%06d' % (options.users // 2)
+    print "%d users, marker %s, limit %d" % (options.users, marker,
+                                               options.limit)
+
+    before = measure('before', counter, options.calls,
+        lambda: old_users_get_page_markers(session, marker, options.limit))
+    after = measure('after', counter, options.calls,
+        lambda: UserAPI().users_get_page_markers(marker, options.limit,
+                                                 session=session))
+    if before != after:
+        print "markers differ: before %s, after %s" % (before, after)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())